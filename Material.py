@@ -4,6 +4,9 @@ from .tools.utils import *
 from shutil import copyfile
 
 
+MATERIAL_ATTRIBUTES = ('newmtl', 'map_Kd', 'Ns', 'Ka', 'Kd', 'Ks', 'Ke', 'Ni', 'd', 'illum')
+
+
 class Material:
     def __init__(self, newmtl='default_mtl'):
         # material name
@@ -19,10 +22,6 @@ class Material:
         self.Ni = -1
         self.d = -1         # Specifies the dissolve for the current material.
         self.illum = -1     # The illum statement specifies the illumination model to use in the material.
-        self.face_indices = [] # indices of associated faces of the object
-
-    def append_face(self, face_index):
-        self.face_indices.append(face_index)
 
     def has_texture(self):
         return self.map_Kd != ''
@@ -96,12 +95,34 @@ class Material:
         mtl.set_material(**keywds)
         return mtl
 
+    def to_dict(self):
+        """
+        attributes of the material as json serializable values, form_material(**mtl.to_dict()) restores it.
+        """
+        data = {name: getattr(self, name) for name in MATERIAL_ATTRIBUTES}
+        for name in ('Ka', 'Kd', 'Ks', 'Ke'):
+            data[name] = np.asarray(data[name]).tolist()
+        return data
+
+    @staticmethod
+    def from_dict(data):
+        """
+        material from the attributes returned by to_dict.
+        """
+        data = dict(data)
+        for name in ('Ka', 'Kd', 'Ks', 'Ke'):
+            if len(data.get(name, [])) > 0:
+                data[name] = np.array(data[name], dtype=np.float_)
+        return Material.form_material(**data)
+
 
 class MaterialLibrary:
     def __init__(self, default_name="materials"):
         self.path = ""                  # file path
         self.name = default_name        # file name
         self.mtls = []                  # material list
+        self._indices = {}              # material name -> index in mtls, -1 for names looked up and not found
+        self._indexed = (None, 0)       # mtls list and length the name index was built for
 
     def load(self, file_path):
         self.path = os.path.dirname(file_path)
@@ -134,9 +155,8 @@ class MaterialLibrary:
                         self.mtls[curr_mtl].d = float(s_line[1])
                     if s_line[0] == 'illum' and curr_mtl >= 0:
                         self.mtls[curr_mtl].illum = int(s_line[1])
-        except FileNotFoundError:
-            print("Error 02: no file found, check path: {}".format(file_path))
-            sys.exit()
+        except FileNotFoundError as error:
+            raise FileNotFoundError("Error 02: no file found, check path: {}".format(file_path)) from error
 
     def to_string(self):
         msg = "___{}___".format(self.name)
@@ -156,31 +176,81 @@ class MaterialLibrary:
         :param file_path: the saving path
         :param save_texture:
         """
+        self.write(file_path)
+        if save_texture:
+            for source, target in self.texture_copies(file_path):
+                copyfile(source, target)
+
+    def write(self, file_path):
+        """
+        write the material file, without the textures.
+        """
         with open(file_path, 'w') as ofile:
             ofile.write("# Generated with MeshPyIO\n# Material Count: {}\n".format(len(self.mtls)))
             for mtl in self.mtls:
                 # adding material to the file
                 ofile.write(mtl.to_string())
-                # coping texture
-                if (mtl.map_Kd != '') and save_texture:
-                    if os.path.exists(os.path.join(os.path.dirname(file_path), mtl.map_Kd)):
-                        print("Warning: texture file was not copied, a copy exist already")
-                    else:
-                        copyfile(os.path.join(self.path, mtl.map_Kd),
-                                 os.path.join(os.path.dirname(file_path), mtl.map_Kd))
+
+    def texture_copies(self, file_path):
+        """
+        textures to copy next to a material file saved as file_path.
+        :return: list of (source, target) paths, textures already in the target folder are skipped
+        """
+        copies = {}
+        for mtl in self.mtls:
+            if mtl.map_Kd == '':
+                continue
+            target = os.path.join(os.path.dirname(file_path), mtl.map_Kd)
+            if os.path.exists(target) or target in copies:
+                print("Warning: texture file was not copied, a copy exist already")
+            else:
+                copies[target] = os.path.join(self.path, mtl.map_Kd)
+        return [(source, target) for target, source in copies.items()]
 
     def insert(self, material: Material):
         if self.index_of(material.newmtl) >= 0:
             return -1
         else:
             self.mtls.append(material)
+            self._indices[material.newmtl] = len(self.mtls) - 1
+            self._indexed = (self.mtls, len(self.mtls))
             return len(self.mtls)-1
 
     def index_of(self, material_name):
+        if self._indexed[0] is not self.mtls or self._indexed[1] != len(self.mtls):
+            # mtls was changed directly, the name index is rebuilt
+            self._update_indices()
+        index = self._indices.get(material_name)
+        if index is None:
+            # misses are cached too, until mtls changes
+            index = self._indices[material_name] = -1
+        elif index >= 0 and self.mtls[index].newmtl != material_name:
+            # a material was renamed
+            self._update_indices()
+            index = self._indices.setdefault(material_name, -1)
+        return index
+
+    def _update_indices(self):
+        self._indices = {}
         for index, mtl in enumerate(self.mtls):
-            if material_name == mtl.newmtl:
-                return index
-        return -1
+            self._indices.setdefault(mtl.newmtl, index)
+        self._indexed = (self.mtls, len(self.mtls))
+
+    def to_dict(self):
+        """
+        the library as json serializable values, the path is made absolute so textures are still found.
+        """
+        return {"name": self.name, "path": os.path.abspath(self.path) if self.path else "",
+                "mtls": [mtl.to_dict() for mtl in self.mtls]}
+
+    @staticmethod
+    def from_dict(data):
+        mtllib = MaterialLibrary(data["name"])
+        mtllib.path = data["path"]
+        for mtl in data["mtls"]:
+            mtllib.mtls.append(Material.from_dict(mtl))
+        mtllib._update_indices()
+        return mtllib
 
     @staticmethod
     def load_mtlib(path):
@@ -0,0 +1,192 @@
+import copy
+import glob
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from .Wavefront import WavefrontOBJ
+from .tools.obj_reader import BLOCK_SIZE, read_frame
+from .tools.profiling import new_profile
+
+
+class WavefrontSequence:
+    def __init__(self, filenames, lazy=False, workers=1, check_topology=True, normals=True,
+                 block_size=BLOCK_SIZE):
+        """
+        sequence of obj frames sharing the faces, texture coordinates and materials of the first one.
+        The first frame is fully loaded, only the v and vn records of the other frames are read.
+        :param filenames: obj files of the frames, in order
+        :param lazy: read a frame on its first access instead of reading all of them now
+        :param workers: number of threads reading frames
+        :param check_topology: compare the vt, f, usemtl and mtllib records of each frame with the first one,
+        frames that differ are fully loaded
+        :param normals: read the vn records of every frame. Without them the frames keep the normals of the
+        first frame, which is faster when the normals are computed from the vertices anyway
+        :param block_size: size of the text blocks read from the files
+        """
+        self.filenames = list(filenames)
+        if len(self.filenames) == 0:
+            raise ValueError("Error 006: a sequence needs at least one frame")
+        self.workers = workers
+        self.check_topology = check_topology
+        self.normals = normals
+        self.block_size = block_size
+
+        self.template, self._signature = self._load_template(self.filenames[0])
+        num_frames = len(self.filenames)
+        self.vertices = np.empty((num_frames, ) + self.template.vertices.shape)              # T x N x 3
+        self.vertices[0] = self.template.vertices
+        self.vertices_normals = None
+        if normals:
+            self.vertices_normals = np.empty((num_frames, ) + self.template.vertices_normals.shape)
+            self.vertices_normals[0] = self.template.vertices_normals
+        self.loaded = np.zeros(num_frames, dtype=bool)
+        self.loaded[0] = True
+        self.fallbacks = {}            # frame index -> fully loaded WavefrontOBJ of frames with another topology
+        self._lock = threading.Lock()
+        self._reading = {}             # frame index -> Event set when the thread reading the frame is done
+
+        if not lazy:
+            self.load_frames()
+
+    def _load_template(self, filename):
+        """
+        full load of the first frame, the signature of its topology is computed while it is parsed.
+        :return: WavefrontOBJ, signature (None without check_topology)
+        """
+        profile = new_profile('load', filename)
+        records = WavefrontOBJ._parse_records(filename, profile=profile, block_size=self.block_size,
+                                              signature=self.check_topology)
+        template = WavefrontOBJ()
+        template._load_records(filename, records, profile=profile)
+        return template, records.signature
+
+    @staticmethod
+    def from_pattern(pattern, **keywds):
+        """
+        sequence of the files matching a glob pattern, in alphabetical order (frame-0001.obj, frame-0002.obj...).
+        """
+        return WavefrontSequence(sorted(glob.glob(pattern)), **keywds)
+
+    def __len__(self):
+        return len(self.filenames)
+
+    def __getitem__(self, index):
+        return self.frame(index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self.frame(index)
+
+    def load_frame(self, index):
+        """
+        read the vertices of a frame in the preallocated arrays. Each frame is read once, threads asking
+        for a frame being read wait for it.
+        """
+        while True:
+            with self._lock:
+                if self.loaded[index]:
+                    return
+                reading = self._reading.get(index)
+                if reading is None:
+                    reading = self._reading[index] = threading.Event()
+                    break
+            # read by another thread, it is read here if that thread failed
+            reading.wait()
+        try:
+            self._read_frame(index)
+        finally:
+            with self._lock:
+                del self._reading[index]
+            reading.set()
+
+    def _read_frame(self, index):
+        vertices, vertices_normals, signature = read_frame(self.filenames[index], self.block_size,
+                                                           signature=self.check_topology, normals=self.normals)
+        vertices = vertices[:, :3]
+        if signature != self._signature or vertices.shape != self.vertices.shape[1:] or \
+                (self.normals and vertices_normals.shape != self.vertices_normals.shape[1:]):
+            self._load_fallback(index)
+        else:
+            self.vertices[index] = vertices
+            if self.normals:
+                self.vertices_normals[index] = vertices_normals
+        with self._lock:
+            self.loaded[index] = True
+
+    def _load_fallback(self, index):
+        """
+        full load of a frame whose topology differs from the first frame.
+        """
+        print("Warning: 006: {} does not share the topology of {}, it is fully loaded".format(
+            self.filenames[index], self.filenames[0]))
+        obj = WavefrontOBJ.load_obj(self.filenames[index])
+        with self._lock:
+            self.fallbacks[index] = obj
+        # frames with another number of vertices have no place in the shared arrays
+        self.vertices[index] = obj.vertices if obj.vertices.shape == self.vertices.shape[1:] else np.nan
+        if self.normals:
+            self.vertices_normals[index] = obj.vertices_normals \
+                if obj.vertices_normals.shape == self.vertices_normals.shape[1:] else np.nan
+
+    def load_frames(self, indices=None):
+        """
+        read several frames, concurrently when the sequence has more than one worker.
+        :param indices: frames to read, all of them by default
+        """
+        indices = [index for index in (range(len(self)) if indices is None else indices) if not self.loaded[index]]
+        if self.workers > 1 and len(indices) > 1:
+            with ThreadPoolExecutor(self.workers) as executor:
+                list(executor.map(self.load_frame, indices))
+        else:
+            for index in indices:
+                self.load_frame(index)
+
+    def get_vertices(self, index):
+        """
+        N x 3 vertices of a frame, read if needed.
+        """
+        self.load_frame(index)
+        return self.vertices[index]
+
+    def vertex_normals(self, weighting='area', indices=None):
+        """
+        vertex normals computed from the vertices of several frames. The triangulation of the faces is
+        computed once for the whole sequence, see WavefrontOBJ.vertex_normals.
+        :param indices: frames, all of them by default
+        :return: len(indices) x N x 3 normals, NaN for frames whose number of vertices differs from the first one
+        """
+        indices = list(range(len(self)) if indices is None else indices)
+        self.load_frames(indices)
+        topology = self.template.normal_topology()
+        normals = np.empty((len(indices), ) + self.vertices.shape[1:])
+        for position, index in enumerate(indices):
+            if index in self.fallbacks:
+                obj_normals = self.fallbacks[index].vertex_normals(weighting)
+                normals[position] = obj_normals if obj_normals.shape == normals.shape[1:] else np.nan
+            else:
+                normals[position] = topology.vertex_normals(self.vertices[index], weighting)
+        return normals
+
+    def frame(self, index):
+        """
+        mesh of a frame. It shares the faces, texture coordinates and materials of the first frame,
+        its vertices are a view in the sequence arrays. The caches computed from the vertices (render
+        buffers, normals, bvh) are its own, the ones computed from the faces are shared.
+        """
+        if index < 0:
+            index += len(self)
+        self.load_frame(index)
+        if index in self.fallbacks:
+            return self.fallbacks[index]
+        obj = copy.copy(self.template)
+        obj.path = self.filenames[index]
+        obj.name = os.path.basename(obj.path)
+        obj.mtllibs = list(self.template.mtllibs)
+        obj.vertices = self.vertices[index]
+        if self.normals:
+            obj.vertices_normals = self.vertices_normals[index]
+        obj._vertices_changed()
+        return obj
@@ -1,14 +1,31 @@
 import numpy as np
 import os
-import sys
 
-import pymesh
 from datetime import datetime as time
-from skimage.io import imread, imsave
 
 from .Material import MaterialLibrary
 from .tools.utils import *
-from .tools.render import render_texture, render_texture_colors
+from .tools.backends import import_optional, register_image_backend, set_image_backend
+from .tools.rasterizer import TILE_SIZE
+from .tools.obj_reader import BLOCK_SIZE, ObjChunk, iter_records, read_obj, triangulate_corners
+from .tools.obj_cache import ObjCache
+from .tools.mesh_format import read_mesh, write_mesh
+from .tools.profiling import NULL_PROFILE, Profile, disable_profiling, enable_profiling, new_profile
+from .tools.sampling import sample_texture
+from .tools.texture_cache import TEXTURE_CACHE, TextureCache, as_float
+from .tools.obj_writer import WRITE_BUFFER, write_faces, write_vectors
+from .tools.polygons import PolygonArray, absent_indices, fan_triangles, flat_indices
+from .tools.welding import remap_indices, used_mapping, weld_points
+from .tools.buffers import build_render_buffers
+from .tools.normals import NORMAL_WEIGHTINGS, NormalTopology
+from .tools.bvh import BVH, LEAF_SIZE
+from .tools.decimation import FEATURE_WEIGHT, Decimator
+
+
+def _same_arrays(arrays, others):
+    return all(array is other for array, other in zip(arrays, others))
+
+
 class WavefrontOBJ:
     def __init__(self):
         """
@@ -25,86 +42,214 @@ class WavefrontOBJ:
         self.vertices_texture = []     # texture coordinates
 
         # Elements data
-        self.faces = []                 # M*Nv*3 array, Nv=# of vertices, stored as vid,tid,nid (-1 for N/A)
+        self.faces = []                 # M*Nv array, Nv=# of vertices (PolygonArray for mixed polygons)
         self.faces_texture_indices = []
         self.faces_norm_indices = []
+        self.mtl_ids = np.zeros(0, dtype=np.int64)    # material index of each face in mtllibs[0]
 
         # General information
         self.num_vertices = 0
         self.num_faces = 0
-        self.vertex_per_face = 0
-
-    def load(self, filename: str, triangulate=False):
+        self.vertex_per_face = 0       # 0 when faces mix polygons of different sizes
+        self.profile = None            # Profile of the last load or save, when profiling is enabled
+        self._topology = None          # (faces arrays, RenderBuffers without attributes), see render_buffers
+        self._buffers = None           # (vertex arrays, RenderBuffers)
+        self._normal_topology = None   # (faces, NormalTopology), see normal_topology
+        self._normals = None           # (vertices, weighting -> normals), 'face' for the face normals
+        self._bvh = None               # (vertices, faces, BVH), see bvh
+
+    def load(self, filename: str, triangulate=False, cache=None, csr=None, workers=None):
         """
         Load a mesh object from an obj file.
+        :param cache: optional ObjCache, parsed files are stored in it and reloaded without parsing
+        :param csr: store faces as PolygonArray (flat indices and offsets). None: only for files mixing
+        polygons of different sizes, False: raise an error for such files.
+        :param workers: number of threads parsing the file, see tools/obj_reader.py read_obj
+        """
+        profile = new_profile('load', filename)
+        records = WavefrontOBJ._parse_records(filename, cache, profile, workers)
+        self._load_records(filename, records, triangulate, csr, profile)
+
+    @staticmethod
+    def _parse_records(filename, cache=None, profile=NULL_PROFILE, workers=None, block_size=BLOCK_SIZE,
+                       signature=False):
+        """
+        records of an obj file, from the cache when it has them, parsed and put in the cache otherwise.
+        :param signature: hash the topology records, see tools/obj_reader.py read_obj. The cache is not
+        used then, cached records have no signature
+        """
+        # the file is parsed by blocks, see tools/obj_reader.py
+        records = None
+        if cache is not None and not signature:
+            start = profile.clock()
+            records = cache.get(filename)
+            profile.stop('cache_get', start)
+        if records is None:
+            try:
+                records = read_obj(filename, block_size, profile, workers, signature)
+            except FileNotFoundError as error:
+                raise FileNotFoundError("Error 003: file {} not found".format(filename)) from error
+            if cache is not None and not signature:
+                start = profile.clock()
+                cache.put(filename, records)
+                profile.stop('cache_put', start)
+        return records
+
+    def _load_records(self, filename, records, triangulate=False, csr=None, profile=NULL_PROFILE, mtllibs=None):
+        """
+        set the mesh from the records parsed from a file.
+        :param mtllibs: material libraries already loaded, by path, the others are read
+        """
+        self.path = filename
+        self.name = os.path.basename(filename)
+        self.invalidate_caches()
+        start = profile.clock()
+        self._load_mtllibs(records.mtllibs, mtllibs)
+        profile.stop('mtllib', start, len(records.mtllibs))
+
+        start = profile.clock()
+        corners, face_sizes, face_usemtl = self._polygons(records, triangulate)
+        self.vertices = records.vertices[:, :3]
+        self.vertices_texture = records.vertices_texture
+        self.vertices_normals = records.vertices_normals
+        (self.faces, self.faces_texture_indices, self.faces_norm_indices,
+         self.vertex_per_face) = self._face_arrays(corners, face_sizes, csr)
+        self.num_vertices = self.vertices.shape[0]
+        self.num_faces = len(self.faces)
+        self.mtl_ids = self._material_ids(self._usemtl_ids(records.usemtl), face_usemtl)
+        profile.stop('arrays', start, self.num_faces)
+        self.profile = profile.finish()
+
+    def _load_mtllibs(self, mtllibs, loaded=None):
+        """
+        load the material libraries referenced by mtllib statements.
+        :param loaded: material libraries already loaded, by path
+        """
+        for mtllib in mtllibs:
+            _path = self.mtllib_path(mtllib)
+            mat = loaded[_path] if loaded and _path in loaded else MaterialLibrary.load_mtlib(_path)
+            if (len(self.mtllibs) == 1) and self.mtllibs[0].name == "Default_mtl":
+                self.mtllibs[0] = mat
+            else:
+                self.mtllibs.append(mat)
+
+    def mtllib_path(self, mtllib):
+        """
+        path of a material library referenced by the file of the mesh.
+        """
+        return os.path.join(os.path.dirname(self.path), mtllib)
+
+    def _polygons(self, records, triangulate):
+        """
+        triangulate the parsed faces if requested.
+        :return: corners (vid, tid, nid) of all faces, number of corners and index of the usemtl of each face
+        """
+        corners, face_sizes, face_usemtl = records.corners, records.face_sizes, records.face_usemtl
+        if triangulate:
+            corners, face_ids = triangulate_corners(corners, face_sizes)
+            corners = corners.reshape(-1, 3)
+            face_usemtl = face_usemtl[face_ids]
+            face_sizes = np.full(len(face_ids), 3)
+        return corners, face_sizes, face_usemtl
+
+    def _face_arrays(self, corners, face_sizes, csr=None):
+        """
+        split the corners in vertex, texture and normal indices, as dense arrays or PolygonArray.
+        :return: faces, faces_texture_indices, faces_norm_indices and the number of vertices per face
+        """
+        uniform = len(face_sizes) == 0 or bool(np.all(face_sizes == face_sizes[0]))
+        if csr or (csr is None and not uniform):
+            offsets = np.zeros(len(face_sizes) + 1, dtype=np.int64)
+            np.cumsum(face_sizes, out=offsets[1:])
+            vertex_per_face = int(face_sizes[0]) if uniform and len(face_sizes) > 0 else 0
+            return (PolygonArray(corners[:, 0], offsets), PolygonArray(corners[:, 1], offsets),
+                    PolygonArray(corners[:, 2], offsets), vertex_per_face)
+        if not uniform:
+            raise ValueError("Error 004: {} mixes polygons of different sizes, "
+                             "load it with triangulate=True or csr=True".format(self.path))
+        vertex_per_face = int(face_sizes[0]) if len(face_sizes) > 0 else 0
+        _faces = corners.reshape(len(face_sizes), vertex_per_face, 3)
+        return _faces[:, :, 0], _faces[:, :, 1], _faces[:, :, 2], vertex_per_face
+
+    def _usemtl_ids(self, usemtl):
+        """
+        index in the first material library of the materials of usemtl statements (-1 if unknown).
+        """
+        ids = np.zeros(len(usemtl), dtype=np.int64)
+        for index, name in enumerate(usemtl):
+            ids[index] = self.mtllibs[0].index_of(name)
+            if ids[index] == -1:
+                print("Material id:{} does not exist in material file".format(name))
+        return ids
+
+    def _material_ids(self, usemtl_ids, face_usemtl):
+        """
+        material index of each face.
+        :param usemtl_ids: material index of each usemtl statement
+        :param face_usemtl: for each face, the index of its usemtl statement (-1 before the first usemtl)
+        """
+        mtl_ids = np.append(usemtl_ids, 0)[face_usemtl]
+        # faces before any usemtl use the first material, unknown materials fall back to the last one
+        mtl_ids[face_usemtl < 0] = 0
+        mtl_ids[mtl_ids < 0] = len(self.mtllibs[0].mtls) - 1
+        return mtl_ids
+
+    def material_groups(self):
+        """
+        faces of each material of the first material library.
+        :return: face indices sorted by material and the bounds of each material in them,
+        the faces of material i are order[bounds[i]:bounds[i+1]]
+        """
+        order = np.argsort(self.mtl_ids, kind='stable')
+        bounds = np.searchsorted(self.mtl_ids[order], np.arange(len(self.mtllibs[0].mtls) + 1))
+        return order, bounds
+
+    def material_faces(self, material):
+        """
+        indices of the faces of a material of the first material library.
+        :param material: material name or index
+        """
+        if isinstance(material, str):
+            material = self.mtllibs[0].index_of(material)
+        return np.flatnonzero(self.mtl_ids == material)
+
+    def set_vertices(self, vertices_list, copy=True):
+        """
+        replace the vertices.
+        :param copy: False to borrow the array: the mesh then shares it with the caller
         """
-        # parses a vertex record as either vid, vid/tid, vid//nid or vid/tid/nid
-        # and returns a 3-tuple where unparsed values are replaced with -1
-        try:
-            with open(filename, 'r') as objf:
-                self.path = filename
-                self.name = os.path.basename(filename)
-                cur_usemtl = 0
-                faces_counter = 0
-                for line in objf:
-                    #yield line
-                    toks = line.split()
-                    if not toks:
-                        continue
-                    if toks[0] == 'v':
-                        self.vertices.append([float(v) for v in toks[1:]])
-                        # TODO ADD Vertex color later
-                    elif toks[0] == 'vn':
-                        self.vertices_normals.append([float(v) for v in toks[1:]])
-                    elif toks[0] == 'vt':
-                        self.vertices_texture.append([float(v) for v in toks[1:]])
-                    elif toks[0] == 'f':
-                        poly = [parse_vertex(vstr) for vstr in toks[1:]]
-                        if triangulate:
-                            for i in range(2, len(poly)):
-                                self.faces.append((poly[0], poly[i - 1], poly[i]))
-                                self.mtllibs[0].mtls[cur_usemtl].append_face(faces_counter)
-                                faces_counter += 1
-                        else:
-                            self.faces.append(poly)
-                            self.mtllibs[0].mtls[cur_usemtl].append_face(faces_counter)
-                            faces_counter += 1
-
-                    elif toks[0] == 'mtllib':
-                        _path = os.path.join(os.path.dirname(filename), toks[1])
-                        mat = MaterialLibrary.load_mtlib(_path)
-                        if (len(self.mtllibs) == 1) and self.mtllibs[0].name == "Default_mtl":
-                            self.mtllibs[0] = mat
-                        else:
-                            self.mtllibs.append(mat)
-
-                    elif toks[0] == 'usemtl':
-                        cur_usemtl = self.mtllibs[0].index_of(toks[1])
-                        if cur_usemtl == -1:
-                            print("Material id:{} does not exist in material file".format(toks[1]))
-
-            self.vertices = np.array(self.vertices)[:, :3]
-            _faces = np.array(self.faces)
-            self.faces = _faces[:, :, 0]
-            self.faces_texture_indices = _faces[:, :, 1]
-            self.faces_norm_indices = _faces[:, :, 2]
-            self.num_vertices = self.vertices.shape[0]
-            self.num_faces = self.faces.shape[0]
-            self.vertex_per_face = self.faces[0].shape[0]
-        except FileNotFoundError:
-            print("Error 003: file {} not found".format(filename))
-            sys.exit()
-
-    def set_vertices(self, vertices_list):
         self.num_vertices = vertices_list.shape[0]
-        self.vertices = vertices_list.copy()
+        self.vertices = vertices_list.copy() if copy else np.asarray(vertices_list)
+        self._vertices_changed()
 
-    def set_faces(self, faces):
-        self.faces = faces.copy()
-        self.faces_texture_indices = faces.copy()
-        self.faces_norm_indices = [-1] * np.ones(shape=faces.copy().shape)
-        self.mtllibs[0].mtls[0].face_indices = list(range(0, len(faces)))
+    def update_vertices(self, vertices_list):
+        """
+        write new positions in the current vertex array, without allocating a new one. The vertices are
+        replaced by a copy when the shapes differ or the current array is read-only.
+        """
+        vertices = self.vertices
+        if isinstance(vertices, np.ndarray) and vertices.flags.writeable and \
+                vertices.shape == np.shape(vertices_list):
+            np.copyto(vertices, vertices_list)
+            self._vertices_changed()
+        else:
+            self.set_vertices(np.asarray(vertices_list), copy=True)
 
+    def set_faces(self, faces, copy=True):
+        """
+        replace the faces, the texture indices are the vertex indices and the faces have no normal.
+        :param copy: False to borrow the array: the mesh then shares it with the caller, and uses it for
+        both the faces and the texture indices
+        """
+        if copy:
+            self.faces = faces.copy()
+            self.faces_texture_indices = faces.copy()
+        else:
+            self.faces = faces
+            self.faces_texture_indices = faces
+        self.faces_norm_indices = absent_indices(self.faces)
+        self.mtl_ids = np.zeros(len(faces), dtype=np.int64)
+        self.invalidate_caches()
 
     def set_attributes(self, **keywds):
         """
@@ -118,25 +263,28 @@ class WavefrontOBJ:
                 texture coordinates.
                 * mtllibs: bool: True to copy material file and ids.
                 * faces: bool: True to set faces
+                * copy: False to borrow the arrays instead of copying them (True by default)
 
         """
+        copy = keywds.get("copy", True)
 
         if "vertices" in keywds:
-            self.set_vertices(keywds["vertices"])
+            self.set_vertices(keywds["vertices"], copy=copy)
 
         if "faces" in keywds:
-            self.set_faces(keywds["faces"])
+            self.set_faces(keywds["faces"], copy=copy)
 
         if "vertices_texture" in keywds:
             if len(self.vertices) == len(keywds["vertices_texture"]):
-                self.vertices_texture = keywds["vertices_texture"].copy()
+                self.vertices_texture = keywds["vertices_texture"].copy() if copy else keywds["vertices_texture"]
             else:
                 # TODO: if we have less vertices we should fill the gap (first idea: set all the rest of 0,0)
                 print("Warning: 002a: Error of copying textcoords, target_object has different number vertices")
 
         if "faces_texture_indices" in keywds:
             if len(self.faces) == len(keywds["faces_texture_indices"]):
-                self.faces_texture_indices = keywds["faces_texture_indices"].copy()
+                self.faces_texture_indices = keywds["faces_texture_indices"].copy() if copy else \
+                    keywds["faces_texture_indices"]
             else:
                 # TODO: if we have less faces we should add a default mtl and assign it's value to the rest
                 print("Warning: 002b: Error of copying faces_texture_indices, target_object has different nb faces")
@@ -149,12 +297,222 @@ class WavefrontOBJ:
 
         if "mtlid" in keywds:
             self.mtlid = keywds["mtlid"].copy()
+        self.invalidate_caches()
+
+    def render_buffers(self):
+        """
+        single-index buffers of the triangulated faces: one buffer vertex per distinct (vid, tid, nid)
+        corner with its position, uv and normal, see tools/buffers.py. The buffers are cached until the
+        mesh is edited through its methods, call invalidate_caches after changing its arrays in place.
+        """
+        topology_arrays = (self.faces, self.faces_texture_indices, self.faces_norm_indices)
+        if self._topology is None or not _same_arrays(self._topology[0], topology_arrays):
+            self._topology = (topology_arrays, build_render_buffers(*topology_arrays))
+            self._buffers = None
+        vertex_arrays = (self.vertices, self.vertices_texture, self.vertices_normals)
+        if self._buffers is None or not _same_arrays(self._buffers[0], vertex_arrays):
+            self._buffers = (vertex_arrays, self._topology[1].gather(*vertex_arrays))
+        return self._buffers[1]
+
+    def normal_topology(self):
+        """
+        triangulation of the faces used by the normal computations, cached until the faces change.
+        """
+        if self._normal_topology is None or self._normal_topology[0] is not self.faces or \
+                self._normal_topology[1].num_vertices != len(self.vertices):
+            self._normal_topology = (self.faces, NormalTopology(self.faces, len(self.vertices)))
+        return self._normal_topology[1]
+
+    def _cached_normals(self, key, compute):
+        if self._normals is None or self._normals[0] is not self.vertices:
+            self._normals = (self.vertices, {})
+        if key not in self._normals[1]:
+            self._normals[1][key] = compute(self.normal_topology())
+        return self._normals[1][key]
+
+    def face_normals(self):
+        """
+        M x 3 unit normals of the faces, cached until the vertices or faces change.
+        """
+        return self._cached_normals('face', lambda topology: topology.face_normals(self.vertices))
+
+    def vertex_normals(self, weighting='area'):
+        """
+        N x 3 unit normals of the vertices computed from the faces, cached until the vertices or faces change.
+        :param weighting: 'area', 'angle' or 'uniform' weights of the incident faces, see tools/normals.py
+        """
+        return self._cached_normals(weighting, lambda topology: topology.vertex_normals(self.vertices, weighting))
+
+    def compute_normals(self, weighting='area'):
+        """
+        replace the normals (vn) by the vertex normals, each corner uses the normal of its vertex.
+        """
+        self.vertices_normals = self.vertex_normals(weighting)
+        self.faces_norm_indices = self.faces.copy()
+        self._topology = None
+        self._buffers = None
+
+    def bvh(self, leaf_size=LEAF_SIZE):
+        """
+        bounding volume hierarchy of the faces for ray casting and closest point queries, see tools/bvh.py.
+        It is cached until the vertices or faces change.
+        """
+        if self._bvh is None or self._bvh[0] is not self.vertices or self._bvh[1] is not self.faces or \
+                self._bvh[2].leaf_size != leaf_size:
+            self._bvh = (self.vertices, self.faces, BVH.from_mesh(self, leaf_size))
+        return self._bvh[2]
+
+    def invalidate_caches(self):
+        """
+        drop the data computed from the mesh arrays (render buffers, normals, bvh).
+        """
+        self._topology = None
+        self._buffers = None
+        self._normal_topology = None
+        self._normals = None
+        self._bvh = None
+
+    def _vertices_changed(self):
+        # the topology is still valid, only the attributes are gathered again
+        self._buffers = None
+        self._normals = None
+        self._bvh = None
+
+    def triangulate(self):
+        """
+        fan triangulation of the faces, the triangles keep the material of their face.
+        """
+        faces = self.faces if isinstance(self.faces, PolygonArray) else PolygonArray.from_dense(self.faces)
+        index, face_ids = fan_triangles(faces.offsets)
+        self.faces = faces.values[index]
+        if len(self.faces_texture_indices) > 0:
+            self.faces_texture_indices = flat_indices(self.faces_texture_indices)[index]
+        if len(self.faces_norm_indices) > 0:
+            self.faces_norm_indices = flat_indices(self.faces_norm_indices)[index]
+        self.mtl_ids = self.mtl_ids[face_ids]
+        self.invalidate_caches()
+        self.num_faces = len(self.faces)
+        self.vertex_per_face = 3
+
+    def weld(self, tolerance=0., texture_tolerance=0., normal_tolerance=0., compact=True):
+        """
+        merge duplicate vertices, texture coordinates and normals, and remap the face indices.
+        :param tolerance: vertices rounding to the same multiple of tolerance are merged, 0 for identical ones
+        :param texture_tolerance: same for the texture coordinates, None to keep them all
+        :param normal_tolerance: same for the normals, None to keep them all
+        :param compact: also remove the vertices, texture coordinates and normals used by no face
+        :return: new index of each previous vertex, -1 for removed vertices
+        """
+        vertex_map = self._weld_array("vertices", "faces", tolerance, compact)
+        self._weld_array("vertices_texture", "faces_texture_indices", texture_tolerance, compact)
+        self._weld_array("vertices_normals", "faces_norm_indices", normal_tolerance, compact)
+        self.num_vertices = len(self.vertices)
+        self.invalidate_caches()
+        return vertex_map
+
+    def _weld_array(self, name, indices_name, tolerance, compact):
+        """
+        weld one attribute array and remap the face indices referring to it.
+        :return: new index of each previous entry, -1 for removed entries
+        """
+        values, indices = getattr(self, name), getattr(self, indices_name)
+        mapping = np.arange(len(values), dtype=np.int64)
+        if len(values) == 0:
+            return mapping
+        if tolerance is not None:
+            keep, mapping = weld_points(values, tolerance)
+            if len(keep) < len(values):
+                values = np.asarray(values)[keep]
+                indices = remap_indices(indices, mapping)
+        if compact:
+            keep, used = used_mapping(len(values), indices)
+            if len(keep) < len(values):
+                values = np.asarray(values)[keep]
+                indices = remap_indices(indices, used)
+                mapping = used[mapping]
+        setattr(self, name, values)
+        setattr(self, indices_name, indices)
+        return mapping
+
+    def decimate(self, target_faces, feature_weight=FEATURE_WEIGHT):
+        """
+        simplified copy of the mesh by quadric edge collapses, see tools/decimation.py.
+        :param target_faces: number of triangles of the copy (the faces are triangulated)
+        :param feature_weight: weight of the borders, UV seams and material boundaries in the collapse costs
+        """
+        return self.levels_of_detail([target_faces], feature_weight)[0]
+
+    def levels_of_detail(self, targets, feature_weight=FEATURE_WEIGHT):
+        """
+        simplified copies of the mesh with decreasing numbers of triangles, each level continues the
+        decimation of the previous one. UV seams and material boundaries are kept.
+        :param targets: number of triangles of each level
+        :return: the levels, in the order of targets
+        """
+        decimator = Decimator(self.vertices, self.faces, self.faces_texture_indices, self.faces_norm_indices,
+                              self.mtl_ids, self.vertices_texture, feature_weight)
+        levels = {}
+        for target in sorted(set(targets), reverse=True):
+            decimator.decimate(target)
+            levels[target] = self._decimated_mesh(*decimator.arrays())
+        return [levels[target] for target in targets]
+
+    def _decimated_mesh(self, triangles, texture_ids, normal_ids, mtl_ids):
+        """
+        mesh of the triangles of a decimation, with the vertices, texture coordinates and normals they use.
+        """
+        obj_file = WavefrontOBJ()
+        obj_file.name = self.name
+        obj_file.mtllibs = list(self.mtllibs)
+        keep, mapping = used_mapping(len(self.vertices), triangles)
+        obj_file.vertices = np.asarray(self.vertices)[keep]
+        obj_file.faces = remap_indices(triangles, mapping)
+        for name, indices_name, ids in (("vertices_texture", "faces_texture_indices", texture_ids),
+                                        ("vertices_normals", "faces_norm_indices", normal_ids)):
+            values = getattr(self, name)
+            if len(values) == 0:
+                setattr(obj_file, indices_name, absent_indices(obj_file.faces))
+                continue
+            keep, mapping = used_mapping(len(values), ids)
+            setattr(obj_file, name, np.asarray(values)[keep])
+            setattr(obj_file, indices_name, remap_indices(ids, mapping))
+        obj_file.mtl_ids = mtl_ids
+        obj_file.num_vertices = len(obj_file.vertices)
+        obj_file.num_faces = len(obj_file.faces)
+        obj_file.vertex_per_face = 3
+        return obj_file
+
+    def save_levels_of_detail(self, targets, filename=None, feature_weight=FEATURE_WEIGHT, precision=None):
+        """
+        save levels of detail next to the mesh file: name_lod1.obj has the most triangles, they use the
+        material libraries of the mesh.
+        :param targets: number of triangles of each level
+        :param filename: path the level names are made from, the path of the loaded mesh by default
+        :return: the paths of the levels, in the order of targets
+        """
+        filename = filename or self.path
+        if filename is None:
+            raise ValueError("Error 014: the mesh has no path, give the filename of the levels of detail")
+        root = os.path.splitext(filename)[0]
+        levels = self.levels_of_detail(targets, feature_weight)
+        ranks = {target: rank + 1 for rank, target in enumerate(sorted(set(targets), reverse=True))}
+        paths = []
+        for target, level in zip(targets, levels):
+            path = "{}_lod{}.obj".format(root, ranks[target])
+            level.save_obj(path, precision=precision)
+            level.path = path
+            paths.append(path)
+        return paths
 
     def export_pymesh(self):
         """
         export the current object instance to a pymesh object.
         """
+        # pymesh is optional, it is only imported here
+        pymesh = import_optional('pymesh', 'export_pymesh')
         if len(self. vertices) > 0:
+            if isinstance(self.faces, PolygonArray):
+                return pymesh.form_mesh(self.vertices, self.faces.triangulate()[0])
             return pymesh.form_mesh(self.vertices, self.faces)
         else:
             print("Error 010: Error of creating Pymesh object")
@@ -164,14 +522,19 @@ class WavefrontOBJ:
         """
         export mesh information.
         """
+        if isinstance(self.faces, PolygonArray) and len(self.faces) > 0 and not self.faces.is_uniform():
+            vertex_per_face = "{}-{}".format(self.faces.sizes.min(), self.faces.sizes.max())
+        else:
+            vertex_per_face = self.vertex_per_face
         msg = "Mesh:\t{}, {} vertices, {} faces, {} vertices per face".format(self.name,
                                                                              self.vertices.shape[0],
-                                                                             self.faces.shape[0],
-                                                                             self.vertex_per_face)
+                                                                             len(self.faces),
+                                                                             vertex_per_face)
         if len(self.mtllibs) > 0:
             msg += "\n\tmtls:"
-            for mtl in self.mtllibs:
-                msg += "[{}, {},  {} v_indices]".format(mtl.name, mtl.get_mtl_names(), len(mtl.mtls[0].face_indices))
+            for index, mtl in enumerate(self.mtllibs):
+                num_faces = np.count_nonzero(self.mtl_ids == 0) if index == 0 else 0
+                msg += "[{}, {},  {} v_indices]".format(mtl.name, mtl.get_mtl_names(), num_faces)
 
         if len(self.vertices_texture) > 0:
             msg += "\n\t{} vertices_texture".format(len(self.vertices_texture))
@@ -187,54 +550,112 @@ class WavefrontOBJ:
 
         return msg
 
-    def save_obj(self, filename: str, save_materials=False, save_textures=False):
+    def save_obj(self, filename: str, save_materials=False, save_textures=False, precision=None):
         """
         save the current mesh object in a file.
         :param filename: export file path
         :param save_materials: save material files in the target folder
         :param save_textures: save texture image files in the target folder
+        :param precision: number of decimals of the coordinates, None to write them exactly
         """
-        with open(filename, 'w') as ofile:
+        profile = new_profile('save_obj', filename)
+        with open(filename, 'w', buffering=WRITE_BUFFER) as ofile:
             ofile.write("#generated with MeshPyIO\n")
             # Materials
+            start = profile.clock()
             for mlib in self.mtllibs:
                 ofile.write('mtllib {}\n'.format(mlib.name))
                 if save_materials:
-                    for mtl in self.mtllibs:
-                        mtl.save(os.path.join(os.path.dirname(filename), mtl.name), save_texture=save_textures)
+                    mlib.save(os.path.join(os.path.dirname(filename), mlib.name), save_texture=save_textures)
+            profile.stop('mtllib', start, len(self.mtllibs))
             # Vertices
-            for vtx in self.vertices:
-                vertex_position = 'v '+' '.join(['{}'.format(v) for v in vtx])
-                # TODO ADD Vertex color later
-                ofile.write(vertex_position+'\n')
+            # TODO ADD Vertex color later
+            start = profile.clock()
+            write_vectors(ofile, 'v', self.vertices, precision)
             # Texture coordinates
-            for tex in self.vertices_texture:
-                ofile.write('vt '+' '.join(['{}'.format(vt) for vt in tex])+'\n')
+            write_vectors(ofile, 'vt', self.vertices_texture, precision)
             # Vertices_normals
-            for nrm in self.vertices_normals:
-                ofile.write('vn '+' '.join(['{}'.format(vn) for vn in nrm])+'\n')
-
-            # Faces and usemtls
-            for _mtlib in self.mtllibs:
-                for _mtl in _mtlib.mtls:
-                    if len(_mtl.face_indices) > 1:
-                        ofile.write('usemtl {}\n'.format(_mtl.newmtl))
-                        for _face_index in _mtl.face_indices:
-                            pstr = 'f'
-                            vstr = ''
-                            for index in range(self.vertex_per_face):
-                                # face index
-                                vstr += " {}".format(self.faces[_face_index][index]+1)
-                                # faces_texture_indices
-                                if len(self.faces_texture_indices) > 0 and self.faces_texture_indices[_face_index][0] >= 0:
-                                    vstr += "/{}".format(self.faces_texture_indices[_face_index][index]+1)
-                                # faces_norm_indices
-                                if len(self.faces_norm_indices) > 0 and self.faces_norm_indices[_face_index][0] >= 0:
-                                    if len(self.faces_texture_indices) < 0 or self.faces_texture_indices[_face_index][0] < 0:
-                                        vstr += "/"
-                                    vstr += "/{}".format(self.faces_norm_indices[_face_index][index]+1)
-                            pstr += vstr
-                            ofile.write(pstr+'\n')
+            write_vectors(ofile, 'vn', self.vertices_normals, precision)
+            profile.stop('vectors', start,
+                         len(self.vertices) + len(self.vertices_texture) + len(self.vertices_normals))
+
+            # Faces and usemtls, grouped by material
+            start = profile.clock()
+            order, bounds = self.material_groups()
+            for index, _mtl in enumerate(self.mtllibs[0].mtls):
+                if bounds[index + 1] > bounds[index]:
+                    ofile.write('usemtl {}\n'.format(_mtl.newmtl))
+                    write_faces(ofile, self.faces, self.faces_texture_indices, self.faces_norm_indices,
+                                order[bounds[index]:bounds[index + 1]])
+            profile.stop('faces', start, len(self.faces))
+            start = profile.clock()
+        profile.stop('close', start, nbytes=os.path.getsize(filename) if profile else 0)
+        self.profile = profile.finish()
+
+    def save_binary(self, filename: str):
+        """
+        save the mesh in the native binary format (.mpm): the arrays are written as they are in memory,
+        with the material libraries, so load_binary needs no parsing and no mtl file.
+        :param filename: export file path
+        """
+        profile = new_profile('save_binary', filename)
+        start = profile.clock()
+        arrays = {"vertices": np.asarray(self.vertices), "vertices_texture": np.asarray(self.vertices_texture),
+                  "vertices_normals": np.asarray(self.vertices_normals), "mtl_ids": np.asarray(self.mtl_ids)}
+        csr = isinstance(self.faces, PolygonArray)
+        for name in ("faces", "faces_texture_indices", "faces_norm_indices"):
+            faces = getattr(self, name)
+            arrays[name] = faces.values if isinstance(faces, PolygonArray) else np.asarray(faces)
+        if csr:
+            arrays["face_offsets"] = self.faces.offsets
+        meta = {"name": self.name, "path": self.path, "vertex_per_face": self.vertex_per_face, "csr": csr,
+                "mtllibs": [mtllib.to_dict() for mtllib in self.mtllibs]}
+        write_mesh(filename, arrays, meta)
+        profile.stop('write', start, len(self.faces), os.path.getsize(filename) if profile else 0)
+        self.profile = profile.finish()
+
+    def load_binary(self, filename: str, mmap_mode='c'):
+        """
+        Load a mesh saved with save_binary. The arrays are views of the memory-mapped file, nothing is copied.
+        :param mmap_mode: 'c' the arrays can be modified in memory (copy on write), 'r' read-only arrays,
+        'r+' modifications are written to the file
+        """
+        profile = new_profile('load_binary', filename)
+        start = profile.clock()
+        try:
+            arrays, meta = read_mesh(filename, mmap_mode)
+        except FileNotFoundError as error:
+            raise FileNotFoundError("Error 003: file {} not found".format(filename)) from error
+        self.path = filename
+        self.name = meta["name"]
+        self.mtllibs = [MaterialLibrary.from_dict(mtllib) for mtllib in meta["mtllibs"]]
+        self.vertices = arrays["vertices"]
+        self.vertices_texture = arrays["vertices_texture"]
+        self.vertices_normals = arrays["vertices_normals"]
+        if meta["csr"]:
+            offsets = arrays["face_offsets"]
+            self.faces, self.faces_texture_indices, self.faces_norm_indices = \
+                [PolygonArray(arrays[name], offsets) if len(arrays[name]) > 0 else arrays[name]
+                 for name in ("faces", "faces_texture_indices", "faces_norm_indices")]
+        else:
+            self.faces = arrays["faces"]
+            self.faces_texture_indices = arrays["faces_texture_indices"]
+            self.faces_norm_indices = arrays["faces_norm_indices"]
+        self.mtl_ids = arrays["mtl_ids"]
+        self.vertex_per_face = meta["vertex_per_face"]
+        self.invalidate_caches()
+        self.num_vertices = len(self.vertices)
+        self.num_faces = len(self.faces)
+        profile.stop('map', start, self.num_faces)
+        self.profile = profile.finish()
+
+    def _texture_image(self):
+        """
+        texture image of the first material in [0, 1], decoded once per process by the texture cache.
+        """
+        # texture paths are relative to the material file
+        texture_path = os.path.join(self.mtllibs[0].path or os.path.dirname(self.path), self.mtllibs[0].mtls[0].map_Kd)
+        return as_float(TEXTURE_CACHE.get(texture_path))
 
     def get_vertices_colors(self, face_indices, resolution_optimale=256):
         if self.mtllibs[0].mtls[0].map_Kd == "":
@@ -245,13 +666,31 @@ class WavefrontOBJ:
             print("Wavefront error: No vertices texture ")
             return False
 
-        texture_path = os.path.join(os.path.dirname(self.path), self.mtllibs[0].mtls[0].map_Kd)
-        texture_img = imread(texture_path) / 255
+        texture_img = self._texture_image()
         all_colors = np.reshape(texture_img, [resolution_optimale**2, -1])
         colors = all_colors[face_indices, :]
         return colors
 
-    def get_verts_colors(self, resolution_optimale=256):
+    def get_texture_colors(self, mode='nearest', per_corner=False):
+        """
+        colors of the texture of the first material at the texture coordinates.
+        :param mode: 'nearest' or 'bilinear' filtering
+        :param per_corner: colors of the face corners (like faces_texture_indices) instead of the colors of
+        the texture coordinates, corners without texture coordinates are black
+        :return: N x C colors, M x Nv x C per corner (C for PolygonArray faces)
+        """
+        texture_img = self._texture_image()
+        if not per_corner:
+            return sample_texture(texture_img, self.vertices_texture, mode)
+        indices = self.faces_texture_indices
+        if isinstance(indices, PolygonArray):
+            indices = indices.values
+        indices = np.asarray(indices)
+        colors = sample_texture(texture_img, self.vertices_texture[indices], mode)
+        colors[indices < 0] = 0
+        return colors
+
+    def get_verts_colors(self, resolution_optimale=256, mode='nearest'):
         if self.mtllibs[0].mtls[0].map_Kd == "":
             print("Wavefront error: No texture to load")
             return False
@@ -260,47 +699,73 @@ class WavefrontOBJ:
             print("Wavefront error: No vertices texture ")
             return False
 
-        texture_path = os.path.join(os.path.dirname(self.path), self.mtllibs[0].mtls[0].map_Kd)
-        texture_img = imread(texture_path) / 255
-        colors = np.empty(shape=(0, 3), dtype=int)
-        for vertex_texture in self.vertices_texture:
-            col = np.array(texture_img[conv_np_cv2(vertex_texture, texture_img)]).reshape(1,3)
-            colors = np.append(colors, col, axis=0)
-        return colors
+        return self.get_texture_colors(mode)[:, :3]
 
-    def render(self, h=1024, w=1024, centralized=True):
+    def render(self, h=1024, w=1024, centralized=True, workers=1, tile_size=TILE_SIZE):
         if centralized:
             self.origin_to_center()
             self.vertices *= [3, 3, 1]
             self.vertices += [w/2, h/2, 0]
+            self._vertices_changed()
 
+        from .tools.render import render_texture
+        profile = new_profile('render', self.path)
         # load texture
-        texture_path = os.path.join(os.path.dirname(self.path), self.mtllibs[0].mtls[0].map_Kd)
-        texture_img = imread(texture_path) / 255
-
-        # convert vertices texture to uvs
-        uvs = np.empty(shape=(0, 2))
-        print(uvs.shape)
-        for vertex_texture in self.vertices_texture:
-            col = np.array(conv_np_cv2(vertex_texture, texture_img)).reshape(1,2)
-            uvs = np.append(uvs, col, axis=0)
-        print(uvs.shape)
-
-        img = render_texture(self.vertices.T, uvs.T.tolist(), self.faces.T, texture_img, h, w, c=3)
+        start = profile.clock()
+        texture_img = self._texture_image()
+        profile.stop('texture', start, nbytes=texture_img.nbytes)
+
+        # one vertex per (vid, tid, nid) corner, so vertices on uv seams get all their uvs
+        start = profile.clock()
+        buffers = self.render_buffers()
+        profile.stop('buffers', start, len(buffers))
+
+        if buffers.uvs is None:
+            print("Wavefront error: No vertices texture to render")
+            return False
+
+        # color of each triangle: the texture at the center of its uvs
+        start = profile.clock()
+        colors = sample_texture(texture_img, buffers.uvs[buffers.triangles].mean(axis=1))[:, :3]
+        profile.stop('colors', start, len(colors))
+
+        start = profile.clock()
+        positions = buffers.positions.T
+        img = render_texture(positions, positions, buffers.triangles.T, colors.T, h, w, c=3,
+                             workers=workers, tile_size=tile_size)
+        profile.stop('render_texture', start, len(buffers.triangles))
+        profile.finish()
         return img
 
-    def render_colors(self, h=1024, w=1024, centralized=True, resolution_optimale=256):
+    def render_colors(self, h=1024, w=1024, centralized=True, resolution_optimale=256, workers=1,
+                      tile_size=TILE_SIZE):
         if centralized:
             self.origin_to_center()
             self.vertices *= [3, 3, 1]
             self.vertices += [w/2, h/2, 0]
-
-        colors = self.get_verts_colors(resolution_optimale=resolution_optimale)
-        img = render_texture_colors(self.vertices.T, colors.T, self.faces.T, h, w, c=3)
+            self._vertices_changed()
+
+        from .tools.render import render_texture_colors
+        profile = new_profile('render_colors', self.path)
+        start = profile.clock()
+        buffers = self.render_buffers()
+        profile.stop('buffers', start, len(buffers))
+        start = profile.clock()
+        if self.mtllibs[0].mtls[0].map_Kd == "" or buffers.uvs is None:
+            print("Wavefront error: No texture or vertices texture to render")
+            return False
+        colors = sample_texture(self._texture_image(), buffers.uvs)[:, :3]
+        profile.stop('colors', start, len(colors))
+        start = profile.clock()
+        img = render_texture_colors(buffers.positions.T, colors.T, buffers.triangles.T, h, w, c=3, workers=workers,
+                                    tile_size=tile_size)
+        profile.stop('render_texture_colors', start, len(buffers.triangles))
+        profile.finish()
         return img
 
     def origin_to_center(self):
         self.vertices -= np.average(self.vertices, axis=0)
+        self._vertices_changed()
         print("origin changed to the center")
 
 
@@ -308,7 +773,8 @@ class WavefrontOBJ:
     def form_mesh(*args, **keywds):
         """
         create a mesh instance using some or all parameters. The vertices and faces are always required.
-        :param keywds: the parameters could be used.
+        :param keywds: the parameters could be used. The arrays are borrowed (shared with the caller)
+        unless copy=True is given.
         """
         obj_file = WavefrontOBJ()
         if ("vertices" not in keywds) or ("faces" not in keywds):
@@ -319,41 +785,104 @@ class WavefrontOBJ:
             print("Error: Could not form mesh: Vertices must be 2D or 3D")
             return None
 
-        if keywds["faces"].shape[1] not in [3, 4]:
+        if isinstance(keywds["faces"], PolygonArray):
+            if len(keywds["faces"]) > 0 and keywds["faces"].sizes.min() < 3:
+                print("Error: Could not form mesh: faces must have at least 3 vertices")
+                return None
+        elif keywds["faces"].shape[1] not in [3, 4]:
             print("Error: Could not form mesh: faces must be tri or quad")
             return None
 
-        obj_file.vertices = keywds["vertices"]
-        obj_file.faces = keywds["faces"]
+        copy = keywds.get("copy", False)
+        obj_file.vertices = keywds["vertices"].copy() if copy else keywds["vertices"]
+        obj_file.faces = keywds["faces"].copy() if copy else keywds["faces"]
         obj_file.num_vertices = obj_file.vertices.shape[0]
-        obj_file.num_faces = obj_file.faces.shape[0]
-        obj_file.vertex_per_face = obj_file.faces[0].shape[0]
+        obj_file.num_faces = len(obj_file.faces)
+        if isinstance(obj_file.faces, PolygonArray):
+            obj_file.vertex_per_face = int(obj_file.faces.sizes[0]) if obj_file.faces.is_uniform() and \
+                obj_file.num_faces > 0 else 0
+        else:
+            obj_file.vertex_per_face = obj_file.faces[0].shape[0]
 
-        if "faces_texture_indices" in keywds:
-            obj_file.faces_texture_indices = keywds["faces_texture_indices"]
-        if "faces_norm_indices" in keywds:
-            obj_file.faces_norm_indices = keywds["faces_norm_indices"]
+        for name in ("faces_texture_indices", "faces_norm_indices"):
+            if name in keywds:
+                setattr(obj_file, name, keywds[name].copy() if copy else keywds[name])
+        # all faces use the default material unless material ids are given
+        obj_file.mtl_ids = keywds.get("mtl_ids", np.zeros(obj_file.num_faces, dtype=np.int64))
+        if copy:
+            obj_file.mtl_ids = np.array(obj_file.mtl_ids, dtype=np.int64)
 
         return obj_file
 
     @staticmethod
-    def load_obj(filename: str, triangulate=False):
+    def load_obj(filename: str, triangulate=False, cache=None, csr=None, workers=None):
         """
         Load a mesh object from an obj file.
+        :param cache: optional ObjCache used to skip the parsing of files loaded before
+        :param csr: store faces as PolygonArray, see load
+        :param workers: number of threads parsing the file, see load
         """
         # parses a vertex record as either vid, vid/tid, vid//nid or vid/tid/nid
         # and returns a 3-tuple where unparsed values are replaced with -1
         if not os.path.isfile(filename):
-            print("Wavefront Error: {} is not a file".format(filename))
-            sys.exit()
+            raise FileNotFoundError("Wavefront Error: {} is not a file".format(filename))
         if filename.split(sep='.')[-1].upper() != "OBJ":
-            print("Wavefront Error: {} is not an obj file".format(filename))
-            sys.exit()
+            raise ValueError("Wavefront Error: {} is not an obj file".format(filename))
+
+        obj_file = WavefrontOBJ()
+        obj_file.load(filename, triangulate=triangulate, cache=cache, csr=csr, workers=workers)
+        return obj_file
+
 
+    @staticmethod
+    def load_mpm(filename: str, mmap_mode='c'):
+        """
+        Load a mesh saved in the native binary format, see load_binary.
+        """
         obj_file = WavefrontOBJ()
-        obj_file.load(filename, triangulate=triangulate)
+        obj_file.load_binary(filename, mmap_mode=mmap_mode)
         return obj_file
 
+    @staticmethod
+    def iter_chunks(filename: str, chunk_faces=1 << 18, triangulate=False, block_size=BLOCK_SIZE, csr=None):
+        """
+        Read an obj file by chunks, without keeping the whole mesh in memory.
+        Vertex indices of the faces are global, the offsets of each chunk give the global
+        index of its first vertex, texture coordinate, normal and face.
+        :param chunk_faces: maximum number of faces per chunk
+        :param triangulate: triangulate the polygons
+        :param block_size: size of the text blocks read from the file, it bounds the size of the chunks
+        :param csr: store faces as PolygonArray, see load
+        :return: generator of ObjChunk
+        """
+        mesh = WavefrontOBJ()
+        mesh.path = filename
+        mesh.name = os.path.basename(filename)
+        usemtl_ids = np.zeros(0, dtype=np.int64)
+        offsets = np.zeros(4, dtype=np.int64)
+        for records in iter_records(filename, block_size):
+            mesh._load_mtllibs(records.mtllibs)
+            if len(records.usemtl) > len(usemtl_ids):
+                usemtl_ids = np.append(usemtl_ids, mesh._usemtl_ids(records.usemtl[len(usemtl_ids):]))
+            corners, face_sizes, face_usemtl = mesh._polygons(records, triangulate)
+            faces, faces_texture_indices, faces_norm_indices, _ = mesh._face_arrays(corners, face_sizes, csr)
+            mtl_ids = mesh._material_ids(usemtl_ids, face_usemtl)
+            vertices = (records.vertices[:, :3], records.vertices_texture, records.vertices_normals)
+            for start in range(0, max(len(faces), 1), chunk_faces):
+                chunk = ObjChunk(mesh.mtllibs)
+                # the vertex records of a block go with its first chunk
+                if start == 0:
+                    chunk.vertices, chunk.vertices_texture, chunk.vertices_normals = vertices
+                chunk.vertex_offset, chunk.texture_offset, chunk.normal_offset, chunk.face_offset = offsets
+                if len(faces) > 0:
+                    chunk.faces = faces[start:start + chunk_faces]
+                    chunk.faces_texture_indices = faces_texture_indices[start:start + chunk_faces]
+                    chunk.faces_norm_indices = faces_norm_indices[start:start + chunk_faces]
+                    chunk.mtl_ids = mtl_ids[start:start + chunk_faces]
+                offsets += [len(chunk.vertices), len(chunk.vertices_texture), len(chunk.vertices_normals),
+                            len(chunk.faces)]
+                yield chunk
+
 
 if __name__ == "__main__":
     path = os.path.join(os.path.expanduser("files/input"), "projected_6.obj")
@@ -366,11 +895,11 @@ if __name__ == "__main__":
     #print(obj_pymesh.num_vertices)2
     #obj.save_obj("files/file_test.obj", save_materials=True, save_textures=True)
     #print(obj.mtlid[:3])
-    #print(len(obj.mtllibs[0].mtls[1].face_indices))
-    #print(obj.mtllibs[0].mtls[1].face_indices[:10])
+    #print(len(obj.material_faces(1)))
+    #print(obj.material_faces(1)[:10])
 
-    #print(len(obj.mtllibs[0].mtls[0].face_indices))
-    #print(obj.mtllibs[0].mtls[0].face_indices[:10])
+    #print(len(obj.material_faces(0)))
+    #print(obj.material_faces(0)[:10])
 
     #obj_2 = WavefrontOBJ.load_obj(file_2, triangulate=True)
     #print(obj_2.to_string())
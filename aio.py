@@ -0,0 +1,159 @@
+'''
+asyncio API: load and save meshes without blocking the event loop.
+
+Parsing and writing run in an executor (the default thread pool of the loop,
+or the one given). While the geometry of a file is parsed, its material
+libraries are read and its textures decoded into the texture cache; when
+saving, the material files and the texture copies are written at the same
+time as the geometry. A semaphore bounds how many files are processed at
+once, share one between calls to bound a whole service.
+
+    obj = await load_obj_async("meshes/cube.obj")
+    objs = await load_objs_async(paths, concurrency=8)
+    await save_obj_async(obj, "out/cube.obj", save_materials=True, save_textures=True)
+'''
+import asyncio
+import functools
+import os
+from shutil import copyfile
+
+from .Material import MaterialLibrary
+from .Wavefront import WavefrontOBJ
+from .tools.profiling import new_profile
+from .tools.texture_cache import TEXTURE_CACHE
+
+DEFAULT_CONCURRENCY = 4
+HEAD_SIZE = 1 << 16            # bytes searched for mtllib statements before the parsing
+
+
+def _run(executor, function, *args, **keywds):
+    return asyncio.get_running_loop().run_in_executor(executor, functools.partial(function, *args, **keywds))
+
+
+def head_mtllibs(filename, size=HEAD_SIZE):
+    '''
+    Material libraries named in the first bytes of an obj file. mtllib statements usually come
+    first, so the libraries can be read while the rest of the file is parsed.
+    '''
+    with open(filename, 'rb') as ifile:
+        head = ifile.read(size)
+    lines = head.split(b'\n')
+    if len(head) == size:
+        # the last line may be cut
+        lines = lines[:-1]
+    names = []
+    for line in lines:
+        toks = line.split()
+        if len(toks) > 1 and toks[0] == b'mtllib':
+            names.append(toks[1].decode())
+    return names
+
+
+def _read_mtllib(path):
+    if not os.path.isfile(path):
+        raise FileNotFoundError("Error 02: no file found, check path: {}".format(path))
+    return MaterialLibrary.load_mtlib(path)
+
+
+def _prefetch_texture(path):
+    try:
+        TEXTURE_CACHE.get(path)
+    except Exception as error:
+        # the texture is only needed for colors and renders, the mesh is still loaded
+        print("Warning: texture {} was not loaded: {}".format(path, error))
+
+
+async def _load_mtllib(path, directory, textures, executor):
+    mtllib = await _run(executor, _read_mtllib, path)
+    if textures:
+        await asyncio.gather(*[_run(executor, _prefetch_texture, os.path.join(mtllib.path or directory, mtl.map_Kd))
+                               for mtl in mtllib.mtls if mtl.has_texture()])
+    return mtllib
+
+
+async def load_obj_async(filename, triangulate=False, csr=None, cache=None, textures=True, executor=None,
+                         semaphore=None):
+    '''
+    Load a mesh from an obj file, see WavefrontOBJ.load.
+    Args:
+        textures: decode the textures into the texture cache while the file is parsed
+        executor: executor of the parsing and file reads, None for the default executor of the loop
+        semaphore: asyncio.Semaphore bounding the number of files processed at once
+    Raises:
+        FileNotFoundError if the file or one of its material libraries does not exist
+    '''
+    async with semaphore or asyncio.Semaphore(1):
+        if not os.path.isfile(filename):
+            raise FileNotFoundError("Error 003: file {} not found".format(filename))
+        profile = new_profile('load', filename)
+        obj = WavefrontOBJ()
+        obj.path = filename
+        directory = os.path.dirname(filename)
+
+        names = await _run(executor, head_mtllibs, filename)
+        libraries = {}
+        for name in names:
+            path = obj.mtllib_path(name)
+            if path not in libraries:
+                libraries[path] = asyncio.ensure_future(_load_mtllib(path, directory, textures, executor))
+        parsing = _run(executor, WavefrontOBJ._parse_records, filename, cache, profile)
+        try:
+            records = await parsing
+            # libraries named after the first bytes of the file
+            for name in records.mtllibs:
+                path = obj.mtllib_path(name)
+                if path not in libraries:
+                    libraries[path] = asyncio.ensure_future(_load_mtllib(path, directory, textures, executor))
+            loaded = dict(zip(libraries, await asyncio.gather(*libraries.values())))
+        except BaseException:
+            for task in libraries.values():
+                task.cancel()
+            raise
+
+        # _load_records finishes the profile
+        await _run(executor, obj._load_records, filename, records, triangulate, csr, profile, loaded)
+        return obj
+
+
+async def save_obj_async(obj, filename, save_materials=False, save_textures=False, precision=None, executor=None,
+                         semaphore=None):
+    '''
+    Save a mesh in an obj file, see WavefrontOBJ.save_obj. The material files and the texture copies
+    are written concurrently with the geometry.
+    '''
+    async with semaphore or asyncio.Semaphore(1):
+        jobs = [_run(executor, obj.save_obj, filename, precision=precision)]
+        if save_materials:
+            for mtllib in obj.mtllibs:
+                path = os.path.join(os.path.dirname(filename), mtllib.name)
+                jobs.append(_run(executor, mtllib.write, path))
+                if save_textures:
+                    jobs.extend(_run(executor, copyfile, source, target)
+                                for source, target in mtllib.texture_copies(path))
+        await asyncio.gather(*jobs)
+
+
+async def load_objs_async(filenames, concurrency=DEFAULT_CONCURRENCY, semaphore=None, return_exceptions=False,
+                          **options):
+    '''
+    Load many obj files, at most concurrency at once.
+    Args:
+        semaphore: shared asyncio.Semaphore, replaces concurrency
+        return_exceptions: return the exception of a failed file instead of raising it
+        options: arguments of load_obj_async
+    Returns:
+        the meshes in the order of filenames
+    '''
+    semaphore = semaphore or asyncio.Semaphore(concurrency)
+    return await asyncio.gather(*[load_obj_async(filename, semaphore=semaphore, **options)
+                                  for filename in filenames], return_exceptions=return_exceptions)
+
+
+async def save_objs_async(objs, filenames, concurrency=DEFAULT_CONCURRENCY, semaphore=None, return_exceptions=False,
+                          **options):
+    '''
+    Save many meshes, at most concurrency at once, see load_objs_async.
+    '''
+    semaphore = semaphore or asyncio.Semaphore(concurrency)
+    return await asyncio.gather(*[save_obj_async(obj, filename, semaphore=semaphore, **options)
+                                  for obj, filename in zip(objs, filenames)], return_exceptions=return_exceptions)
@@ -0,0 +1,222 @@
+'''
+Batch conversion of obj files with a pool of processes.
+
+Each file is loaded, checked, optionally triangulated and saved (or only
+stored in an ObjCache). A bad file is reported as a failure and does not
+stop the batch.
+
+Run from the parent directory of the package:
+    python -m MeshPyIO.batch "meshes/*.obj" --output converted --triangulate --workers 8
+'''
+import argparse
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .Wavefront import WavefrontOBJ
+from .tools.obj_cache import ObjCache
+from .tools.polygons import flat_indices
+
+
+class BatchResult:
+    def __init__(self, path, output=None):
+        """
+        outcome of the conversion of one file.
+        """
+        self.path = path
+        self.output = output
+        self.size = 0                  # input size in bytes
+        self.num_vertices = 0
+        self.num_faces = 0
+        self.seconds = 0.
+        self.error = None              # error message of a failed file
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def to_string(self):
+        if not self.ok:
+            return "FAILED {}: {}".format(self.path, self.error)
+        return "{}: {} vertices, {} faces, {:.1f} MB in {:.3f}s".format(
+            self.path, self.num_vertices, self.num_faces, self.size / 1e6, self.seconds)
+
+
+def find_obj_files(sources):
+    '''
+    Obj files of directories (searched recursively), glob patterns or file names, in alphabetical order.
+    '''
+    paths = []
+    for source in sources:
+        if os.path.isdir(source):
+            for root, _, files in os.walk(source):
+                paths.extend(os.path.join(root, name) for name in files if name.lower().endswith('.obj'))
+        else:
+            paths.extend(glob.glob(source) if glob.has_magic(source) else [source])
+    return sorted(set(paths))
+
+
+def output_paths(paths, output_dir):
+    '''
+    Output file of each input, keeping the layout of the input files below their common directory.
+    '''
+    if output_dir is None:
+        return [None] * len(paths)
+    root = os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in paths]) if paths else ''
+    return [os.path.join(output_dir, os.path.relpath(os.path.abspath(path), root)) for path in paths]
+
+
+def _same_file(path, other):
+    return os.path.realpath(path) == os.path.realpath(other)
+
+
+def check_mesh(obj):
+    '''
+    Check that the face indices of a mesh refer to existing vertices, texture coordinates and normals.
+    '''
+    for name, indices, count in (("vertex", obj.faces, len(obj.vertices)),
+                                 ("texture", obj.faces_texture_indices, len(obj.vertices_texture)),
+                                 ("normal", obj.faces_norm_indices, len(obj.vertices_normals))):
+        if len(indices) == 0:
+            continue
+        values = flat_indices(indices)
+        # -1 marks corners without texture or normal index
+        low = -1 if name != "vertex" else 0
+        if len(values) > 0 and (values.min() < low or values.max() >= count):
+            raise ValueError("Error 007: {} indices out of range [{}, {})".format(name, low, count))
+
+
+def convert_file(path, output=None, triangulate=False, cache_dir=None, save_materials=False, precision=None,
+                 validate=True, parse_workers=None):
+    '''
+    Load, check and save one file, errors are returned in the result instead of raised.
+    Args:
+        path: obj file
+        output: path of the converted file, None to only load it (and fill the cache)
+        triangulate: triangulate the polygons
+        cache_dir: directory of an ObjCache used to load the file
+        save_materials: also save the material libraries and textures next to the output
+        precision: number of decimals of the saved coordinates, None to write them exactly
+        validate: check the face indices
+        parse_workers: number of threads parsing the file, see WavefrontOBJ.load
+    Returns:
+        BatchResult
+    '''
+    result = BatchResult(path, output)
+    start = time.perf_counter()
+    try:
+        if not os.path.isfile(path):
+            raise FileNotFoundError("Error 003: file {} not found".format(path))
+        if output is not None and _same_file(path, output):
+            raise ValueError("Error 015: the output {} is the input file".format(output))
+        result.size = os.path.getsize(path)
+        cache = ObjCache(cache_dir) if cache_dir is not None else None
+        obj = WavefrontOBJ()
+        obj.load(path, triangulate=triangulate, cache=cache, workers=parse_workers)
+        if validate:
+            check_mesh(obj)
+        if output is not None:
+            if os.path.dirname(output):
+                os.makedirs(os.path.dirname(output), exist_ok=True)
+            obj.save_obj(output, save_materials=save_materials, save_textures=save_materials, precision=precision)
+        result.num_vertices = obj.num_vertices
+        result.num_faces = obj.num_faces
+    except Exception as error:
+        result.error = "{}: {}".format(type(error).__name__, error)
+    result.seconds = time.perf_counter() - start
+    return result
+
+
+def convert_batch(paths, output_dir=None, workers=None, callback=None, **options):
+    '''
+    Convert files in a pool of processes.
+    Args:
+        paths: obj files
+        output_dir: directory of the converted files, None to only load them
+        workers: number of processes, the number of cpus by default. 1 converts the files in this process
+        callback: function called with the BatchResult of each file as soon as it is done
+        options: options of convert_file
+    Returns:
+        BatchResult of each file, in the order of paths
+    Raises:
+        ValueError if output files would replace input files (output_dir is the input directory)
+    '''
+    outputs = output_paths(paths, output_dir)
+    overwritten = [path for path, output in zip(paths, outputs) if output is not None and _same_file(path, output)]
+    if overwritten:
+        raise ValueError("Error 015: the outputs in {} would replace {} input files ({}...), "
+                         "use another output directory".format(output_dir, len(overwritten), overwritten[0]))
+    workers = workers or os.cpu_count()
+    results = [None] * len(paths)
+    if workers == 1:
+        for index, (path, output) in enumerate(zip(paths, outputs)):
+            results[index] = convert_file(path, output, **options)
+            if callback is not None:
+                callback(results[index])
+        return results
+
+    # the processes already use the cpus, each one parses its file in one thread
+    options.setdefault("parse_workers", 1)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(convert_file, path, output, **options): index
+                   for index, (path, output) in enumerate(zip(paths, outputs))}
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                results[index] = future.result()
+            except Exception as error:
+                # the worker process died (out of memory...)
+                results[index] = BatchResult(paths[index], outputs[index])
+                results[index].error = "{}: {}".format(type(error).__name__, error)
+            if callback is not None:
+                callback(results[index])
+    return results
+
+
+def summary(results, seconds):
+    '''
+    Throughput of a batch.
+    Args:
+        results: BatchResult of the files
+        seconds: wall time of the batch
+    '''
+    done = [result for result in results if result.ok]
+    size = sum(result.size for result in done)
+    faces = sum(result.num_faces for result in done)
+    seconds = max(seconds, 1e-9)
+    msg = "{} files converted, {} failed in {:.2f}s: {:.1f} MB/s, {:.0f} faces/s".format(
+        len(done), len(results) - len(done), seconds, size / 1e6 / seconds, faces / seconds)
+    for result in results:
+        if not result.ok:
+            msg += "\n\t" + result.to_string()
+    return msg
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("sources", nargs='+', help="obj files, directories or glob patterns")
+    parser.add_argument("--output", default=None, help="directory of the converted files, none to only load them")
+    parser.add_argument("--triangulate", action='store_true')
+    parser.add_argument("--cache", default=None, help="ObjCache directory")
+    parser.add_argument("--save-materials", action='store_true', help="save the materials and textures")
+    parser.add_argument("--precision", type=int, default=None, help="number of decimals of the coordinates")
+    parser.add_argument("--no-validate", action='store_true', help="do not check the face indices")
+    parser.add_argument("--workers", type=int, default=None, help="number of processes, the number of cpus by default")
+    args = parser.parse_args()
+
+    paths = find_obj_files(args.sources)
+    start = time.perf_counter()
+    try:
+        results = convert_batch(paths, args.output, workers=args.workers,
+                                callback=lambda result: print(result.to_string()), triangulate=args.triangulate,
+                                cache_dir=args.cache, save_materials=args.save_materials, precision=args.precision,
+                                validate=not args.no_validate)
+    except ValueError as error:
+        parser.error(str(error))
+    print(summary(results, time.perf_counter() - start))
+    return 0 if all(result.ok for result in results) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
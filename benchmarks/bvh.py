@@ -0,0 +1,95 @@
+'''
+Build and query times of the BVH on synthetic UV spheres.
+
+For each sphere the BVH is built, then rays from random points around the
+sphere towards its center are intersected with it, and the closest surface
+points of random points near the sphere are searched. A subset of the
+queries is checked against brute force over all the triangles, which also
+gives the speedup of the hierarchy. The results are written to a JSON file.
+
+Run from the parent directory of the package:
+    python -m MeshPyIO.benchmarks.bvh --faces 10000 100000 1000000 --queries 100000
+'''
+import argparse
+import json
+import time
+
+import numpy as np
+
+from ..Wavefront import WavefrontOBJ
+from ..tools.bvh import BVH, closest_point_triangle, ray_triangle
+from .suite import environment, uv_sphere
+
+
+def brute_force(bvh, origins, directions, points):
+    '''
+    Closest ray hits and closest points by testing every triangle, one query at a time.
+    Returns:
+        t of the hits, distances of the closest points
+    '''
+    corners = bvh._corners(np.arange(len(bvh.triangles)))
+    num_triangles = len(bvh.triangles)
+    hits = np.array([ray_triangle(np.broadcast_to(origin, (num_triangles, 3)),
+                                  np.broadcast_to(direction, (num_triangles, 3)), *corners)[0].min()
+                     for origin, direction in zip(origins, directions)])
+    distances = np.array([np.linalg.norm(closest_point_triangle(np.broadcast_to(point, (num_triangles, 3)), *corners)
+                                         - point, axis=1).min() for point in points])
+    return hits, distances
+
+
+def run_sphere(results, num_faces, num_queries, num_checks, leaf_size, seed=0):
+    vertices, _, faces = uv_sphere(num_faces)
+    obj = WavefrontOBJ.form_mesh(vertices=vertices, faces=faces)
+    rng = np.random.default_rng(seed)
+    directions = rng.normal(size=(num_queries, 3))
+    origins = 3 * directions / np.linalg.norm(directions, axis=1, keepdims=True)
+    directions = -origins + rng.uniform(-0.5, 0.5, (num_queries, 3))
+    points = rng.normal(size=(num_queries, 3))
+    points *= rng.uniform(0.8, 1.2, (num_queries, 1)) / np.linalg.norm(points, axis=1, keepdims=True)
+
+    start = time.perf_counter()
+    bvh = BVH.from_mesh(obj, leaf_size)
+    build = time.perf_counter() - start
+    start = time.perf_counter()
+    t, _, _ = bvh.intersect(origins, directions)
+    rays = time.perf_counter() - start
+    start = time.perf_counter()
+    _, distances, _ = bvh.closest_points(points)
+    closest = time.perf_counter() - start
+
+    start = time.perf_counter()
+    brute_t, brute_distances = brute_force(bvh, origins[:num_checks], directions[:num_checks], points[:num_checks])
+    brute = (time.perf_counter() - start) / max(num_checks, 1)
+    same = bool(np.allclose(t[:num_checks], brute_t) and np.allclose(distances[:num_checks], brute_distances))
+
+    result = dict(faces=len(faces), nodes=len(bvh), depth=bvh.depth, leaf_size=leaf_size, queries=num_queries,
+                  build_seconds=build, ray_seconds=rays, closest_seconds=closest,
+                  rays_per_s=num_queries / rays, closest_per_s=num_queries / closest,
+                  brute_force_seconds_per_query=brute,
+                  ray_speedup=brute / (rays / num_queries), closest_speedup=brute / 2 / (closest / num_queries),
+                  hit_rate=float(np.isfinite(t).mean()), same_as_brute_force=same)
+    results.append(result)
+    print("{:9d} faces: build {:.3f}s, {:.0f} rays/s (x{:.0f}), {:.0f} closest points/s (x{:.0f}), "
+          "brute force check: {}".format(len(faces), build, result["rays_per_s"], result["ray_speedup"],
+                                         result["closest_per_s"], result["closest_speedup"], same))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--faces", type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument("--queries", type=int, default=100000, help="number of rays and of closest point queries")
+    parser.add_argument("--checks", type=int, default=20, help="queries compared with brute force")
+    parser.add_argument("--leaf-size", type=int, default=4)
+    parser.add_argument("--output", default="bvh_benchmark.json")
+    args = parser.parse_args()
+
+    results = []
+    for num_faces in args.faces:
+        run_sphere(results, num_faces, args.queries, args.checks, args.leaf_size)
+    with open(args.output, 'w') as ofile:
+        json.dump(dict(environment=environment(), results=results), ofile, indent=1)
+    print("results written to {}".format(args.output))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+'''
+Import time of the package.
+
+Each run imports WavefrontOBJ in a new interpreter with -X importtime. The
+best wall time, the time spent in numpy and in the package, the slowest
+modules and the optional dependencies that were loaded are written to a
+JSON file. The run fails if the import loads pymesh or an image library, or
+if it takes longer than --max-seconds.
+
+Run from the parent directory of the package:
+    python -m MeshPyIO.benchmarks.import_time --output import_time.json
+'''
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# modules that must only be imported on use
+OPTIONAL_MODULES = ('pymesh', 'skimage', 'imageio', 'PIL', 'cv2', 'concurrent.futures.process', 'multiprocessing')
+
+_SCRIPT = '''
+import sys, time, json
+start = time.perf_counter()
+from {package}.Wavefront import WavefrontOBJ
+seconds = time.perf_counter() - start
+print(json.dumps({{"seconds": seconds, "modules": sorted(sys.modules)}}))
+'''
+
+
+def import_once(package, root):
+    '''
+    Import WavefrontOBJ in a new interpreter.
+    Returns:
+        wall time of the import, loaded modules, cumulated import time of each module in seconds
+    '''
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', _SCRIPT.format(package=package)],
+                             cwd=root, capture_output=True, text=True, check=True)
+    result = json.loads(process.stdout.strip().splitlines()[-1])
+    cumulated = {}
+    for line in process.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        cumulated[name.strip()] = int(cumulative) / 1e6
+    return result["seconds"], result["modules"], cumulated
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="number of imports, the best one is kept")
+    parser.add_argument("--max-seconds", type=float, default=None, help="fail if the import is slower")
+    parser.add_argument("--output", default="import_time.json")
+    args = parser.parse_args()
+
+    package_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    package, root = os.path.basename(package_dir), os.path.dirname(package_dir)
+    runs = [import_once(package, root) for _ in range(args.repeat)]
+    seconds, modules, cumulated = min(runs, key=lambda run: run[0])
+
+    optional = [name for name in modules if name in OPTIONAL_MODULES or name.split('.')[0] in OPTIONAL_MODULES]
+    package_modules = {name: value for name, value in cumulated.items() if name.split('.')[0] == package}
+    slowest = sorted(cumulated.items(), key=lambda item: -item[1])[:15]
+    report = dict(python=sys.version.split()[0], seconds=seconds, runs=[run[0] for run in runs],
+                  numpy_seconds=cumulated.get('numpy', 0.), package_seconds=package_modules.get(package + '.Wavefront'),
+                  optional_modules=optional, slowest=slowest, num_modules=len(modules))
+    with open(args.output, 'w') as ofile:
+        json.dump(report, ofile, indent=1)
+
+    print("import of {}.Wavefront: {:.3f}s (numpy {:.3f}s), {} modules".format(
+        package, seconds, report["numpy_seconds"], len(modules)))
+    for name, value in slowest:
+        print("\t{:50s} {:.4f}s".format(name, value))
+    print("results written to {}".format(args.output))
+    failed = False
+    if optional:
+        print("Error: optional modules imported: {}".format(optional))
+        failed = True
+    if args.max_seconds is not None and seconds > args.max_seconds:
+        print("Error: the import takes more than {}s".format(args.max_seconds))
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+'''
+Face and vertex normal times on synthetic UV spheres.
+
+The face and area weighted vertex normals of each sphere are timed and a
+subset of the faces is checked against a reference computed one face at a
+time. Small meshes mixing triangles, quads and degenerate faces (less than
+three corners) are checked too, the normals of degenerate faces must be 0.
+The results are written to a JSON file.
+
+Run from the parent directory of the package:
+    python -m MeshPyIO.benchmarks.normals --faces 10000 100000 1000000
+'''
+import argparse
+import json
+import time
+
+import numpy as np
+
+from ..tools.normals import NormalTopology
+from ..tools.polygons import PolygonArray
+from .suite import environment, uv_sphere
+
+# vertices and faces (vertex indices of each face) of the small checked meshes
+_SQUARE = np.array([[0, 0, 0], [1, 0, 0], [1, 1, 0], [0, 1, 0], [0, 0, 1]], dtype=np.float64)
+CHECK_MESHES = {
+    'triangles': (_SQUARE, [[0, 1, 2], [0, 2, 3]]),
+    'quads': (_SQUARE, [[0, 1, 2, 3], [0, 1, 4, 4]]),
+    'quad_and_degenerate': (_SQUARE, [[0, 1, 2, 3], [0, 4]]),
+    'mixed_degenerate': (_SQUARE, [[0, 1, 2], [0, 4], [0, 1, 2, 3], [3], [0, 3, 4]]),
+}
+
+
+def reference_normals(vertices, polygons):
+    '''
+    Face and area weighted vertex normals computed one face at a time.
+    Returns:
+        M x 3 face normals, N x 3 vertex normals
+    '''
+    face_normals = np.zeros((len(polygons), 3))
+    vertex_normals = np.zeros((len(vertices), 3))
+    for face in range(len(polygons)):
+        corners = polygons.values[polygons.offsets[face]:polygons.offsets[face + 1]]
+        for second, third in zip(corners[1:-1], corners[2:]):
+            normal = np.cross(vertices[second] - vertices[corners[0]], vertices[third] - vertices[corners[0]])
+            face_normals[face] += normal
+            vertex_normals[[corners[0], second, third]] += normal
+    return _unit(face_normals), _unit(vertex_normals)
+
+
+def _unit(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+
+def check_mesh(vertices, faces):
+    '''
+    Returns:
+        True if NormalTopology gives the reference normals of the mesh
+    '''
+    polygons = PolygonArray.from_sizes(np.concatenate(faces), [len(face) for face in faces])
+    topology = NormalTopology(polygons, len(vertices))
+    face_normals, vertex_normals = reference_normals(vertices, polygons)
+    return bool(np.allclose(topology.face_normals(vertices), face_normals) and
+                np.allclose(topology.vertex_normals(vertices), vertex_normals))
+
+
+def run_sphere(results, num_faces, num_checks):
+    vertices, _, faces = uv_sphere(num_faces)
+    start = time.perf_counter()
+    topology = NormalTopology(faces, len(vertices))
+    build = time.perf_counter() - start
+    start = time.perf_counter()
+    face_normals = topology.face_normals(vertices)
+    face_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    topology.vertex_normals(vertices)
+    vertex_seconds = time.perf_counter() - start
+
+    checked = np.linspace(0, len(faces) - 1, min(num_checks, len(faces))).astype(np.int64)
+    expected, _ = reference_normals(vertices, PolygonArray.from_dense(faces[checked]))
+    same = bool(np.allclose(face_normals[checked], expected))
+
+    result = dict(faces=len(faces), topology_seconds=build, face_seconds=face_seconds,
+                  vertex_seconds=vertex_seconds, faces_per_s=len(faces) / vertex_seconds, same_as_reference=same)
+    results.append(result)
+    print("{:9d} faces: topology {:.3f}s, face normals {:.3f}s, vertex normals {:.3f}s, "
+          "reference check: {}".format(len(faces), build, face_seconds, vertex_seconds, same))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--faces", type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument("--checks", type=int, default=1000, help="faces compared with the reference")
+    parser.add_argument("--output", default="normals_benchmark.json")
+    args = parser.parse_args()
+
+    checks = {name: check_mesh(vertices, faces) for name, (vertices, faces) in CHECK_MESHES.items()}
+    for name, same in checks.items():
+        print("{:20s} reference check: {}".format(name, same))
+    results = []
+    for num_faces in args.faces:
+        run_sphere(results, num_faces, args.checks)
+    with open(args.output, 'w') as ofile:
+        json.dump(dict(environment=environment(), checks=checks, results=results), ofile, indent=1)
+    print("results written to {}".format(args.output))
+
+
+if __name__ == "__main__":
+    main()
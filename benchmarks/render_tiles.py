@@ -0,0 +1,60 @@
+'''
+Scaling of the tiled rasterizer with the number of processes.
+
+Run from the parent directory of the package:
+    python -m MeshPyIO.benchmarks.render_tiles --size 2048 --triangles 1000000
+'''
+import argparse
+import os
+import time
+
+import numpy as np
+
+from ..tools.rasterizer import TILE_SIZE, rasterize, rasterize_tiled
+
+
+def random_triangles(num_triangles, h, w, triangle_size=6., seed=0):
+    '''
+    Small random triangles spread over the image, with random depths.
+    Returns:
+        vertices: 3 x (3 * num_triangles)
+        triangles: 3 x num_triangles
+    '''
+    rng = np.random.default_rng(seed)
+    centers = np.stack([rng.uniform(0, w, num_triangles), rng.uniform(0, h, num_triangles)])
+    vertices = np.zeros((3, 3 * num_triangles))
+    for corner in range(3):
+        vertices[:2, corner::3] = centers + rng.uniform(-triangle_size, triangle_size, (2, num_triangles))
+        vertices[2, corner::3] = rng.uniform(-100, 100, num_triangles)
+    triangles = np.arange(3 * num_triangles).reshape(num_triangles, 3).T
+    return vertices, triangles
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=2048, help="image width and height")
+    parser.add_argument("--triangles", type=int, default=500000)
+    parser.add_argument("--tile-size", type=int, default=TILE_SIZE)
+    parser.add_argument("--workers", type=int, nargs='*', default=None,
+                        help="process counts to test, powers of 2 up to the number of cpus by default")
+    args = parser.parse_args()
+
+    h = w = args.size
+    vertices, triangles = random_triangles(args.triangles, h, w)
+    workers_list = args.workers or [2 ** i for i in range(int(np.log2(os.cpu_count())) + 1)]
+
+    start = time.perf_counter()
+    reference = rasterize(vertices, triangles, h, w)[1]
+    single = time.perf_counter() - start
+    print("{} triangles, {}x{} image, tiles of {} pixels".format(args.triangles, w, h, args.tile_size))
+    print("single process: {:.3f}s".format(single))
+    for workers in workers_list:
+        start = time.perf_counter()
+        triangle_buffer = rasterize_tiled(vertices, triangles, h, w, workers=workers, tile_size=args.tile_size)[1]
+        elapsed = time.perf_counter() - start
+        print("{:3d} workers: {:.3f}s, speedup x{:.2f}, same buffer: {}".format(
+            workers, elapsed, single / elapsed, np.array_equal(reference, triangle_buffer)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+'''
+Benchmarks of load, save_obj, get_verts_colors, decimate, render, the render kernels
+and the material parser on synthetic UV spheres.
+
+Each case is timed (best of --repeat runs), then run once more under
+tracemalloc for its peak memory. The results are written to a JSON file,
+pass the file of another commit with --compare to print the speedups.
+
+Run from the parent directory of the package:
+    python -m MeshPyIO.benchmarks.suite --faces 1000 100000 1000000 --output bench.json
+    python -m MeshPyIO.benchmarks.suite --compare bench_before.json --output bench.json
+'''
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from ..Material import MaterialLibrary
+from ..Wavefront import WavefrontOBJ
+from ..tools.backends import write_image
+from ..tools.obj_writer import WRITE_BUFFER, write_faces, write_vectors
+from ..tools.render import get_triangle_buffer, render_texture_colors
+from ..tools.texture_cache import TEXTURE_CACHE
+
+# variants of the spheres: texture coordinates, normals and number of materials
+VARIANTS = {
+    'full': dict(uvs=True, normals=True, materials=4),
+    'plain': dict(uvs=False, normals=False, materials=1),
+}
+
+
+def uv_sphere(num_faces):
+    '''
+    Triangulated UV sphere, the seam and pole vertices are duplicated so every vertex has one uv.
+    Returns:
+        vertices: N x 3, also the normals of the sphere
+        uvs: N x 2
+        faces: M x 3 with M close to num_faces
+    '''
+    rings = max(int(np.sqrt(num_faces / 4.)), 2)
+    segments = max(int(round(num_faces / (2. * rings))), 3)
+    theta = np.linspace(0, np.pi, rings + 1)[:, None]
+    phi = np.linspace(0, 2 * np.pi, segments + 1)[None, :]
+    vertices = np.stack([np.sin(theta) * np.cos(phi), np.sin(theta) * np.sin(phi),
+                         np.cos(theta) * np.ones_like(phi)], axis=-1).reshape(-1, 3)
+    uvs = np.stack(np.broadcast_arrays(phi / (2 * np.pi), 1 - theta / np.pi), axis=-1).reshape(-1, 2)
+    grid = np.arange((rings + 1) * (segments + 1)).reshape(rings + 1, segments + 1)
+    a, b, c, d = grid[:-1, :-1], grid[:-1, 1:], grid[1:, :-1], grid[1:, 1:]
+    faces = np.concatenate([np.stack([a, c, d], axis=-1).reshape(-1, 3), np.stack([a, d, b], axis=-1).reshape(-1, 3)])
+    return vertices, uvs, faces
+
+
+def write_sphere(directory, name, num_faces, uvs=True, normals=True, materials=1):
+    '''
+    Write a sphere as name.obj with its material library and texture.
+    Returns:
+        path of the obj file
+    '''
+    vertices, texcoords, faces = uv_sphere(num_faces)
+    texture = "{}.png".format(name)
+    write_image(os.path.join(directory, texture), _texture_image())
+    mtl_names = ["material_{}".format(index) for index in range(materials)]
+    with open(os.path.join(directory, name + ".mtl"), 'w') as mtlf:
+        for mtl_name in mtl_names:
+            mtlf.write("newmtl {}\nKd 0.8 0.8 0.8\nmap_Kd {}\n\n".format(mtl_name, texture))
+
+    path = os.path.join(directory, name + ".obj")
+    empty = np.zeros((0, 3), dtype=np.int64)
+    with open(path, 'w', buffering=WRITE_BUFFER) as ofile:
+        ofile.write("mtllib {}.mtl\n".format(name))
+        write_vectors(ofile, 'v', vertices, precision=6)
+        if uvs:
+            write_vectors(ofile, 'vt', texcoords, precision=6)
+        if normals:
+            write_vectors(ofile, 'vn', vertices, precision=6)
+        # the materials split the sphere in bands of latitude, whole rings of quads: the first vertex
+        # of both triangles of a quad is its top left corner
+        theta = np.arccos(np.clip(vertices[faces[:, 0], 2], -1, 1))
+        bands = np.minimum((theta / np.pi * materials).astype(np.int64), materials - 1)
+        for index, mtl_name in enumerate(mtl_names):
+            ofile.write("usemtl {}\n".format(mtl_name))
+            write_faces(ofile, faces, faces if uvs else empty, faces if normals else empty,
+                        np.flatnonzero(bands == index))
+    return path
+
+
+def write_material_library(path, num_materials):
+    '''
+    Material library with many materials, for the parser benchmark.
+    '''
+    with open(path, 'w') as mtlf:
+        for index in range(num_materials):
+            mtlf.write("newmtl material_{0}\nNs 10.0\nKa 0.1 0.1 0.1\nKd 0.8 0.7 0.6\nKs 0.5 0.5 0.5\n"
+                       "Ni 1.0\nd 1.0\nillum 2\nmap_Kd texture_{0}.png\n\n".format(index))
+
+
+def _texture_image(size=1024):
+    ramp = np.linspace(0, 255, size).astype(np.uint8)
+    return np.stack(np.broadcast_arrays(ramp[:, None], ramp[None, :], np.uint8(128)), axis=-1)
+
+
+def measure(function, repeat=3, memory=True):
+    '''
+    Best wall time of several runs and peak traced memory of one more run.
+    Returns:
+        seconds, peak memory in bytes (None without memory)
+    '''
+    seconds = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        seconds = min(seconds, time.perf_counter() - start)
+    peak = None
+    if memory:
+        tracemalloc.start()
+        try:
+            function()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return seconds, peak
+
+
+def _record(results, case, phase, seconds, peak, size=0, faces=0, **extra):
+    result = dict(case=case, phase=phase, seconds=seconds, peak_mb=None if peak is None else peak / 1e6,
+                  mb_per_s=size / 1e6 / seconds if size else None,
+                  faces_per_s=faces / seconds if faces else None, **extra)
+    results.append(result)
+    print("{:24s} {:18s} {:9.4f}s {:>10s} MB/s {:>12s} faces/s {:>9s} MB peak".format(
+        case, phase, seconds,
+        "{:.1f}".format(result["mb_per_s"]) if result["mb_per_s"] else "-",
+        "{:.0f}".format(result["faces_per_s"]) if result["faces_per_s"] else "-",
+        "{:.1f}".format(result["peak_mb"]) if result["peak_mb"] is not None else "-"))
+
+
+def run_sphere(results, directory, num_faces, variant, repeat, memory, image_size):
+    name = "sphere_{}_{}".format(num_faces, variant)
+    path = write_sphere(directory, name, num_faces, **VARIANTS[variant])
+    size = os.path.getsize(path)
+    obj = WavefrontOBJ.load_obj(path)
+    faces = obj.num_faces
+    extra = dict(num_faces=faces, num_vertices=obj.num_vertices, bytes=size)
+
+    seconds, peak = measure(lambda: WavefrontOBJ.load_obj(path), repeat, memory)
+    _record(results, name, "load", seconds, peak, size, faces, **extra)
+
+    out = os.path.join(directory, name + "_saved.obj")
+    seconds, peak = measure(lambda: obj.save_obj(out), repeat, memory)
+    _record(results, name, "save_obj", seconds, peak, os.path.getsize(out), faces, **extra)
+
+    if VARIANTS[variant]['uvs']:
+        # with the texture decoded (cold) or already in the texture cache (warm)
+        seconds, peak = measure(lambda: (TEXTURE_CACHE.clear(), obj.get_verts_colors()), repeat, memory)
+        _record(results, name, "colors_cold", seconds, peak, 0, faces, **extra)
+        seconds, peak = measure(lambda: obj.get_verts_colors(), repeat, memory)
+        _record(results, name, "colors_warm", seconds, peak, 0, faces, **extra)
+
+    # one run, a decimation takes seconds per million faces
+    reached = []
+    seconds, peak = measure(lambda: reached.append(obj.decimate(faces // 10).num_faces), 1, memory)
+    if reached[0] >= faces:
+        raise AssertionError("decimation of {} collapsed no edge".format(name))
+    _record(results, name, "decimate_10%", seconds, peak, 0, faces, decimated_faces=reached[0], **extra)
+
+    # render kernels on the sphere projected in the image
+    h = w = image_size
+    vertices = (obj.vertices * [w / 2.2, h / 2.2, 1] + [w / 2, h / 2, 0]).T
+    triangles = obj.faces.T
+    colors = np.abs(obj.vertices.T)
+    seconds, peak = measure(lambda: get_triangle_buffer(vertices, triangles, h, w), repeat, memory)
+    _record(results, name, "triangle_buffer", seconds, peak, 0, faces, **extra)
+    seconds, peak = measure(lambda: render_texture_colors(vertices, colors, triangles, h, w), repeat, memory)
+    _record(results, name, "render_colors", seconds, peak, 0, faces, **extra)
+    if VARIANTS[variant]['uvs']:
+        # the whole textured render, on a copy already projected in the image
+        textured = WavefrontOBJ.load_obj(path)
+        textured.set_vertices(vertices.T)
+        image = textured.render(h, w, centralized=False)
+        if not np.any(image):
+            raise AssertionError("render of {} covers no pixel".format(name))
+        seconds, peak = measure(lambda: textured.render(h, w, centralized=False), repeat, memory)
+        _record(results, name, "render", seconds, peak, 0, faces, **extra)
+    for filename in os.listdir(directory):
+        if filename.startswith(name):
+            os.remove(os.path.join(directory, filename))
+
+
+def run_materials(results, directory, num_materials, repeat, memory):
+    path = os.path.join(directory, "materials_{}.mtl".format(num_materials))
+    write_material_library(path, num_materials)
+    seconds, peak = measure(lambda: MaterialLibrary.load_mtlib(path), repeat, memory)
+    _record(results, "mtl_{}".format(num_materials), "load_mtlib", seconds, peak, os.path.getsize(path), 0,
+            num_materials=num_materials, bytes=os.path.getsize(path))
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return dict(commit=commit, date=time.strftime("%Y-%m-%d %H:%M:%S"), python=platform.python_version(),
+                numpy=np.__version__, platform=platform.platform(), cpus=os.cpu_count())
+
+
+def compare(results, reference):
+    '''
+    Print the speedup of each case and phase relative to a previous result file.
+    '''
+    previous = {(result["case"], result["phase"]): result for result in reference["results"]}
+    print("\nrelative to commit {}:".format(reference["environment"].get("commit")))
+    for result in results:
+        old = previous.get((result["case"], result["phase"]))
+        if old is not None:
+            print("{:24s} {:18s} x{:.2f}".format(result["case"], result["phase"], old["seconds"] / result["seconds"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--faces", type=int, nargs='+', default=[1000, 10000, 100000, 1000000],
+                        help="numbers of faces of the spheres, up to 5000000")
+    parser.add_argument("--variants", nargs='+', default=list(VARIANTS), choices=list(VARIANTS))
+    parser.add_argument("--materials", type=int, nargs='+', default=[10, 1000],
+                        help="numbers of materials of the material parser benchmark")
+    parser.add_argument("--image-size", type=int, default=1024, help="size of the rendered images")
+    parser.add_argument("--repeat", type=int, default=3, help="number of timed runs, the best one is kept")
+    parser.add_argument("--no-memory", action='store_true', help="do not measure the peak memory")
+    parser.add_argument("--data-dir", default=None, help="directory of the generated files, temporary by default")
+    parser.add_argument("--output", default="benchmark.json")
+    parser.add_argument("--compare", default=None, help="result file of a previous run")
+    args = parser.parse_args()
+
+    directory = args.data_dir or tempfile.mkdtemp(prefix="meshpyio_bench_")
+    os.makedirs(directory, exist_ok=True)
+    results = []
+    try:
+        for num_faces in args.faces:
+            for variant in args.variants:
+                run_sphere(results, directory, num_faces, variant, args.repeat, not args.no_memory, args.image_size)
+        for num_materials in args.materials:
+            run_materials(results, directory, num_materials, args.repeat, not args.no_memory)
+    finally:
+        if args.data_dir is None:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    report = dict(environment=environment(), results=results)
+    with open(args.output, 'w') as ofile:
+        json.dump(report, ofile, indent=1)
+    print("results written to {}".format(args.output))
+    if args.compare:
+        with open(args.compare) as ifile:
+            compare(results, json.load(ifile))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+'''
+Optional dependencies, imported on first use.
+
+PyMesh is only needed by export_pymesh and an image library only to read or
+write textures, so importing the package does not load them. Images are read
+and written by the first available backend (scikit-image, imageio, Pillow,
+OpenCV), or by the one selected with set_image_backend. Other libraries can
+be plugged in with register_image_backend.
+'''
+import importlib
+import importlib.util
+import sys
+
+import numpy as np
+
+
+def import_optional(module, feature):
+    '''
+    Import an optional dependency.
+    Args:
+        module: module name
+        feature: what needs the module, for the error message
+    Raises:
+        ImportError if the module is not installed
+    '''
+    try:
+        return importlib.import_module(module)
+    except ImportError as error:
+        raise ImportError("Error 009: {} needs the {} package: {}".format(feature, module, error)) from error
+
+
+def _skimage_read(path):
+    return importlib.import_module('skimage.io').imread(path)
+
+
+def _skimage_write(path, image):
+    importlib.import_module('skimage.io').imsave(path, image)
+
+
+def _imageio_read(path):
+    return np.asarray(importlib.import_module('imageio').imread(path))
+
+
+def _imageio_write(path, image):
+    importlib.import_module('imageio').imwrite(path, image)
+
+
+def _pil_read(path):
+    with importlib.import_module('PIL.Image').open(path) as image:
+        return np.asarray(image)
+
+
+def _pil_write(path, image):
+    importlib.import_module('PIL.Image').fromarray(image).save(path)
+
+
+def _cv2_read(path):
+    cv2 = importlib.import_module('cv2')
+    image = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+    if image is None:
+        raise IOError("Error 009: could not read image {}".format(path))
+    # opencv stores the channels in BGR(A) order
+    if image.ndim == 3:
+        image = image[:, :, [2, 1, 0, 3][:image.shape[2]]]
+    return image
+
+
+def _cv2_write(path, image):
+    if image.ndim == 3:
+        image = image[:, :, [2, 1, 0, 3][:image.shape[2]]]
+    importlib.import_module('cv2').imwrite(path, image)
+
+
+# image backends by order of preference: name -> (module to check, reader, writer)
+IMAGE_BACKENDS = {
+    'skimage': ('skimage', _skimage_read, _skimage_write),
+    'imageio': ('imageio', _imageio_read, _imageio_write),
+    'pil': ('PIL', _pil_read, _pil_write),
+    'cv2': ('cv2', _cv2_read, _cv2_write),
+}
+
+_image_backend = {"name": None}
+
+
+def register_image_backend(name, reader, writer=None, module=None):
+    '''
+    Add an image backend, it becomes the selected one.
+    Args:
+        reader: function(path) returning a height x width (x nchannels) array
+        writer: function(path, image), optional
+        module: module that must be importable for the backend to be available, None if there is none
+    '''
+    IMAGE_BACKENDS[name] = (module, reader, writer)
+    _image_backend["name"] = name
+
+
+def set_image_backend(name=None):
+    '''
+    Select the image backend, None to use the first available one.
+    '''
+    if name is not None and name not in IMAGE_BACKENDS:
+        raise ValueError("Error 009: unknown image backend {}, use one of {}".format(name, list(IMAGE_BACKENDS)))
+    _image_backend["name"] = name
+
+
+def image_backend():
+    '''
+    Name of the image backend in use, the first one whose module can be imported if none was selected.
+    '''
+    if _image_backend["name"] is None:
+        for name, (module, _, _) in IMAGE_BACKENDS.items():
+            if _available(module):
+                _image_backend["name"] = name
+                break
+        else:
+            raise ImportError("Error 009: reading textures needs one of the packages {}".format(
+                [module for module, _, _ in IMAGE_BACKENDS.values() if module is not None]))
+    return _image_backend["name"]
+
+
+def _available(module):
+    if module is None or module in sys.modules:
+        return True
+    try:
+        return importlib.util.find_spec(module) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def read_image(path):
+    return IMAGE_BACKENDS[image_backend()][1](path)
+
+
+def write_image(path, image):
+    writer = IMAGE_BACKENDS[image_backend()][2]
+    if writer is None:
+        raise ValueError("Error 009: the image backend {} can not write images".format(image_backend()))
+    writer(path, image)
@@ -0,0 +1,79 @@
+'''
+Single-index render buffers.
+
+OBJ faces index positions, texture coordinates and normals separately, a
+vertex on a UV seam has one position and several texture coordinates.
+Renderers and exporters need one index per vertex: every distinct
+(vid, tid, nid) corner of the faces becomes one buffer vertex, and the
+faces are triangulated into triangles of buffer vertices.
+'''
+import copy
+
+import numpy as np
+
+from .polygons import as_polygons, fan_triangles, flat_indices
+from .welding import unique_rows
+
+
+class RenderBuffers:
+    def __init__(self, vertex_ids, texture_ids, normal_ids, triangles, face_ids):
+        """
+        buffer vertex k has the position vertex_ids[k], the uv texture_ids[k] and the normal normal_ids[k].
+        :param triangles: T x 3 buffer vertex indices
+        :param face_ids: T source face of each triangle
+        """
+        self.vertex_ids = vertex_ids
+        self.texture_ids = texture_ids      # -1 for corners without texture coordinates
+        self.normal_ids = normal_ids        # -1 for corners without normal
+        self.triangles = triangles
+        self.face_ids = face_ids
+        # attributes of the buffer vertices, set by gather
+        self.positions = None
+        self.uvs = None
+        self.normals = None
+
+    def __len__(self):
+        return len(self.vertex_ids)
+
+    def gather(self, vertices, vertices_texture, vertices_normals):
+        """
+        buffers with the attributes of the buffer vertices, the topology is shared.
+        uvs (resp. normals) are None without texture coordinates (normals), and 0 at the corners without.
+        """
+        buffers = copy.copy(self)
+        buffers.positions = np.ascontiguousarray(np.asarray(vertices)[self.vertex_ids])
+        buffers.uvs = _gather(vertices_texture, self.texture_ids)
+        buffers.normals = _gather(vertices_normals, self.normal_ids)
+        return buffers
+
+
+def _gather(values, ids):
+    if len(values) == 0 or len(ids) == 0 or ids.max() < 0:
+        return None
+    gathered = np.asarray(values)[np.maximum(ids, 0)]
+    gathered[ids < 0] = 0
+    return gathered
+
+
+def build_render_buffers(faces, faces_texture_indices, faces_norm_indices):
+    '''
+    Topology of the single-index buffers of a mesh, see RenderBuffers.gather for the attributes.
+    Args:
+        faces: M x Nv vertex indices or PolygonArray
+        faces_texture_indices: texture indices like faces, or empty
+        faces_norm_indices: normal indices like faces, or empty
+    Returns:
+        RenderBuffers, the buffer vertices are in order of first use by the faces
+    '''
+    polygons = as_polygons(faces)
+    index, face_ids = fan_triangles(polygons.offsets)
+    vids = np.asarray(polygons.values, dtype=np.int64)
+    corners = np.full((len(vids), 3), -1, dtype=np.int64)
+    corners[:, 0] = vids
+    for column, indices in ((1, faces_texture_indices), (2, faces_norm_indices)):
+        if len(indices) > 0:
+            corners[:, column] = flat_indices(indices)
+    keep, inverse = unique_rows(corners)
+    corners = corners[keep]
+    return RenderBuffers(corners[:, 0].copy(), corners[:, 1].copy(), corners[:, 2].copy(),
+                         inverse[index].reshape(-1, 3), face_ids)
@@ -0,0 +1,322 @@
+'''
+Bounding volume hierarchy of the triangles of a mesh.
+
+The tree is stored as flat arrays. Node k has the box lo[k], hi[k]. An
+inner node has the children left[k] and right[k]. A leaf has left[k] == -1
+and holds the triangles order[start[k]:start[k] + count[k]]. The build
+sorts the triangles by the Morton code of their centroid and splits the
+sorted ranges in halves, one level of the tree at a time.
+
+Queries are batched: every query has its own stack of nodes and pops one
+node per step, all the queries together. The nearer child is visited
+first and the nodes farther than the best hit found so far are skipped.
+'''
+import numpy as np
+
+LEAF_SIZE = 4
+QUERY_CHUNK = 1 << 16          # queries traversed together, bounds the size of the stacks
+
+
+class BVH:
+    def __init__(self, vertices, triangles, face_ids=None, leaf_size=LEAF_SIZE):
+        """
+        build the hierarchy of triangles.
+        :param vertices: N x 3 positions
+        :param triangles: T x 3 vertex indices
+        :param face_ids: face of each triangle (see NormalTopology), the triangle index by default
+        :param leaf_size: maximum number of triangles of a leaf
+        """
+        self.vertices = np.ascontiguousarray(np.asarray(vertices)[:, :3], dtype=np.float64)
+        self.triangles = np.asarray(triangles, dtype=np.int64).reshape(-1, 3)
+        self.face_ids = np.arange(len(self.triangles)) if face_ids is None else np.asarray(face_ids)
+        self.leaf_size = leaf_size
+        if len(self.triangles) == 0:
+            raise ValueError("Error 013: a BVH needs at least one triangle")
+        self._build()
+
+    @staticmethod
+    def from_mesh(obj, leaf_size=LEAF_SIZE):
+        """
+        hierarchy of the faces of a WavefrontOBJ, polygons are fan triangulated.
+        """
+        topology = obj.normal_topology()
+        return BVH(obj.vertices, topology.triangles, topology.face_ids, leaf_size)
+
+    def __len__(self):
+        return len(self.lo)
+
+    def _build(self):
+        corners = self.vertices[self.triangles]                 # T x 3 x 3
+        tri_lo, tri_hi = corners.min(axis=1), corners.max(axis=1)
+        self.order = np.argsort(morton_codes((tri_lo + tri_hi) / 2.), kind='stable')
+        tri_lo, tri_hi = tri_lo[self.order], tri_hi[self.order]
+
+        # ranges of the nodes, level by level: the children of the nodes of a level are the next level
+        starts, ends = [np.zeros(1, dtype=np.int64)], [np.array([len(self.order)], dtype=np.int64)]
+        lefts = []
+        num_nodes = 1
+        while True:
+            start, end = starts[-1], ends[-1]
+            split = end - start > self.leaf_size
+            left = np.full(len(start), -1, dtype=np.int64)
+            left[split] = num_nodes + 2 * np.arange(np.count_nonzero(split))
+            lefts.append(left)
+            if not split.any():
+                break
+            mid = (start[split] + end[split]) // 2
+            starts.append(np.stack([start[split], mid], axis=1).reshape(-1))
+            ends.append(np.stack([mid, end[split]], axis=1).reshape(-1))
+            num_nodes += 2 * len(mid)
+        self.start = np.concatenate(starts)
+        self.count = np.concatenate(ends) - self.start
+        self.left = np.concatenate(lefts)
+        self.right = np.where(self.left >= 0, self.left + 1, -1)
+        self.depth = len(lefts)
+
+        # boxes of the leaves, then of the inner nodes from the deepest level up
+        self.lo = np.empty((num_nodes, 3))
+        self.hi = np.empty((num_nodes, 3))
+        leaves = np.flatnonzero(self.left < 0)
+        leaf_order = np.argsort(self.start[leaves])
+        leaves = leaves[leaf_order]
+        self.lo[leaves] = np.minimum.reduceat(tri_lo, self.start[leaves], axis=0)
+        self.hi[leaves] = np.maximum.reduceat(tri_hi, self.start[leaves], axis=0)
+        level_ends = np.cumsum([len(level) for level in lefts])
+        for level_end, level in zip(level_ends[::-1], lefts[::-1]):
+            nodes = np.arange(level_end - len(level), level_end)[level >= 0]
+            self.lo[nodes] = np.minimum(self.lo[self.left[nodes]], self.lo[self.right[nodes]])
+            self.hi[nodes] = np.maximum(self.hi[self.left[nodes]], self.hi[self.right[nodes]])
+
+    def _leaf_triangles(self, queries, nodes):
+        """
+        (query, triangle) pairs of the triangles of leaves.
+        """
+        counts = self.count[nodes]
+        queries = np.repeat(queries, counts)
+        offsets = np.arange(len(queries)) - np.repeat(np.cumsum(counts) - counts, counts)
+        return queries, self.order[np.repeat(self.start[nodes], counts) + offsets]
+
+    def intersect(self, origins, directions, t_min=0., t_max=np.inf, chunk_size=QUERY_CHUNK):
+        '''
+        First intersection of rays with the triangles.
+        Args:
+            origins: R x 3
+            directions: R x 3, not necessarily normalized (t is then in units of the direction)
+            t_min, t_max: range of the ray parameter
+        Returns:
+            t: R ray parameter of the hits, inf for rays missing the mesh
+            triangles: R index of the hit triangles in self.triangles, -1 for missed rays
+            barycentric: R x 2 (u, v) coordinates of the hits in their triangle, hit = (1-u-v) a + u b + v c
+        '''
+        origins = np.asarray(origins, dtype=np.float64).reshape(-1, 3)
+        directions = np.asarray(directions, dtype=np.float64).reshape(-1, 3)
+        t = np.full(len(origins), np.inf)
+        triangles = np.full(len(origins), -1, dtype=np.int64)
+        barycentric = np.zeros((len(origins), 2))
+        for first in range(0, len(origins), chunk_size):
+            chunk = slice(first, first + chunk_size)
+            t[chunk], triangles[chunk], barycentric[chunk] = self._intersect(origins[chunk], directions[chunk],
+                                                                             t_min, t_max)
+        return t, triangles, barycentric
+
+    def _intersect(self, origins, directions, t_min, t_max):
+        best_t = np.full(len(origins), float(t_max))
+        best_tri = np.full(len(origins), -1, dtype=np.int64)
+        best_uv = np.zeros((len(origins), 2))
+        inv_dir = 1. / np.where(np.abs(directions) < 1e-300, 1e-300, directions)
+
+        def entry(rays, nodes):
+            # ray parameter where the rays enter the boxes, inf when they miss them
+            t0 = (self.lo[nodes] - origins[rays]) * inv_dir[rays]
+            t1 = (self.hi[nodes] - origins[rays]) * inv_dir[rays]
+            t_near = np.maximum(np.minimum(t0, t1).max(axis=1), t_min)
+            t_far = np.minimum(np.maximum(t0, t1).min(axis=1), best_t[rays])
+            return np.where(t_near <= t_far, t_near, np.inf)
+
+        def visit_leaves(rays, nodes):
+            rays, tris = self._leaf_triangles(rays, nodes)
+            t, u, v = ray_triangle(origins[rays], directions[rays], *self._corners(tris), t_min)
+            first = _closest_per_query(rays, t, best_t)
+            best_t[rays[first]] = t[first]
+            best_tri[rays[first]] = tris[first]
+            best_uv[rays[first]] = np.stack([u[first], v[first]], axis=1)
+
+        self._traverse(len(origins), entry, visit_leaves, best_t)
+        best_t[best_tri < 0] = np.inf
+        return best_t, best_tri, best_uv
+
+    def closest_points(self, points, chunk_size=QUERY_CHUNK):
+        '''
+        Closest points of the surface.
+        Args:
+            points: P x 3 query points
+        Returns:
+            closest: P x 3 closest points on the triangles
+            distances: P distances to the surface
+            triangles: P index of the closest triangles in self.triangles
+        '''
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        closest = np.empty((len(points), 3))
+        distances = np.empty(len(points))
+        triangles = np.empty(len(points), dtype=np.int64)
+        for first in range(0, len(points), chunk_size):
+            chunk = slice(first, first + chunk_size)
+            closest[chunk], distances[chunk], triangles[chunk] = self._closest_points(points[chunk])
+        return closest, distances, triangles
+
+    def _closest_points(self, points):
+        best_d2 = np.full(len(points), np.inf)
+        best_point = np.zeros((len(points), 3))
+        best_tri = np.full(len(points), -1, dtype=np.int64)
+
+        def entry(queries, nodes):
+            distances = self._box_distances(points[queries], nodes)
+            return np.where(distances < best_d2[queries], distances, np.inf)
+
+        def visit_leaves(queries, nodes):
+            queries, tris = self._leaf_triangles(queries, nodes)
+            closest = closest_point_triangle(points[queries], *self._corners(tris))
+            d2 = np.einsum('ij,ij->i', closest - points[queries], closest - points[queries])
+            first = _closest_per_query(queries, d2, best_d2)
+            best_d2[queries[first]] = d2[first]
+            best_point[queries[first]] = closest[first]
+            best_tri[queries[first]] = tris[first]
+
+        self._traverse(len(points), entry, visit_leaves, best_d2)
+        return best_point, np.sqrt(best_d2), best_tri
+
+    def _traverse(self, num_queries, entry, visit_leaves, best):
+        '''
+        Depth first traversal of all the queries at once, each query pops one node of its stack per step.
+        Args:
+            entry: function(queries, nodes) -> distance of the boxes for the queries, inf to skip them
+            visit_leaves: function(queries, nodes) testing the triangles of leaves, it lowers best
+            best: distance of the best hit of each query, nodes farther than it are skipped
+        '''
+        # the stacks of all the queries in flat arrays, query q uses the slots q * width to q * width + width - 1
+        width = self.depth + 2
+        stack_nodes = np.zeros(num_queries * width, dtype=np.int64)
+        stack_entry = np.zeros(num_queries * width)
+        queries = np.arange(num_queries)
+        stack_entry[queries * width] = entry(queries, np.zeros(num_queries, dtype=np.int64))
+        size = np.ones(num_queries, dtype=np.int64)
+        while len(queries) > 0:
+            size[queries] -= 1
+            slots = queries * width + size[queries]
+            keep = stack_entry[slots] <= best[queries]
+            queries, nodes = queries[keep], stack_nodes[slots[keep]]
+            leaf = self.left[nodes] < 0
+            if leaf.any():
+                visit_leaves(queries[leaf], nodes[leaf])
+            queries, nodes = queries[~leaf], nodes[~leaf]
+            left, right = self.left[nodes], self.right[nodes]
+            left_entry, right_entry = entry(np.concatenate([queries, queries]),
+                                            np.concatenate([left, right])).reshape(2, -1)
+            # the nearer child is pushed last, so it is visited first
+            left_first = left_entry <= right_entry
+            slots = queries * width + size[queries]
+            for child, child_entry in ((np.where(left_first, right, left), np.maximum(left_entry, right_entry)),
+                                       (np.where(left_first, left, right), np.minimum(left_entry, right_entry))):
+                push = np.isfinite(child_entry)
+                stack_nodes[slots[push]] = child[push]
+                stack_entry[slots[push]] = child_entry[push]
+                slots += push
+            size[queries] = slots - queries * width
+            queries = np.flatnonzero(size > 0)
+
+    def _box_distances(self, points, nodes):
+        '''
+        squared distances of points to the boxes of nodes, 0 inside.
+        '''
+        delta = np.maximum(self.lo[nodes] - points, 0) + np.maximum(points - self.hi[nodes], 0)
+        return np.einsum('ij,ij->i', delta, delta)
+
+    def _corners(self, tris):
+        corners = self.triangles[tris]
+        return self.vertices[corners[:, 0]], self.vertices[corners[:, 1]], self.vertices[corners[:, 2]]
+
+
+def _closest_per_query(queries, distances, best):
+    '''
+    position of the smallest distance of each query, among the distances below its best one.
+    '''
+    closer = np.flatnonzero(distances < best[queries])
+    order = closer[np.lexsort((distances[closer], queries[closer]))]
+    return order[np.concatenate([[True], queries[order][1:] != queries[order][:-1]])] if len(order) > 0 else order
+
+
+def morton_codes(points, bits=10):
+    '''
+    Morton (z-order) codes of points, with bits per axis of their bounding box.
+    '''
+    lo, hi = points.min(axis=0), points.max(axis=0)
+    scale = np.where(hi > lo, hi - lo, 1.)
+    cells = np.clip(((points - lo) / scale * ((1 << bits) - 1)).astype(np.uint64), 0, (1 << bits) - 1)
+    codes = np.zeros(len(points), dtype=np.uint64)
+    for bit in range(bits):
+        for axis in range(3):
+            codes |= ((cells[:, axis] >> np.uint64(bit)) & np.uint64(1)) << np.uint64(3 * bit + 2 - axis)
+    return codes
+
+
+def _dot(a, b):
+    return np.einsum('ij,ij->i', a, b)
+
+
+def ray_triangle(origins, directions, a, b, c, t_min=0.):
+    '''
+    Intersections of rays with triangles, one triangle per ray (Moller-Trumbore).
+    Returns:
+        t: ray parameter of the hits, inf for misses
+        u, v: barycentric coordinates of the hits
+    '''
+    edge1, edge2 = b - a, c - a
+    pvec = np.cross(directions, edge2)
+    det = _dot(edge1, pvec)
+    # rays parallel to their triangle (or degenerate triangles) miss
+    scale = np.linalg.norm(edge1, axis=1) * np.linalg.norm(edge2, axis=1) * np.linalg.norm(directions, axis=1)
+    valid = np.abs(det) > 1e-12 * scale
+    with np.errstate(divide='ignore', invalid='ignore'):
+        inv_det = np.where(valid, 1. / np.where(valid, det, 1.), 0.)
+        tvec = origins - a
+        u = _dot(tvec, pvec) * inv_det
+        qvec = np.cross(tvec, edge1)
+        v = _dot(directions, qvec) * inv_det
+        t = _dot(edge2, qvec) * inv_det
+    valid &= (u >= 0) & (v >= 0) & (u + v <= 1) & (t >= t_min)
+    return np.where(valid, t, np.inf), u, v
+
+
+def closest_point_triangle(points, a, b, c):
+    '''
+    Closest points of triangles, one triangle per point (Ericson, Real-Time Collision Detection 5.1.5).
+    '''
+    ab, ac = b - a, c - a
+    ap, bp, cp = points - a, points - b, points - c
+    d1, d2 = _dot(ab, ap), _dot(ac, ap)
+    d3, d4 = _dot(ab, bp), _dot(ac, bp)
+    d5, d6 = _dot(ab, cp), _dot(ac, cp)
+    va, vb, vc = d3 * d6 - d5 * d4, d5 * d2 - d1 * d6, d1 * d4 - d3 * d2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # inside the triangle, then the regions of the edges and vertices by increasing priority
+        denom = va + vb + vc
+        closest = a + ab * (vb / denom)[:, None] + ac * (vc / denom)[:, None]
+        regions = [
+            ((va <= 0) & (d4 - d3 >= 0) & (d5 - d6 >= 0),
+             lambda: b + (c - b) * ((d4 - d3) / ((d4 - d3) + (d5 - d6)))[:, None]),
+            ((vb <= 0) & (d2 >= 0) & (d6 <= 0), lambda: a + ac * (d2 / (d2 - d6))[:, None]),
+            ((d6 >= 0) & (d5 <= d6), lambda: c),
+            ((vc <= 0) & (d1 >= 0) & (d3 <= 0), lambda: a + ab * (d1 / (d1 - d3))[:, None]),
+            ((d3 >= 0) & (d4 <= d3), lambda: b),
+            ((d1 <= 0) & (d2 <= 0), lambda: a),
+        ]
+        for region, point in regions:
+            if region.any():
+                closest = np.where(region[:, None], point(), closest)
+    # degenerate triangles: the closest of their vertices
+    bad = ~np.isfinite(closest).all(axis=1)
+    if bad.any():
+        candidates = np.stack([a[bad], b[bad], c[bad]], axis=1)
+        nearest = np.argmin(((candidates - points[bad][:, None]) ** 2).sum(axis=2), axis=1)
+        closest[bad] = candidates[np.arange(len(nearest)), nearest]
+    return closest
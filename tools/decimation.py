@@ -0,0 +1,440 @@
+'''
+Quadric edge-collapse decimation.
+
+The faces are fan triangulated, then edges are collapsed until the number of
+triangles reaches the target. Every vertex has the quadric of the planes of
+its triangles (Garland and Heckbert), the cost of collapsing the vertex u
+onto its neighbour v is the error of Q[u] + Q[v] at v. A collapse moves u
+onto v (half-edge collapse): the vertices left keep their position, texture
+coordinates and normal, nothing is interpolated. A small quadric of the
+distance to the merged vertices keeps the triangles well shaped in flat
+regions.
+
+Feature edges are the borders, the UV and normal seams (the two triangles
+of the edge give different texture or normal indices to its corners) and
+the material boundaries. Their planes are added to the quadrics with a
+large weight. A vertex on two feature edges of the same kind only slides
+along them, the ends and junctions of the features are locked, so the seams
+and boundaries keep their place and no triangle changes of material.
+
+The edges are collapsed in rounds, all the arrays are the size of the
+current mesh:
+- every vertex picks its cheapest collapse, collapses flipping a triangle
+  (in space or in uv space) or making the mesh non-manifold (link
+  condition) are rejected,
+- among the cheapest half, a maximal set of collapses changing different
+  triangles is selected, cheaper collapses first,
+- the selected collapses are applied at once.
+A round takes O(T log T) time and O(T) memory for T triangles and removes
+a fixed fraction of them, so a decimation costs a few tens of sorts of the
+input triangles whatever the target.
+'''
+import numpy as np
+
+from .polygons import as_polygons, fan_triangles, flat_indices
+
+FEATURE_WEIGHT = 1000.         # weight of the planes of the feature edges in the quadrics
+SHAPE_WEIGHT = 1e-3            # weight of the distance to the merged vertices, relative to the planes
+CANDIDATE_FRACTION = 0.5       # cheapest fraction of the valid collapses considered in a round
+COST_BUCKETS = 16              # number of cost classes the collapses of a round are ordered by
+MIN_NORMAL_COS = 0.2           # a collapse may not turn a triangle normal by more than acos(MIN_NORMAL_COS)
+
+# kinds of feature edges
+BORDER, MATERIAL, UV_SEAM, NORMAL_SEAM = 1, 2, 4, 8
+
+_NONE = np.iinfo(np.int64).max
+
+
+class Decimator:
+    def __init__(self, vertices, faces, texture_indices=(), normal_indices=(), mtl_ids=None,
+                 vertices_texture=(), feature_weight=FEATURE_WEIGHT):
+        """
+        decimation state of a mesh, decimate can be called with decreasing targets to get levels of detail.
+        :param vertices: N x 3 positions (only the first 3 columns are used)
+        :param faces: M x Nv vertex indices or PolygonArray, polygons are fan triangulated
+        :param texture_indices: texture indices like faces, or empty
+        :param normal_indices: normal indices like faces, or empty
+        :param mtl_ids: material of each face, kept by its triangles
+        :param vertices_texture: texture coordinates, given to reject the collapses flipping a triangle in uv space
+        :param feature_weight: weight of the feature edges planes, relative to the triangle planes
+        """
+        polygons = as_polygons(faces)
+        index, face_ids = fan_triangles(polygons.offsets)
+        self.vertices = np.asarray(vertices, dtype=np.float64)[:, :3]
+        self.num_vertices = len(self.vertices)
+        self.triangles = np.asarray(polygons.values, dtype=np.int64)[index]       # T x 3
+        self.texture_ids = _corner_indices(texture_indices, index)               # T x 3, -1 for none
+        self.normal_ids = _corner_indices(normal_indices, index)
+        self.mtl_ids = np.zeros(len(face_ids), dtype=np.int64) if mtl_ids is None else \
+            np.asarray(mtl_ids, dtype=np.int64)[face_ids]
+        self.vertices_texture = np.asarray(vertices_texture, dtype=np.float64) if len(vertices_texture) > 0 else \
+            np.zeros((0, 2))
+        # degenerate triangles have no edges to collapse
+        self._keep_triangles(~_degenerate(self.triangles))
+        self.feature_weight = feature_weight
+        self.quadrics = self._quadrics()
+        self.rounds = 0
+
+    def __len__(self):
+        return len(self.triangles)
+
+    def _keep_triangles(self, keep):
+        self.triangles = self.triangles[keep]
+        self.texture_ids = self.texture_ids[keep]
+        self.normal_ids = self.normal_ids[keep]
+        self.mtl_ids = self.mtl_ids[keep]
+
+    def _quadrics(self):
+        """
+        N x 10 quadrics (A00 A01 A02 A11 A12 A22 b0 b1 b2 c) of the triangle planes weighted by area,
+        of the planes through the feature edges perpendicular to their triangle and of the vertex position.
+        """
+        normals = self.triangle_normals()
+        areas = np.linalg.norm(normals, axis=1) / 2
+        units = _normalize(normals)
+        quadrics = np.zeros((self.num_vertices, 10))
+        planes = _plane_quadrics(units, -_dot(units, self.vertices[self.triangles[:, 0]]), areas)
+        for corner in range(3):
+            _scatter_add(quadrics, self.triangles[:, corner], planes)
+        # distance to the vertex, weighted by its area: in flat regions, where the planes cost nothing,
+        # the short edges collapse first and the triangles keep their shape
+        weights = SHAPE_WEIGHT * np.bincount(self.triangles.reshape(-1), weights=np.repeat(areas / 3, 3),
+                                             minlength=self.num_vertices)
+        quadrics[:, [0, 3, 5]] += weights[:, None]
+        quadrics[:, 6:9] -= weights[:, None] * self.vertices
+        quadrics[:, 9] += weights * _dot(self.vertices, self.vertices)
+
+        edges = _Edges(self)
+        feature = edges.kinds > 0
+        half = np.concatenate([edges.first[feature], edges.second[feature & (edges.second >= 0)]])
+        start, end = self.triangles.reshape(-1)[half], self.triangles.reshape(-1)[_next_corner(half)]
+        directions = self.vertices[end] - self.vertices[start]
+        units = _normalize(np.cross(directions, units[half // 3]))
+        planes = _plane_quadrics(units, -_dot(units, self.vertices[start]),
+                                 self.feature_weight * _dot(directions, directions))
+        _scatter_add(quadrics, start, planes)
+        _scatter_add(quadrics, end, planes)
+        return quadrics
+
+    def triangle_normals(self, triangles=None):
+        """
+        cross products of the edges of the triangles (of the current ones by default).
+        """
+        triangles = self.triangles if triangles is None else triangles
+        v0 = self.vertices[triangles[:, 0]]
+        return np.cross(self.vertices[triangles[:, 1]] - v0, self.vertices[triangles[:, 2]] - v0)
+
+    def decimate(self, target_faces):
+        """
+        collapse edges until at most target_faces triangles are left, or no collapse is possible.
+        :return: number of triangles left
+        """
+        while len(self.triangles) > target_faces:
+            if self._round(len(self.triangles) - target_faces) == 0:
+                break
+        return len(self.triangles)
+
+    def _round(self, excess):
+        """
+        one round of collapses removing at most excess triangles.
+        :return: number of triangles removed
+        """
+        edges = _Edges(self)
+        u, v, cost, face_count = self._candidates(edges)
+        finite = np.flatnonzero(np.isfinite(cost))
+        finite = finite[np.argsort(cost[finite], kind='stable')]
+        u, v, face_count = u[finite], v[finite], face_count[finite]
+        # the cheapest collapse of each vertex, candidates stay sorted by cost
+        first = np.zeros(len(u), dtype=bool)
+        first[np.unique(u, return_index=True)[1]] = True
+        u, v, face_count = u[first], v[first], face_count[first]
+        # the cheapest fraction is validated, all the collapses when most of them are rejected
+        pool = int(np.ceil(CANDIDATE_FRACTION * len(u)))
+        valid = self._valid_collapses(edges, u[:pool], v[:pool], face_count[:pool])
+        if np.count_nonzero(valid) < pool // 2:
+            valid = self._valid_collapses(edges, u, v, face_count)
+        checked = len(valid)
+        u, v, face_count = u[:checked][valid], v[:checked][valid], face_count[:checked][valid]
+        u, v, face_count = u[:pool], v[:pool], face_count[:pool]
+        if len(u) == 0:
+            return 0
+        # the costs are compared by buckets in random order: the local minima of the exact costs are few
+        # on smooth meshes, with the buckets a round keeps a large set of independent collapses
+        buckets = np.arange(len(u)) * COST_BUCKETS // len(u)
+        order = np.lexsort((np.random.default_rng(self.rounds).random(len(u)), buckets))
+        u, v, face_count = u[order], v[order], face_count[order]
+        independent = self._independent(u)
+        u, v, face_count = u[independent], v[independent], face_count[independent]
+        # the cheapest collapses removing the excess triangles
+        count = int(np.searchsorted(np.cumsum(face_count), excess)) + 1
+        u, v = u[:count], v[:count]
+        self._collapse(u, v)
+        self.rounds += 1
+        return int(np.sum(face_count[:count]))
+
+    def _candidates(self, edges):
+        """
+        the cheapest allowed direction of each edge.
+        :return: u, v (u collapses onto v), cost (inf when the edge can not collapse) and number of triangles
+        of each edge
+        """
+        feature_count = np.bincount(edges.ends[edges.kinds > 0].reshape(-1), minlength=self.num_vertices)
+        kind_sum = np.zeros(self.num_vertices, dtype=np.int64)
+        kind_or = np.zeros(self.num_vertices, dtype=np.int64)
+        for column in range(2):
+            ends = edges.ends[:, column]
+            kind_sum += np.bincount(ends, weights=edges.kinds, minlength=self.num_vertices).astype(np.int64)
+            np.bitwise_or.at(kind_or, ends, edges.kinds)
+        # ends and junctions of features, vertices between two features of different kinds and
+        # vertices of non-manifold edges do not move
+        locked = (feature_count > 0) & ((feature_count != 2) | (kind_sum != 2 * kind_or))
+        locked[edges.ends[edges.counts > 2].reshape(-1)] = True
+
+        quadrics = self.quadrics[edges.ends[:, 0]] + self.quadrics[edges.ends[:, 1]]
+        costs = []
+        for a, b in ((0, 1), (1, 0)):
+            u, v = edges.ends[:, a], edges.ends[:, b]
+            cost = _quadric_error(quadrics, self.vertices[v])
+            allowed = ~locked[u] & ((feature_count[u] == 0) | (edges.kinds > 0))
+            costs.append(np.where(allowed, cost, np.inf))
+        reverse = costs[1] < costs[0]
+        u = np.where(reverse, edges.ends[:, 1], edges.ends[:, 0])
+        v = np.where(reverse, edges.ends[:, 0], edges.ends[:, 1])
+        return u, v, np.minimum(costs[0], costs[1]), edges.counts
+
+    def _triangles_around(self, u):
+        """
+        triangles of the vertices u (distinct).
+        :return: for each triangle corner on a vertex u, the index of the vertex in u, the triangle and the
+        corner in the triangle
+        """
+        candidate = np.full(self.num_vertices, -1, dtype=np.int64)
+        candidate[u] = np.arange(len(u))
+        flat = self.triangles.reshape(-1)
+        corners = np.flatnonzero(candidate[flat] >= 0)
+        return candidate[flat[corners]], corners // 3, corners % 3
+
+    def _valid_collapses(self, edges, u, v, face_count):
+        """
+        collapses (each alone) flipping no triangle, keeping a triangle at u and satisfying the link
+        condition: u and v have as many common neighbours as triangles on their edge.
+        """
+        valid = np.ones(len(u), dtype=bool)
+        # triangles of u, with u moved to v
+        owners, faces, corners = self._triangles_around(u)
+        moved = self.triangles[faces]
+        moved[np.arange(len(faces)), corners] = v[owners]
+        removed = _degenerate(moved)
+        valid &= np.bincount(owners[~removed], minlength=len(u)) > 0
+        before = self.triangle_normals(self.triangles[faces[~removed]])
+        after = self.triangle_normals(moved[~removed])
+        before_norms = np.linalg.norm(before, axis=1)
+        after_norms = np.linalg.norm(after, axis=1)
+        # triangles without area have no normal to flip
+        flipped = (before_norms > 0) & ((after_norms == 0) |
+                                        (_dot(before, after) <= MIN_NORMAL_COS * before_norms * after_norms))
+        valid[owners[~removed][flipped]] = False
+        if len(self.vertices_texture) > 0:
+            valid[self._uv_flips(owners, faces, corners, v, removed)] = False
+
+        # link condition, on the neighbours of u and v
+        neighbours, offsets = edges.adjacency(self.num_vertices)
+        keys = []
+        for ends in (u, v):
+            starts = offsets[ends]
+            degrees = offsets[ends + 1] - starts
+            owner = np.repeat(np.arange(len(u)), degrees)
+            position = np.arange(len(owner)) - np.repeat(np.cumsum(degrees) - degrees, degrees)
+            keys.append(owner * self.num_vertices + neighbours[np.repeat(starts, degrees) + position])
+        common = np.bincount(np.intersect1d(keys[0], keys[1], assume_unique=True) // self.num_vertices,
+                             minlength=len(u))
+        valid &= common == face_count
+        return valid
+
+    def _uv_flips(self, owners, faces, corners, v, removed):
+        """
+        collapses flipping a triangle of u in uv space, u taking the texture coordinates of v on its side.
+        """
+        texture_ids = self.texture_ids.reshape(-1)
+        # texture index of v in the triangles of the edge, for each texture index of u
+        v_corners = 3 * faces[removed] + np.argmax(self.triangles[faces[removed]] == v[owners[removed]][:, None],
+                                                   axis=1)
+        u_corners = 3 * faces + corners
+        kept = ~removed
+        ids = self.texture_ids[faces[kept]]
+        before = _uv_areas(self.vertices_texture, ids)
+        ids[np.arange(len(ids)), corners[kept]] = _moved_ids(owners[removed], texture_ids[u_corners[removed]],
+                                                             texture_ids[v_corners], owners[kept],
+                                                             texture_ids[u_corners[kept]])
+        after = _uv_areas(self.vertices_texture, ids)
+        flipped = (before != 0) & (before * after <= 0) & np.all(ids >= 0, axis=1)
+        return owners[kept][flipped]
+
+    def _independent(self, u):
+        """
+        a maximal set of collapses changing different triangles, by priority (the order of u): a collapse
+        claims the vertices of the triangles of u and is kept when it comes first at all of them. The
+        collapses claiming a vertex of a kept one are dropped and the others compete again.
+        """
+        owners, faces, _ = self._triangles_around(u)
+        claims = self.triangles[faces].reshape(-1)
+        owners = np.repeat(owners, 3)
+        kept = np.zeros(len(u), dtype=bool)
+        claimed = np.zeros(self.num_vertices, dtype=bool)
+        while len(claims) > 0:
+            first = np.full(self.num_vertices, _NONE, dtype=np.int64)
+            np.minimum.at(first, claims, owners)
+            competing = np.bincount(owners, minlength=len(u)) > 0
+            won = competing & (np.bincount(owners[first[claims] != owners], minlength=len(u)) == 0)
+            kept |= won
+            claimed[claims[won[owners]]] = True
+            dropped = np.bincount(owners[claimed[claims]], minlength=len(u)) > 0
+            active = ~dropped[owners]
+            claims, owners = claims[active], owners[active]
+        return kept
+
+    def _collapse(self, u, v):
+        """
+        move the vertices u onto v, the collapses are independent.
+        """
+        if len(u) == 0:
+            return
+        mapping = np.arange(self.num_vertices)
+        mapping[u] = v
+        triangles = mapping[self.triangles]
+        removed = _degenerate(triangles)
+        # corners of u take the texture and normal indices of v in the triangles of their edge
+        flat = self.triangles.reshape(-1)
+        is_moved = mapping[flat] != flat
+        removed_corners = np.repeat(removed, 3)
+        sources = np.flatnonzero(is_moved & removed_corners)
+        targets = np.flatnonzero(is_moved & ~removed_corners)
+        faces = sources // 3
+        # corner of v in the triangle of each source corner
+        v_corners = 3 * faces + np.argmax(self.triangles[faces] == mapping[flat[sources]][:, None], axis=1)
+        for ids in (self.texture_ids.reshape(-1), self.normal_ids.reshape(-1)):
+            ids[targets] = _moved_ids(flat[sources], ids[sources], ids[v_corners], flat[targets], ids[targets])
+        self.quadrics[v] += self.quadrics[u]
+        self.triangles = triangles
+        self._keep_triangles(~removed)
+
+    def arrays(self):
+        """
+        current triangles, their texture and normal indices (T x 3, -1 for none) and materials.
+        """
+        return self.triangles, self.texture_ids, self.normal_ids, self.mtl_ids
+
+
+class _Edges:
+    def __init__(self, decimator):
+        """
+        unique edges of the triangles of a decimator, with their number of triangles and feature kind.
+        """
+        triangles = decimator.triangles
+        num_vertices = decimator.num_vertices
+        starts = triangles.reshape(-1)
+        ends = triangles[:, [1, 2, 0]].reshape(-1)
+        keys = np.minimum(starts, ends) * num_vertices + np.maximum(starts, ends)
+        order = np.argsort(keys)
+        keys = keys[order]
+        first = np.flatnonzero(np.concatenate([[True], keys[1:] != keys[:-1]])) if len(keys) else \
+            np.zeros(0, dtype=np.int64)
+        self.counts = np.diff(np.append(first, len(keys)))
+        self.first = order[first]                                         # first half-edge of each edge
+        self.second = np.where(self.counts > 1, order[np.minimum(first + 1, len(order) - 1)], -1)
+        self.ends = np.stack([keys[first] // num_vertices, keys[first] % num_vertices], axis=1)
+
+        kinds = np.where(self.counts == 2, 0, BORDER)
+        pair = np.flatnonzero(self.counts == 2)
+        h1, h2 = self.first[pair], self.second[pair]
+        # the second triangle goes through the edge in the other direction
+        consistent = starts[h1] == ends[h2]
+        kinds[pair[~consistent]] = BORDER
+        kinds[pair[decimator.mtl_ids[h1 // 3] != decimator.mtl_ids[h2 // 3]]] |= MATERIAL
+        for ids, kind in ((decimator.texture_ids.reshape(-1), UV_SEAM), (decimator.normal_ids.reshape(-1), NORMAL_SEAM)):
+            seam = (ids[h1] != ids[_next_corner(h2)]) | (ids[_next_corner(h1)] != ids[h2])
+            kinds[pair[seam & consistent]] |= kind
+        self.kinds = kinds
+
+    def adjacency(self, num_vertices):
+        """
+        neighbours of the vertices: the neighbours of vertex k are neighbours[offsets[k]:offsets[k + 1]].
+        """
+        both = np.concatenate([self.ends, self.ends[:, ::-1]])
+        order = np.argsort(both[:, 0])
+        offsets = np.zeros(num_vertices + 1, dtype=np.int64)
+        np.cumsum(np.bincount(both[:, 0], minlength=num_vertices), out=offsets[1:])
+        return both[order, 1], offsets
+
+
+def _corner_indices(indices, index):
+    if len(indices) == 0:
+        return np.full(index.shape, -1, dtype=np.int64)
+    return np.asarray(flat_indices(indices), dtype=np.int64)[index]
+
+
+def _next_corner(half):
+    return half - half % 3 + (half + 1) % 3
+
+
+def _degenerate(triangles):
+    return (triangles[:, 0] == triangles[:, 1]) | (triangles[:, 1] == triangles[:, 2]) | \
+        (triangles[:, 2] == triangles[:, 0])
+
+
+def _moved_ids(vertices, ids, new_ids, target_vertices, target_ids):
+    '''
+    Texture (or normal) indices of the moved corners: a target corner takes new_ids[k] of the source
+    corner k with the same vertex and index, and keeps its index when there is none.
+    '''
+    moved = target_ids.copy()
+    if len(ids) == 0 or len(target_ids) == 0:
+        return moved
+    span = int(max(ids.max(), target_ids.max())) + 2
+    keys = vertices * span + ids + 1
+    order = np.argsort(keys)
+    keys = keys[order]
+    target_keys = target_vertices * span + target_ids + 1
+    position = np.minimum(np.searchsorted(keys, target_keys), len(keys) - 1)
+    found = keys[position] == target_keys
+    moved[found] = new_ids[order[position[found]]]
+    return moved
+
+
+def _uv_areas(vertices_texture, ids):
+    '''
+    twice the signed areas of triangles in uv space, 0 for triangles without texture coordinates.
+    '''
+    uvs = vertices_texture[np.maximum(ids, 0), :2]
+    edges1, edges2 = uvs[:, 1] - uvs[:, 0], uvs[:, 2] - uvs[:, 0]
+    return np.where(np.all(ids >= 0, axis=1), edges1[:, 0] * edges2[:, 1] - edges1[:, 1] * edges2[:, 0], 0.)
+
+
+def _plane_quadrics(normals, offsets, weights):
+    '''
+    K x 10 quadrics of the planes normals . p + offsets = 0.
+    '''
+    x, y, z = normals.T
+    return weights[:, None] * np.stack([x * x, x * y, x * z, y * y, y * z, z * z,
+                                        x * offsets, y * offsets, z * offsets, offsets * offsets], axis=1)
+
+
+def _quadric_error(quadrics, points):
+    x, y, z = points.T
+    q = quadrics.T
+    return np.maximum(q[0] * x * x + 2 * q[1] * x * y + 2 * q[2] * x * z + q[3] * y * y + 2 * q[4] * y * z +
+                      q[5] * z * z + 2 * (q[6] * x + q[7] * y + q[8] * z) + q[9], 0.)
+
+
+def _scatter_add(quadrics, index, values):
+    for column in range(quadrics.shape[1]):
+        quadrics[:, column] += np.bincount(index, weights=values[:, column], minlength=len(quadrics))
+
+
+def _dot(a, b):
+    return np.einsum('ij,ij->i', a, b)
+
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors, dtype=np.float64), where=norms > 0)
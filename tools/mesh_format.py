@@ -0,0 +1,94 @@
+'''
+Native binary mesh format (.mpm).
+
+A file is a 16 bytes preamble (magic, version, header size), a JSON header
+describing the arrays and the mesh metadata, then the raw arrays, each one
+starting on a 64 bytes boundary. Reading memory-maps the file and returns
+views of it, so nothing is parsed or copied.
+'''
+import json
+import struct
+
+import numpy as np
+
+MAGIC = b'MPYMESH\0'
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+_PREAMBLE = struct.Struct('<8sII')
+
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def write_mesh(filename, arrays, meta):
+    '''
+    Write arrays and metadata in a binary mesh file.
+    Args:
+        filename: output path
+        arrays: dict name -> numpy array
+        meta: json serializable dict
+    '''
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+    header = {"meta": meta, "arrays": {}}
+    # the offsets depend on the header size, which depends on the offsets: iterate until it is stable
+    data_offset = _align(_PREAMBLE.size + 256)
+    while True:
+        offset = data_offset
+        for name, array in arrays.items():
+            header["arrays"][name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+            offset = _align(offset + array.nbytes)
+        header_bytes = json.dumps(header).encode()
+        if _PREAMBLE.size + len(header_bytes) <= data_offset:
+            break
+        data_offset = _align(_PREAMBLE.size + len(header_bytes) + 256)
+
+    with open(filename, 'wb') as ofile:
+        ofile.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header_bytes)))
+        ofile.write(header_bytes)
+        for name, array in arrays.items():
+            ofile.write(b'\0' * (header["arrays"][name]["offset"] - ofile.tell()))
+            if array.nbytes > 0:
+                ofile.write(memoryview(array.reshape(-1)).cast('B'))
+
+
+def read_header(filename):
+    '''
+    Header of a binary mesh file.
+    Returns:
+        dict with the metadata ("meta") and the dtype, shape and offset of each array ("arrays")
+    '''
+    with open(filename, 'rb') as ifile:
+        magic, version, header_size = _PREAMBLE.unpack(ifile.read(_PREAMBLE.size))
+        if magic != MAGIC:
+            raise ValueError("Error 011: {} is not a MeshPyIO binary mesh".format(filename))
+        if version > FORMAT_VERSION:
+            raise ValueError("Error 011: {} has format version {}, this version reads up to {}".format(
+                filename, version, FORMAT_VERSION))
+        return json.loads(ifile.read(header_size).decode())
+
+
+def read_mesh(filename, mmap_mode='c'):
+    '''
+    Read a binary mesh file without copying its arrays.
+    Args:
+        filename: path of the file
+        mmap_mode: 'r' read-only views, 'c' copy on write (changes stay in memory), 'r+' changes go to the file
+    Returns:
+        arrays: dict name -> view of the memory-mapped file
+        meta: metadata of the mesh
+    '''
+    header = read_header(filename)
+    data = None
+    arrays = {}
+    for name, info in header["arrays"].items():
+        dtype = np.dtype(info["dtype"])
+        shape = tuple(info["shape"])
+        nbytes = int(np.prod(shape)) * dtype.itemsize
+        if nbytes == 0:
+            arrays[name] = np.zeros(shape, dtype=dtype)
+            continue
+        if data is None:
+            data = np.memmap(filename, dtype=np.uint8, mode=mmap_mode)
+        arrays[name] = data[info["offset"]:info["offset"] + nbytes].view(dtype).reshape(shape)
+    return arrays, header["meta"]
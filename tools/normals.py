@@ -0,0 +1,96 @@
+'''
+Face and vertex normals.
+
+The faces are fan triangulated once into a NormalTopology holding the
+triangle corners and the face of each triangle. Normals are then sums of
+triangle cross products scattered with np.bincount, so meshes sharing
+their faces (frames of a sequence) only pay the triangulation once.
+'''
+import numpy as np
+
+from .polygons import as_polygons, fan_triangles
+
+NORMAL_WEIGHTINGS = ('area', 'angle', 'uniform')
+
+
+class NormalTopology:
+    def __init__(self, faces, num_vertices=None):
+        """
+        triangles of the faces, shared by all the normal computations of meshes with these faces.
+        :param faces: M x Nv vertex indices or PolygonArray
+        :param num_vertices: number of vertices, the largest index + 1 by default
+        """
+        polygons = as_polygons(faces)
+        index, face_ids = fan_triangles(polygons.offsets)
+        self.triangles = np.asarray(polygons.values, dtype=np.int64)[index].reshape(-1, 3)   # T x 3
+        self.face_ids = face_ids                                                            # face of each triangle
+        self.num_faces = len(polygons)
+        if num_vertices is None:
+            num_vertices = int(self.triangles.max()) + 1 if len(self.triangles) > 0 else 0
+        self.num_vertices = num_vertices
+        self._corners = self.triangles.reshape(-1)
+        self._uniform = bool(np.all(polygons.sizes == 3))      # one triangle per face
+        # vertex and face of the corners of the faces
+        self._face_corners = np.asarray(polygons.values, dtype=np.int64)
+        self._corner_faces = np.repeat(np.arange(self.num_faces), polygons.sizes)
+
+    def triangle_normals(self, vertices):
+        """
+        T x 3 cross products of the triangle edges, their norm is twice the triangle area.
+        """
+        vertices = np.asarray(vertices)[:, :3]
+        v0 = vertices[self.triangles[:, 0]]
+        return np.cross(vertices[self.triangles[:, 1]] - v0, vertices[self.triangles[:, 2]] - v0)
+
+    def face_normals(self, vertices):
+        """
+        M x 3 unit normals of the faces, 0 for degenerate faces.
+        """
+        normals = self.triangle_normals(vertices)
+        if not self._uniform:
+            normals = _scatter(self.face_ids, normals, self.num_faces)
+        return _normalize(normals)
+
+    def vertex_normals(self, vertices, weighting='area'):
+        """
+        N x 3 unit normals of the vertices, 0 for vertices of no (or only degenerate) face.
+        :param weighting: 'area' the normals of the incident triangles are weighted by their area,
+        'angle' by the angle of the triangle at the vertex, 'uniform' all the incident faces count the same
+        """
+        if weighting not in NORMAL_WEIGHTINGS:
+            raise ValueError("Error 012: unknown normal weighting {}, use one of {}".format(weighting,
+                                                                                           NORMAL_WEIGHTINGS))
+        if weighting == 'uniform':
+            return _normalize(_scatter(self._face_corners, self.face_normals(vertices)[self._corner_faces],
+                                       self.num_vertices))
+        normals = self.triangle_normals(vertices)
+        if weighting == 'area':
+            corner_normals = np.repeat(normals, 3, axis=0)
+        else:
+            corner_normals = (_normalize(normals)[:, None, :] * self.corner_angles(vertices)[:, :, None]).reshape(-1, 3)
+        return _normalize(_scatter(self._corners, corner_normals, self.num_vertices))
+
+    def corner_angles(self, vertices):
+        """
+        T x 3 angles of the triangles at their corners.
+        """
+        vertices = np.asarray(vertices)[:, :3]
+        corners = vertices[self.triangles]
+        angles = np.empty(self.triangles.shape)
+        for corner in range(3):
+            edge1 = _normalize(corners[:, (corner + 1) % 3] - corners[:, corner])
+            edge2 = _normalize(corners[:, (corner + 2) % 3] - corners[:, corner])
+            angles[:, corner] = np.arccos(np.clip(np.einsum('ij,ij->i', edge1, edge2), -1., 1.))
+        return angles
+
+
+def _scatter(index, values, size):
+    '''
+    sum of the rows of values with the same index.
+    '''
+    return np.stack([np.bincount(index, weights=values[:, column], minlength=size) for column in range(3)], axis=1)
+
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors, dtype=np.float64), where=norms > 0)
@@ -0,0 +1,149 @@
+'''
+Binary cache of parsed obj files.
+
+Each cached file is stored as a directory of .npy arrays plus a small json
+header, named after a hash of the obj path, size and modification time. A
+cache hit memory-maps the arrays (copy on write), so it costs about as much
+as reading the files from disk. The cache directory is kept under a maximum
+size by removing the least recently used entries.
+'''
+import hashlib
+import json
+import os
+import shutil
+import uuid
+
+import numpy as np
+
+from .obj_reader import ObjRecords
+
+CACHE_VERSION = 1
+_ARRAYS = ('vertices', 'vertices_texture', 'vertices_normals', 'corners', 'face_sizes', 'face_usemtl')
+
+
+class ObjCache:
+    def __init__(self, cache_dir, max_size=4 << 30):
+        """
+        cache of parsed obj files.
+        :param cache_dir: directory where the cache entries are stored
+        :param max_size: maximum size of the cache directory in bytes
+        """
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, filename):
+        """
+        cache key of an obj file, None if the file does not exist.
+        """
+        try:
+            stat = os.stat(filename)
+        except OSError:
+            return None
+        ident = "{}|{}|{}|{}".format(os.path.abspath(filename), stat.st_size, stat.st_mtime_ns, CACHE_VERSION)
+        return hashlib.sha1(ident.encode()).hexdigest()
+
+    def get(self, filename):
+        """
+        get the records of an obj file from the cache.
+        :return: ObjRecords with memory-mapped arrays or None on a miss
+        """
+        key = self.key(filename)
+        if key is None:
+            self.misses += 1
+            return None
+        entry = os.path.join(self.cache_dir, key)
+        try:
+            with open(os.path.join(entry, "meta.json"), 'r') as metaf:
+                meta = json.load(metaf)
+            records = ObjRecords()
+            for name in _ARRAYS:
+                shape = tuple(meta["shapes"][name])
+                if np.prod(shape) == 0:
+                    setattr(records, name, np.zeros(shape, dtype=meta["dtypes"][name]))
+                else:
+                    setattr(records, name, np.load(os.path.join(entry, name + ".npy"), mmap_mode='c'))
+        except (OSError, ValueError, KeyError):
+            self.misses += 1
+            return None
+        records.usemtl = meta["usemtl"]
+        records.mtllibs = meta["mtllibs"]
+        # the modification time of the entry orders the evictions
+        try:
+            os.utime(entry)
+        except OSError:
+            pass
+        self.hits += 1
+        return records
+
+    def put(self, filename, records):
+        """
+        store the records of an obj file, then evict the oldest entries if the cache is too big.
+        :param records: finalized ObjRecords
+        """
+        key = self.key(filename)
+        if key is None:
+            return
+        entry = os.path.join(self.cache_dir, key)
+        tmp_entry = os.path.join(self.cache_dir, ".{}.{}".format(key, uuid.uuid4().hex))
+        meta = {"path": os.path.abspath(filename), "version": CACHE_VERSION,
+                "usemtl": records.usemtl, "mtllibs": records.mtllibs, "shapes": {}, "dtypes": {}}
+        try:
+            os.makedirs(tmp_entry)
+            for name in _ARRAYS:
+                array = getattr(records, name)
+                meta["shapes"][name] = array.shape
+                meta["dtypes"][name] = array.dtype.str
+                if array.size > 0:
+                    np.save(os.path.join(tmp_entry, name + ".npy"), array)
+            with open(os.path.join(tmp_entry, "meta.json"), 'w') as metaf:
+                json.dump(meta, metaf)
+        except OSError as error:
+            print("Warning: cache entry of {} was not written: {}".format(filename, error))
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+            return
+        # the entry appears at once; if another process was faster, its entry is kept
+        try:
+            os.rename(tmp_entry, entry)
+        except OSError:
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+        self.evict()
+
+    def entries(self):
+        """
+        list the cache entries as (last use time, size, path), the oldest first.
+        """
+        entries = []
+        if not os.path.isdir(self.cache_dir):
+            return entries
+        for name in os.listdir(self.cache_dir):
+            entry = os.path.join(self.cache_dir, name)
+            if name.startswith('.') or not os.path.isdir(entry):
+                continue
+            try:
+                size = sum(f.stat().st_size for f in os.scandir(entry))
+                entries.append((os.stat(entry).st_mtime, size, entry))
+            except OSError:
+                continue
+        entries.sort()
+        return entries
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self, max_size=None):
+        """
+        remove the least recently used entries until the cache fits in max_size bytes.
+        """
+        max_size = self.max_size if max_size is None else max_size
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in entries:
+            if total <= max_size:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+
+    def clear(self):
+        self.evict(max_size=0)
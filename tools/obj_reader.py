@@ -0,0 +1,637 @@
+'''
+Block based reader for Wavefront .obj files.
+
+The file is read in large blocks that always end on a line boundary. Each
+block is split into lines with numpy, the lines are grouped by record type
+(v, vt, vn, f, usemtl, mtllib) and every group is converted to numpy arrays
+in one call. Blocks that do not follow the regular layout (leading blanks,
+inline comments, mixed face styles...) are parsed line by line instead, so
+the result is always the same as the historical per-line parser.
+
+Number conversion (np.fromstring) is most of the time and numpy releases the
+GIL while it runs, so read_obj parses the blocks in a pool of threads: the
+file is cut in at least two blocks per thread and the records of each block
+are joined in order.
+'''
+import hashlib
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from .polygons import fan_triangles
+from .profiling import NULL_PROFILE, Profile
+from .utils import parse_vertex
+
+BLOCK_SIZE = 1 << 24    # 16 MiB per block
+MIN_BLOCK_SIZE = 1 << 20
+PARSE_WORKERS = min(os.cpu_count() or 1, 8)
+
+_NL = ord('\n')
+_SLASH = ord('/')
+_SPACE = ord(' ')
+
+# line kinds
+_OTHER, _V, _VT, _VN, _F, _USEMTL, _MTLLIB = 0, 1, 2, 3, 4, 5, 6
+_KEYWORDS = (b'v', b'vt', b'vn', b'f', b'usemtl', b'mtllib')
+
+# records describing the topology of a frame: everything but the v and vn records
+_TOPOLOGY_KINDS = (_VT, _F, _USEMTL, _MTLLIB)
+_TOPOLOGY_KEYWORDS = (b'vt', b'f', b'usemtl', b'mtllib')
+
+# face styles: number of integers per corner and the (vid, tid, nid) columns they fill
+_FACE_STYLES = {
+    'v': (1, [0]),
+    'v/t': (2, [0, 1]),
+    'v//n': (2, [0, 2]),
+    'v/t/n': (3, [0, 1, 2]),
+}
+
+
+class ObjRecords:
+    def __init__(self):
+        """
+        container of the records read from an obj file.
+        """
+        self.vertices = []              # list of Nx3 (or Nx6) float arrays, one per block
+        self.vertices_texture = []
+        self.vertices_normals = []
+        self.corners = []               # list of Cx3 int arrays: vid, tid, nid (-1 for N/A)
+        self.face_sizes = []            # list of int arrays: number of corners of each face
+        self.face_usemtl = []           # list of int arrays: index in usemtl of the face material (-1: none)
+        self.usemtl = []                # material names in the order of the usemtl statements
+        self.mtllibs = []               # material library file names
+        self.current_usemtl = -1        # usemtl statement in effect at the end of the last block
+        self.topology = None            # list of the topology lines of the blocks, when a signature is requested
+        self.signature = None           # hex digest of the topology records, as computed by read_frame
+
+    def add(self, vertices, vertices_texture, vertices_normals, corners, face_sizes, face_usemtl):
+        for store, array in ((self.vertices, vertices), (self.vertices_texture, vertices_texture),
+                             (self.vertices_normals, vertices_normals), (self.corners, corners),
+                             (self.face_sizes, face_sizes), (self.face_usemtl, face_usemtl)):
+            if array is not None and len(array) > 0:
+                store.append(array)
+        if face_usemtl is not None and len(face_usemtl) > 0:
+            self.current_usemtl = int(face_usemtl[-1])
+
+    def extend(self, records):
+        """
+        add the records of the next block, parsed on their own: their usemtl indices are shifted and
+        their faces before the first usemtl get the material in effect at the end of these records.
+        """
+        offset = len(self.usemtl)
+        for name in ('vertices', 'vertices_texture', 'vertices_normals', 'corners', 'face_sizes'):
+            getattr(self, name).extend(getattr(records, name))
+        self.face_usemtl.extend(np.where(face_usemtl < 0, self.current_usemtl, face_usemtl + offset)
+                                for face_usemtl in records.face_usemtl)
+        self.usemtl.extend(records.usemtl)
+        self.mtllibs.extend(records.mtllibs)
+        if self.topology is not None:
+            self.topology.extend(records.topology)
+        if records.current_usemtl >= 0:
+            self.current_usemtl = records.current_usemtl + offset
+
+    def finalize(self):
+        """
+        concatenate the per block arrays.
+        """
+        self.vertices = _concatenate(self.vertices, (0, 3), np.float64)
+        self.vertices_texture = _concatenate(self.vertices_texture, (0, 2), np.float64)
+        self.vertices_normals = _concatenate(self.vertices_normals, (0, 3), np.float64)
+        self.corners = _concatenate(self.corners, (0, 3), np.int64)
+        self.face_sizes = _concatenate(self.face_sizes, (0,), np.int64)
+        self.face_usemtl = _concatenate(self.face_usemtl, (0,), np.int64)
+        return self
+
+    def take(self):
+        """
+        move the arrays read so far to new finalized records, the usemtl state is kept.
+        """
+        records = ObjRecords()
+        for name in ('vertices', 'vertices_texture', 'vertices_normals', 'corners', 'face_sizes', 'face_usemtl'):
+            setattr(records, name, getattr(self, name))
+            setattr(self, name, [])
+        records.usemtl = list(self.usemtl)
+        records.mtllibs, self.mtllibs = self.mtllibs, []
+        records.current_usemtl = self.current_usemtl
+        return records.finalize()
+
+
+class ObjChunk:
+    def __init__(self, mtllibs):
+        """
+        part of an obj file read by WavefrontOBJ.iter_chunks. Face indices are global.
+        """
+        self.mtllibs = mtllibs
+        self.vertex_offset = 0          # global index of the first vertex of the chunk
+        self.texture_offset = 0
+        self.normal_offset = 0
+        self.face_offset = 0
+        self.vertices = np.zeros((0, 3))
+        self.vertices_texture = np.zeros((0, 2))
+        self.vertices_normals = np.zeros((0, 3))
+        self.faces = np.zeros((0, 3), dtype=np.int64)
+        self.faces_texture_indices = np.zeros((0, 3), dtype=np.int64)
+        self.faces_norm_indices = np.zeros((0, 3), dtype=np.int64)
+        self.mtl_ids = np.zeros(0, dtype=np.int64)  # material index of each face in mtllibs[0]
+
+
+def _concatenate(arrays, empty_shape, dtype):
+    if len(arrays) == 0:
+        return np.zeros(empty_shape, dtype=dtype)
+    if len(arrays) == 1:
+        return arrays[0]
+    return np.concatenate(arrays)
+
+
+def iter_blocks(objf, block_size=BLOCK_SIZE):
+    '''
+    Read a binary file object by blocks ending on a line boundary.
+    Args:
+        objf: file opened in binary mode
+        block_size: approximative size of the blocks in bytes
+    Returns:
+        generator of bytes, each one ends with a new line
+    '''
+    tail = b''
+    while True:
+        chunk = objf.read(block_size)
+        if not chunk:
+            break
+        if tail:
+            chunk = tail + chunk
+        cut = chunk.rfind(b'\n') + 1
+        if cut == 0:
+            tail = chunk
+            continue
+        tail = chunk[cut:]
+        yield chunk[:cut] if cut < len(chunk) else chunk
+    if tail:
+        yield tail + b'\n'
+
+
+def read_obj(filename, block_size=BLOCK_SIZE, profile=NULL_PROFILE, workers=None, signature=False):
+    '''
+    Read all the records of an obj file.
+    Args:
+        filename: obj file path
+        block_size: size of the blocks read from the file
+        profile: Profile receiving the read, tokenize, floats, faces, lines and concatenate phases
+        workers: number of threads parsing blocks, PARSE_WORKERS by default, 1 parses in this thread
+        signature: also hash the topology records, the digest is the one of read_frame
+    Returns:
+        ObjRecords with concatenated arrays
+    '''
+    workers = PARSE_WORKERS if workers is None else workers
+    records = ObjRecords()
+    digest = None
+    if signature:
+        digest = hashlib.sha1()
+        records.topology = []
+    with open(filename, 'rb') as objf:
+        if workers > 1:
+            # at least two blocks per thread
+            size = os.fstat(objf.fileno()).st_size
+            block_size = min(block_size, max(size // (2 * workers) + 1, MIN_BLOCK_SIZE))
+        blocks = _timed_blocks(iter_blocks(objf, block_size), profile)
+        if workers > 1:
+            for block_records in _parse_blocks(blocks, workers, profile, signature):
+                records.extend(block_records)
+                _update_digest(digest, records)
+        else:
+            for block in blocks:
+                parse_block(block, records, profile)
+                _update_digest(digest, records)
+    if digest is not None:
+        records.topology = None
+        records.signature = digest.hexdigest()
+    start = profile.clock()
+    records.finalize()
+    profile.stop('concatenate', start, len(records.face_sizes))
+    return records
+
+
+def _update_digest(digest, records):
+    # the topology lines are hashed in the order of the blocks
+    if digest is not None:
+        for lines in records.topology:
+            digest.update(lines)
+        records.topology.clear()
+
+
+def _parse_blocks(blocks, workers, profile, signature=False):
+    '''
+    Parse blocks in a pool of threads, at most two blocks per thread are read ahead.
+    Returns:
+        generator of the ObjRecords of each block, in the order of the blocks
+    '''
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for block in blocks:
+            pending.append(pool.submit(_parse_block_records, block, profile, signature))
+            if len(pending) >= 2 * workers:
+                yield _merge_profile(pending.popleft().result(), profile)
+        while pending:
+            yield _merge_profile(pending.popleft().result(), profile)
+
+
+def _parse_block_records(block, profile, signature=False):
+    # each thread times its phases in its own profile
+    block_profile = Profile(profile.operation, profile.path) if profile else NULL_PROFILE
+    records = ObjRecords()
+    if signature:
+        records.topology = []
+    parse_block(block, records, block_profile)
+    return records, block_profile
+
+
+def _merge_profile(result, profile):
+    records, block_profile = result
+    for phase, (seconds, count, nbytes) in block_profile.phases.items():
+        entry = profile.phases.setdefault(phase, [0., 0, 0])
+        entry[0] += seconds
+        entry[1] += count
+        entry[2] += nbytes
+    return records
+
+
+def _timed_blocks(blocks, profile):
+    start = profile.clock()
+    for block in blocks:
+        profile.stop('read', start, nbytes=len(block))
+        yield block
+        start = profile.clock()
+
+
+def iter_records(filename, block_size=BLOCK_SIZE):
+    '''
+    Read an obj file block by block.
+    Args:
+        filename: obj file path
+        block_size: size of the blocks read from the file
+    Returns:
+        generator of ObjRecords holding the arrays of one block each. usemtl lists all the
+        statements read so far, mtllibs only the new ones.
+    '''
+    records = ObjRecords()
+    with open(filename, 'rb') as objf:
+        for block in iter_blocks(objf, block_size):
+            parse_block(block, records)
+            yield records.take()
+
+
+def read_frame(filename, block_size=BLOCK_SIZE, signature=True, normals=True):
+    '''
+    Read only the vertex positions and normals of an obj file, for frames sharing the topology of another file.
+    Args:
+        filename: obj file path
+        block_size: size of the blocks read from the file
+        signature: also hash the other records (vt, f, usemtl, mtllib) to compare the topology of frames
+        normals: read the vn records, they are skipped otherwise
+    Returns:
+        vertices: Nx3 (or Nx6) array
+        vertices_normals: Nx3 array, None if not requested
+        signature: hex digest of the topology records, None if not requested
+    '''
+    vertices, vertices_normals = [], []
+    digest = hashlib.sha1() if signature else None
+    with open(filename, 'rb') as objf:
+        for block in iter_blocks(objf, block_size):
+            block_normals = vertices_normals if normals else None
+            if not _parse_frame_bulk(block, vertices, block_normals, digest):
+                _parse_frame_lines(block, vertices, block_normals, digest)
+    return (_concatenate(vertices, (0, 3), np.float64),
+            _concatenate(vertices_normals, (0, 3), np.float64) if normals else None,
+            digest.hexdigest() if digest is not None else None)
+
+
+def _parse_frame_bulk(data, vertices, vertices_normals, digest):
+    lines = _split_lines(data)
+    if _statements(data, lines) is None:
+        return False
+    block_vertices = _parse_floats(lines, _V, 1)
+    block_normals = _parse_floats(lines, _VN, 2) if vertices_normals is not None else np.zeros((0, 3))
+    if block_vertices is None or block_normals is None:
+        return False
+    if digest is not None:
+        digest.update(_topology_lines(lines))
+    for store, array in ((vertices, block_vertices), (vertices_normals, block_normals)):
+        if len(array) > 0:
+            store.append(array)
+    return True
+
+
+def _parse_frame_lines(data, vertices, vertices_normals, digest):
+    block_vertices, block_normals = [], []
+    for line in data.split(b'\n'):
+        toks = line.split()
+        if not toks:
+            continue
+        if toks[0] == b'v':
+            block_vertices.append([float(v) for v in toks[1:]])
+        elif toks[0] == b'vn' and vertices_normals is not None:
+            block_normals.append([float(v) for v in toks[1:]])
+    if digest is not None:
+        digest.update(_parse_topology_lines(data))
+    for store, array in ((vertices, block_vertices), (vertices_normals, block_normals)):
+        if len(array) > 0:
+            store.append(np.array(array, dtype=np.float64))
+
+
+def _topology_lines(lines):
+    # bytes of the vt, f, usemtl and mtllib lines of a block split by _split_lines and _statements
+    buf, starts, ends, kind = lines
+    return buf[np.repeat(np.isin(kind, _TOPOLOGY_KINDS), ends - starts + 1)].tobytes()
+
+
+def _parse_topology_lines(data):
+    # same as _topology_lines for irregular blocks
+    topology = []
+    for line in data.split(b'\n'):
+        toks = line.split()
+        if toks and toks[0] in _TOPOLOGY_KEYWORDS:
+            topology.append(line + b'\n')
+    return b''.join(topology)
+
+
+def parse_block(data, records, profile=NULL_PROFILE):
+    '''
+    Parse a block of complete lines and add its content to records.
+    Args:
+        data: bytes, ending with a new line
+        records: ObjRecords, its topology lines are also kept when records.topology is a list
+        profile: Profile of the parsing phases
+    '''
+    if not _parse_block_bulk(data, records, profile):
+        start = profile.clock()
+        parse_lines(data, records)
+        if records.topology is not None:
+            records.topology.append(_parse_topology_lines(data))
+        profile.stop('lines', start, data.count(b'\n') if profile else 0, len(data))
+
+
+def parse_lines(data, records):
+    '''
+    Parse a block line by line, used for blocks the bulk parser can not handle.
+    '''
+    vertices, vertices_texture, vertices_normals = [], [], []
+    corners, face_sizes, face_usemtl = [], [], []
+    cur_usemtl = records.current_usemtl
+    for line in data.decode().split('\n'):
+        toks = line.split()
+        if not toks:
+            continue
+        if toks[0] == 'v':
+            vertices.append([float(v) for v in toks[1:]])
+        elif toks[0] == 'vn':
+            vertices_normals.append([float(v) for v in toks[1:]])
+        elif toks[0] == 'vt':
+            vertices_texture.append([float(v) for v in toks[1:]])
+        elif toks[0] == 'f':
+            corners.extend(parse_vertex(vstr) for vstr in toks[1:])
+            face_sizes.append(len(toks) - 1)
+            face_usemtl.append(cur_usemtl)
+        elif toks[0] == 'mtllib':
+            records.mtllibs.append(toks[1])
+        elif toks[0] == 'usemtl':
+            records.usemtl.append(toks[1])
+            cur_usemtl = len(records.usemtl) - 1
+    records.add(np.array(vertices, dtype=np.float64),
+                np.array(vertices_texture, dtype=np.float64),
+                np.array(vertices_normals, dtype=np.float64),
+                np.array(corners, dtype=np.int64).reshape(-1, 3),
+                np.array(face_sizes, dtype=np.int64),
+                np.array(face_usemtl, dtype=np.int64))
+    records.current_usemtl = cur_usemtl
+
+
+def _parse_block_bulk(data, records, profile=NULL_PROFILE):
+    '''
+    Parse a block with array operations.
+    Returns:
+        False if the block is irregular and must be parsed line by line, records are untouched in this case.
+    '''
+    start = profile.clock()
+    lines = _split_lines(data)
+    statements = _statements(data, lines)
+    profile.stop('tokenize', start, len(lines[1]), len(data))
+    if statements is None:
+        return False
+    usemtl_lines, usemtl_names, mtllibs = statements
+
+    start = profile.clock()
+    vertices = _parse_floats(lines, _V, 1)
+    vertices_texture = _parse_floats(lines, _VT, 2)
+    vertices_normals = _parse_floats(lines, _VN, 2)
+    if vertices is None or vertices_texture is None or vertices_normals is None:
+        return False
+    profile.stop('floats', start, len(vertices) + len(vertices_texture) + len(vertices_normals))
+    start = profile.clock()
+    faces = _parse_faces(lines)
+    if faces is None:
+        return False
+    corners, face_sizes = faces
+    profile.stop('faces', start, len(face_sizes))
+
+    # material in effect for each face
+    offset = len(records.usemtl)
+    face_lines = np.flatnonzero(lines[3] == _F)
+    group = np.searchsorted(np.array(usemtl_lines, dtype=np.int64), face_lines, side='right') - 1
+    face_usemtl = np.where(group < 0, records.current_usemtl, group + offset)
+
+    records.usemtl.extend(usemtl_names)
+    records.mtllibs.extend(mtllibs)
+    records.add(vertices, vertices_texture, vertices_normals, corners, face_sizes, face_usemtl)
+    if records.topology is not None:
+        records.topology.append(_topology_lines(lines))
+    if usemtl_names:
+        records.current_usemtl = offset + len(usemtl_names) - 1
+    return True
+
+
+def _split_lines(data):
+    '''
+    Split a block in lines and classify them by their first characters.
+    Returns:
+        buf: bytes of the block as a uint8 array
+        starts, ends: position of the first character and of the new line of each line
+        kind: kind of each line, usemtl and mtllib lines are only marked by _statements
+    '''
+    buf = np.frombuffer(data, dtype=np.uint8)
+    ends = np.flatnonzero(buf == _NL)
+    starts = np.empty_like(ends)
+    starts[0] = 0
+    starts[1:] = ends[:-1] + 1
+    last = len(buf) - 1
+
+    c0 = buf[starts]
+    c1 = buf[np.minimum(starts + 1, last)]
+    c2 = buf[np.minimum(starts + 2, last)]
+    kind = np.zeros(len(starts), dtype=np.int8)
+    is_v = c0 == ord('v')
+    kind[is_v & (c1 <= _SPACE)] = _V
+    kind[is_v & (c1 == ord('t')) & (c2 <= _SPACE)] = _VT
+    kind[is_v & (c1 == ord('n')) & (c2 <= _SPACE)] = _VN
+    kind[(c0 == ord('f')) & (c1 <= _SPACE)] = _F
+    return buf, starts, ends, kind
+
+
+def _statements(data, lines):
+    '''
+    Read the few usemtl and mtllib statements of a block in python.
+    Returns:
+        usemtl_lines, usemtl_names, mtllibs, or None if the block is irregular
+    '''
+    buf, starts, ends, kind = lines
+    c0 = buf[starts]
+    usemtl_lines, usemtl_names, mtllibs = [], [], []
+    for i in np.flatnonzero((c0 == ord('u')) | (c0 == ord('m')) | (c0 == _SPACE) | (c0 == ord('\t'))):
+        toks = data[starts[i]:ends[i]].split()
+        if not toks:
+            continue
+        if toks[0] == b'usemtl':
+            usemtl_lines.append(i)
+            usemtl_names.append(toks[1].decode())
+            kind[i] = _USEMTL
+        elif toks[0] == b'mtllib':
+            mtllibs.append(toks[1].decode())
+            kind[i] = _MTLLIB
+        elif toks[0] in _KEYWORDS:
+            return None
+    return usemtl_lines, usemtl_names, mtllibs
+
+
+def _select(lines, line_kind, prefix):
+    '''
+    Gather the bytes of all lines of a kind and blank their record keyword.
+    Returns:
+        sel: bytes of the lines, as a writable uint8 array
+        pos: start of each line in sel
+    '''
+    buf, starts, ends, kind = lines
+    index = np.flatnonzero(kind == line_kind)
+    if len(index) == 0:
+        return buf[:0].copy(), np.zeros(0, dtype=np.int64)
+    if index[-1] - index[0] + 1 == len(index):
+        # the records of a kind are usually grouped: a simple slice is enough
+        sel = buf[starts[index[0]]:ends[index[-1]] + 1].copy()
+        pos = starts[index] - starts[index[0]]
+    else:
+        lengths = ends[index] - starts[index] + 1
+        sel = buf[np.repeat(kind == line_kind, ends - starts + 1)]
+        pos = np.cumsum(lengths) - lengths
+    for i in range(prefix):
+        sel[pos + i] = _SPACE
+    return sel, pos
+
+
+def _line_tokens(sel, pos):
+    '''
+    Returns:
+        tokens: start of each token in sel
+        counts: number of tokens of each line
+    '''
+    tokens = _token_starts(sel)
+    # the new line closing each line gives the number of tokens before it
+    counts = np.diff(np.searchsorted(tokens, pos), append=len(tokens))
+    return tokens, counts
+
+
+def _token_starts(sel):
+    blank = sel <= _SPACE
+    token_start = ~blank
+    token_start[1:] &= blank[:-1]
+    return np.flatnonzero(token_start)
+
+
+def _parse_floats(lines, line_kind, prefix):
+    sel, pos = _select(lines, line_kind, prefix)
+    if len(pos) == 0:
+        return np.zeros((0, 0))
+    tokens, counts = _line_tokens(sel, pos)
+    ncols = counts[0]
+    if ncols == 0 or np.any(counts != ncols):
+        return None
+    try:
+        values = np.fromstring(sel, dtype=np.float64, sep=' ')
+    except ValueError:
+        return None
+    if values.size != len(tokens):
+        return None
+    return values.reshape(-1, ncols)
+
+
+def _parse_faces(lines):
+    sel, pos = _select(lines, _F, 1)
+    if len(pos) == 0:
+        return np.zeros((0, 3), dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    # the slashes become blanks, the integers of all corners are then read at once
+    is_slash = sel == _SLASH
+    slashes = np.flatnonzero(is_slash)
+    sel -= is_slash.view(np.uint8) * np.uint8(_SLASH - _SPACE)
+    numbers, counts = _line_tokens(sel, pos)
+
+    # face style from the number of slashes and integers
+    num_numbers = len(numbers)
+    doubles = np.count_nonzero(slashes[1:] == slashes[:-1] + 1)
+    if len(slashes) == 0:
+        style = 'v'
+    elif doubles == 0 and 2 * len(slashes) == num_numbers:
+        style = 'v/t'
+    elif doubles == 0 and 3 * len(slashes) == 2 * num_numbers:
+        style = 'v/t/n'
+    elif 2 * doubles == len(slashes) == num_numbers:
+        style = 'v//n'
+    else:
+        return None
+    ncomp, columns = _FACE_STYLES[style]
+    if not _corners_aligned(sel, slashes, numbers, style):
+        return None
+
+    try:
+        values = np.fromstring(sel, dtype=np.int64, sep=' ')
+    except ValueError:
+        return None
+    if values.size != num_numbers:
+        return None
+    values -= 1
+    if ncomp == 3:
+        corners = values.reshape(-1, 3)
+    else:
+        corners = np.full((num_numbers // ncomp, 3), -1, dtype=np.int64)
+        corners[:, columns] = values.reshape(-1, ncomp)
+    return corners, counts // ncomp
+
+
+def _corners_aligned(sel, slashes, numbers, style):
+    '''
+    Check that each slash follows an integer and is followed by the next integer of its corner
+    (by the second slash for v//n), so that corners are groups of consecutive integers.
+    '''
+    if style == 'v':
+        return True
+    if style == 'v//n':
+        firsts, seconds = slashes[0::2], slashes[1::2]
+        return bool(np.all(seconds == firsts + 1) and np.all(numbers[1::2] == seconds + 1) and
+                    np.all(sel[firsts - 1] - np.uint8(ord('0')) < 10))
+    ncomp = _FACE_STYLES[style][0]
+    followers = np.delete(numbers, np.s_[::ncomp])
+    return bool(np.all(followers == slashes + 1) and np.all(sel[slashes - 1] - np.uint8(ord('0')) < 10))
+
+
+def triangulate_corners(corners, face_sizes):
+    '''
+    Fan triangulation of polygons stored as consecutive corners.
+    Args:
+        corners: Cx3 corners (vid, tid, nid) of all faces
+        face_sizes: number of corners of each face
+    Returns:
+        triangles: Tx3x3 corners of the triangles, (c0, ci-1, ci) for each polygon
+        face_ids: index of the source face of each triangle
+    '''
+    offsets = np.zeros(len(face_sizes) + 1, dtype=np.int64)
+    np.cumsum(face_sizes, out=offsets[1:])
+    index, face_ids = fan_triangles(offsets)
+    return corners[index], face_ids
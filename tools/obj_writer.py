@@ -0,0 +1,98 @@
+'''
+Buffered writer for Wavefront .obj records.
+
+Records are formatted by groups of rows: a format string is built for a
+whole group and filled at once with the python values of the array, which
+is much faster than formatting each value separately.
+'''
+import numpy as np
+
+from .polygons import as_polygons
+
+WRITE_BUFFER = 1 << 22     # 4 MiB file buffer
+CHUNK_ROWS = 1 << 16       # rows formatted per string
+
+# corner formats by (has texture index, has normal index)
+_CORNER_FORMATS = {
+    (False, False): ' %d',
+    (True, False): ' %d/%d',
+    (False, True): ' %d//%d',
+    (True, True): ' %d/%d/%d',
+}
+
+
+def float_format(precision=None):
+    '''
+    Format of a float value.
+    Args:
+        precision: number of decimals, None for the shortest exact representation (python repr)
+    '''
+    return '%r' if precision is None else '%.{}f'.format(precision)
+
+
+def write_rows(ofile, row_format, array, chunk_rows=CHUNK_ROWS):
+    '''
+    Write a 2D array with one format string per row.
+    Args:
+        ofile: text file
+        row_format: format of a row, with one field per column
+        array: N x D array
+    '''
+    for start in range(0, len(array), chunk_rows):
+        chunk = array[start:start + chunk_rows]
+        ofile.write((row_format * len(chunk)) % tuple(chunk.ravel().tolist()))
+
+
+def write_vectors(ofile, keyword, array, precision=None):
+    '''
+    Write v, vt or vn records.
+    '''
+    array = np.asarray(array)
+    if array.size == 0:
+        return
+    array = array.reshape(len(array), -1)
+    row_format = keyword + (' ' + float_format(precision)) * array.shape[1] + '\n'
+    write_rows(ofile, row_format, array)
+
+
+def write_faces(ofile, faces, faces_texture_indices, faces_norm_indices, face_indices):
+    '''
+    Write the f records of a group of faces, in the order of face_indices.
+    A face has texture (resp. normal) indices when the index of its first corner is positive.
+    Args:
+        faces: M x Nv vertex indices or PolygonArray
+        faces_texture_indices: texture indices like faces, or empty
+        faces_norm_indices: normal indices like faces, or empty
+        face_indices: indices of the faces to write
+    '''
+    face_indices = np.asarray(face_indices, dtype=np.int64)
+    if len(face_indices) == 0:
+        return
+    polygons = as_polygons(faces).take(face_indices)
+    vids = polygons.values.astype(np.int64) + 1
+    tids = _optional_indices(faces_texture_indices, face_indices)
+    nids = _optional_indices(faces_norm_indices, face_indices)
+    firsts = polygons.offsets[:-1]
+    has_tex = tids[firsts] > 0 if tids is not None else np.zeros(len(firsts), dtype=bool)
+    has_norm = nids[firsts] > 0 if nids is not None else np.zeros(len(firsts), dtype=bool)
+
+    # consecutive faces with the same size and corner style are written together
+    sizes = polygons.sizes
+    style = has_tex.astype(np.int64) + 2 * has_norm + 4 * sizes
+    bounds = np.concatenate([[0], np.flatnonzero(np.diff(style)) + 1, [len(style)]])
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        key = (bool(has_tex[start]), bool(has_norm[start]))
+        corner_range = slice(polygons.offsets[start], polygons.offsets[end])
+        columns = [vids[corner_range]]
+        if key[0]:
+            columns.append(tids[corner_range])
+        if key[1]:
+            columns.append(nids[corner_range])
+        corners = np.stack(columns, axis=1).reshape(end - start, -1)
+        write_rows(ofile, 'f' + _CORNER_FORMATS[key] * int(sizes[start]) + '\n', corners)
+
+
+def _optional_indices(indices, face_indices):
+    if len(indices) == 0:
+        return None
+    return as_polygons(indices).take(face_indices).values.astype(np.int64) + 1
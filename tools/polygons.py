@@ -0,0 +1,157 @@
+'''
+Compact storage of polygons with different numbers of vertices.
+
+The indices of all faces are stored in one flat array and face i uses
+values[offsets[i]:offsets[i+1]] (compressed sparse rows), so meshes mixing
+triangles, quads and n-gons need no per face python object.
+'''
+import numpy as np
+
+
+class PolygonArray:
+    def __init__(self, values, offsets):
+        """
+        polygons stored as flat indices and face offsets.
+        :param values: indices of the corners of all faces
+        :param offsets: M+1 offsets, face i uses values[offsets[i]:offsets[i+1]]
+        """
+        self.values = np.asarray(values)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+
+    @staticmethod
+    def from_sizes(values, sizes):
+        offsets = np.zeros(len(sizes) + 1, dtype=np.int64)
+        np.cumsum(sizes, out=offsets[1:])
+        return PolygonArray(values, offsets)
+
+    @staticmethod
+    def from_dense(array):
+        """
+        convert a M x Nv array of faces.
+        """
+        array = np.asarray(array)
+        return PolygonArray(array.reshape(-1), np.arange(len(array) + 1, dtype=np.int64) * array.shape[1])
+
+    @property
+    def sizes(self):
+        return np.diff(self.offsets)
+
+    @property
+    def shape(self):
+        return (len(self), )
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            if index < 0:
+                index += len(self)
+            return self.values[self.offsets[index]:self.offsets[index + 1]]
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step == 1:
+                stop = max(start, stop)
+                return PolygonArray(self.values[self.offsets[start]:self.offsets[stop]],
+                                    self.offsets[start:stop + 1] - self.offsets[start])
+            index = np.arange(start, stop, step)
+        return self.take(index)
+
+    def take(self, face_indices):
+        """
+        select faces, in the order of face_indices.
+        """
+        face_indices = np.asarray(face_indices, dtype=np.int64)
+        sizes = self.sizes[face_indices]
+        result = PolygonArray.from_sizes(None, sizes)
+        # position of each corner in values: face start + rank of the corner in its face
+        starts = np.repeat(self.offsets[face_indices] - result.offsets[:-1], sizes)
+        result.values = self.values[starts + np.arange(result.offsets[-1])]
+        return result
+
+    def is_uniform(self):
+        sizes = self.sizes
+        return len(sizes) == 0 or bool(np.all(sizes == sizes[0]))
+
+    def to_dense(self):
+        """
+        convert to a M x Nv array, all faces must have the same number of vertices.
+        """
+        if not self.is_uniform():
+            raise ValueError("Error 005: polygons of different sizes can not be stored in a dense array")
+        size = int(self.sizes[0]) if len(self) > 0 else 0
+        return self.values.reshape(len(self), size)
+
+    def triangulate(self):
+        """
+        fan triangulation of the polygons.
+        :return: T x 3 triangles and the index of the source face of each triangle
+        """
+        index, face_ids = fan_triangles(self.offsets)
+        return self.values[index], face_ids
+
+    def copy(self):
+        return PolygonArray(self.values.copy(), self.offsets.copy())
+
+
+def as_polygons(faces):
+    '''
+    View dense M x Nv faces as a PolygonArray, PolygonArray are returned as is.
+    '''
+    return faces if isinstance(faces, PolygonArray) else PolygonArray.from_dense(faces)
+
+
+def flat_indices(faces):
+    '''
+    Flat corner indices of dense or PolygonArray faces.
+    '''
+    return faces.values if isinstance(faces, PolygonArray) else np.asarray(faces).reshape(-1)
+
+
+def absent_indices(faces):
+    '''
+    Indices of value -1 (no texture coordinate or normal) shaped like faces. The value is broadcast,
+    so the array takes no memory per face; it is read-only.
+    '''
+    if isinstance(faces, PolygonArray):
+        return PolygonArray(np.broadcast_to(np.int64(-1), faces.values.shape), faces.offsets)
+    return np.broadcast_to(np.int64(-1), np.shape(faces))
+
+
+def fan_triangles(offsets):
+    '''
+    Fan triangulation of polygons stored with offsets.
+    Args:
+        offsets: M+1 offsets of the faces in their flat corner array
+    Returns:
+        index: T x 3 positions in the flat corner array, (c0, ci-1, ci) for each polygon
+        face_ids: index of the source face of each triangle
+    '''
+    sizes = np.diff(offsets)
+    num_tris = np.maximum(sizes - 2, 0)
+    face_ids = np.repeat(np.arange(len(sizes)), num_tris)
+    base = offsets[:-1][face_ids]
+    j = np.arange(len(face_ids)) - np.repeat(np.cumsum(num_tris) - num_tris, num_tris)
+    index = np.stack([base, base + j + 1, base + j + 2], axis=1)
+    return index, face_ids
+
+
+def triangle_ranges(sizes, face_indices):
+    '''
+    Indices of the triangles created by fan triangulation of some faces.
+    Args:
+        sizes: number of vertices of all faces
+        face_indices: faces to follow
+    Returns:
+        indices of their triangles, in the order of face_indices
+    '''
+    num_tris = np.maximum(np.asarray(sizes) - 2, 0)
+    first = np.cumsum(num_tris) - num_tris
+    face_indices = np.asarray(face_indices, dtype=np.int64)
+    counts = num_tris[face_indices]
+    local = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return np.repeat(first[face_indices], counts) + local
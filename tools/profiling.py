@@ -0,0 +1,127 @@
+'''
+Per-phase profiling of load, save and render.
+
+Profiling is off by default: the instrumented functions then get
+NULL_PROFILE, whose methods do nothing, so the cost is two empty calls per
+phase (not per record). Once enabled, every operation fills a Profile with
+the duration, record count and bytes of its phases; the profile is kept on
+the mesh (obj.profile) and passed to the registered callbacks and logger.
+'''
+import logging
+import time
+
+LOGGER = logging.getLogger("MeshPyIO.profile")
+
+_settings = {"enabled": False, "callbacks": [], "logger": None}
+
+
+class Profile:
+    def __init__(self, operation, path=None):
+        """
+        durations, record counts and bytes of the phases of one operation.
+        :param operation: name of the operation (load, save_obj, render...)
+        :param path: file of the operation
+        """
+        self.operation = operation
+        self.path = path
+        self.phases = {}               # phase name -> [seconds, count, bytes], in order of first use
+        self.start = time.perf_counter()
+        self.seconds = 0.
+
+    def __bool__(self):
+        return True
+
+    @staticmethod
+    def clock():
+        return time.perf_counter()
+
+    def stop(self, phase, start, count=0, nbytes=0):
+        """
+        add the time since start to a phase, calls of the same phase are summed.
+        :param start: value of clock() at the start of the phase
+        :param count: number of records processed
+        :param nbytes: number of bytes processed
+        """
+        entry = self.phases.setdefault(phase, [0., 0, 0])
+        entry[0] += time.perf_counter() - start
+        entry[1] += count
+        entry[2] += nbytes
+
+    def finish(self):
+        """
+        end the operation and report it to the callbacks and logger.
+        """
+        self.seconds = time.perf_counter() - self.start
+        for callback in list(_settings["callbacks"]):
+            callback(self)
+        if _settings["logger"] is not None:
+            _settings["logger"].info(self.to_string())
+        return self
+
+    def to_dict(self):
+        return {"operation": self.operation, "path": self.path, "seconds": self.seconds,
+                "phases": {name: {"seconds": seconds, "count": count, "bytes": nbytes}
+                           for name, (seconds, count, nbytes) in self.phases.items()}}
+
+    def to_string(self):
+        msg = "{} {}: {:.4f}s".format(self.operation, self.path or "", self.seconds)
+        for name, (seconds, count, nbytes) in self.phases.items():
+            msg += "\n\t{:12s} {:9.4f}s {:10d} records {:12d} bytes".format(name, seconds, count, nbytes)
+        return msg
+
+
+class _NullProfile:
+    """
+    profile of operations run with profiling disabled.
+    """
+    operation = None
+    path = None
+    phases = {}
+
+    def __bool__(self):
+        return False
+
+    @staticmethod
+    def clock():
+        return 0.
+
+    def stop(self, phase, start, count=0, nbytes=0):
+        pass
+
+    def finish(self):
+        return None
+
+
+NULL_PROFILE = _NullProfile()
+
+
+def enable_profiling(callback=None, logger=None):
+    '''
+    Profile the following operations.
+    Args:
+        callback: function called with the Profile of each operation
+        logger: logging.Logger receiving the profiles at INFO level, True for the MeshPyIO.profile logger
+    '''
+    _settings["enabled"] = True
+    if callback is not None:
+        _settings["callbacks"].append(callback)
+    if logger is not None:
+        _settings["logger"] = LOGGER if logger is True else logger
+
+
+def disable_profiling():
+    '''
+    Stop profiling and remove the callbacks and logger.
+    '''
+    _settings.update(enabled=False, callbacks=[], logger=None)
+
+
+def profiling_enabled():
+    return _settings["enabled"]
+
+
+def new_profile(operation, path=None):
+    '''
+    Profile of a new operation, NULL_PROFILE when profiling is disabled.
+    '''
+    return Profile(operation, path) if _settings["enabled"] else NULL_PROFILE
@@ -0,0 +1,266 @@
+'''
+Vectorized z-buffer rasterization.
+
+Triangles are processed by batches: every (triangle, pixel) pair of the
+bounding boxes of a batch is tested at once with the barycentric test of
+isPointInTri, then the nearest triangle of each pixel is kept. Triangles
+are flat-shaded with the mean depth of their vertices and the bigger z is
+the fronter, on equal depths the first triangle wins, as in the per pixel
+loops of render.py. rasterize_tiled splits the image in tiles rasterized
+by a pool of processes.
+'''
+import os
+
+import numpy as np
+
+MAX_PAIRS = 1 << 22         # (triangle, pixel) pairs tested per batch
+TILE_SIZE = 256             # tile size of rasterize_tiled, in pixels
+EMPTY_DEPTH = -999999.
+
+
+def triangle_depth(vertices, triangles):
+    '''
+    Mean depth of the vertices of each triangle.
+    Args:
+        vertices: 3 x nver
+        triangles: 3 x ntri
+    '''
+    return (vertices[2, triangles[0, :]] + vertices[2, triangles[1, :]] + vertices[2, triangles[2, :]]) / 3.
+
+
+def bounding_boxes(points, triangles, h, w):
+    '''
+    Pixel bounding boxes of the triangles, clipped to the image.
+    Args:
+        points: 2 x nver image positions
+        triangles: 3 x ntri
+    Returns:
+        umin, umax, vmin, vmax: ntri int arrays, empty boxes have umax < umin or vmax < vmin
+    '''
+    xs = points[0][triangles]
+    ys = points[1][triangles]
+    umin = np.maximum(np.ceil(xs.min(axis=0)), 0).astype(np.int64)
+    umax = np.minimum(np.floor(xs.max(axis=0)), w - 1).astype(np.int64)
+    vmin = np.maximum(np.ceil(ys.min(axis=0)), 0).astype(np.int64)
+    vmax = np.minimum(np.floor(ys.max(axis=0)), h - 1).astype(np.int64)
+    return umin, umax, vmin, vmax
+
+
+def barycentric_setup(points, triangles):
+    '''
+    Per triangle terms of the barycentric coordinates, same operations as isPointInTri.
+    Args:
+        points: 2 x nver
+        triangles: 3 x ntri
+    '''
+    p0 = points[:, triangles[0]]
+    v0 = points[:, triangles[2]] - p0
+    v1 = points[:, triangles[1]] - p0
+    dot00 = v0[0] * v0[0] + v0[1] * v0[1]
+    dot01 = v0[0] * v1[0] + v0[1] * v1[1]
+    dot11 = v1[0] * v1[0] + v1[1] * v1[1]
+    deno = dot00 * dot11 - dot01 * dot01
+    inver_deno = np.zeros_like(deno)
+    np.divide(1, deno, out=inver_deno, where=deno != 0)
+    return p0, v0, v1, dot00, dot01, dot11, inver_deno
+
+
+def barycentric_coordinates(setup, tri, x, y):
+    '''
+    Barycentric coordinates (u, v) of points in triangles, as computed by isPointInTri and get_point_weight.
+    Args:
+        setup: result of barycentric_setup
+        tri: triangle index of each point
+        x, y: point positions
+    Returns:
+        u: weight of the third vertex
+        v: weight of the second vertex
+    '''
+    p0, v0, v1, dot00, dot01, dot11, inver_deno = setup
+    v2x = x - p0[0][tri]
+    v2y = y - p0[1][tri]
+    dot02 = v0[0][tri] * v2x + v0[1][tri] * v2y
+    dot12 = v1[0][tri] * v2x + v1[1][tri] * v2y
+    u = (dot11[tri] * dot02 - dot01[tri] * dot12) * inver_deno[tri]
+    v = (dot00[tri] * dot12 - dot01[tri] * dot02) * inver_deno[tri]
+    return u, v
+
+
+def rasterize(vertices, triangles, h, w, box_points=None, inside_test=True, max_pairs=MAX_PAIRS,
+              depth_buffer=None, triangle_buffer=None, subset=None, region=None):
+    '''
+    Z-buffer of a mesh.
+    Args:
+        vertices: 3 x nver, x and y are pixel positions
+        triangles: 3 x ntri
+        h: height
+        w: width
+        box_points: 2 x nver positions used for the bounding boxes, vertices[:2] by default
+        inside_test: False to fill the whole bounding boxes (as get_depth_buffer does)
+        max_pairs: maximum number of (triangle, pixel) pairs tested at once
+        depth_buffer, triangle_buffer: contiguous buffers to update, new ones are created by default
+        subset: sorted indices of the triangles to draw, all by default
+        region: (umin, umax, vmin, vmax) inclusive pixel window to draw, the whole image by default
+    Returns:
+        depth_buffer: height x width, EMPTY_DEPTH where there is no triangle
+        triangle_buffer: height x width, index of the visible triangle or -1
+    '''
+    vertices = np.asarray(vertices, dtype=np.float64)
+    triangles = np.asarray(triangles, dtype=np.int64)
+    box_points = vertices[:2] if box_points is None else np.asarray(box_points, dtype=np.float64)
+    if depth_buffer is None:
+        depth_buffer = np.zeros([h, w]) + EMPTY_DEPTH
+    if triangle_buffer is None:
+        triangle_buffer = np.zeros([h, w], dtype=np.int32) - 1
+
+    if subset is not None:
+        subset = np.asarray(subset, dtype=np.int64)
+        triangles = triangles[:, subset]
+    tri_depth = triangle_depth(vertices, triangles)
+    umin, umax, vmin, vmax = bounding_boxes(box_points, triangles, h, w)
+    if region is not None:
+        umin = np.maximum(umin, region[0])
+        umax = np.minimum(umax, region[1])
+        vmin = np.maximum(vmin, region[2])
+        vmax = np.minimum(vmax, region[3])
+    box_w = np.maximum(umax - umin + 1, 0)
+    box_h = np.maximum(vmax - vmin + 1, 0)
+    num_pairs = box_w * box_h
+    setup = barycentric_setup(vertices[:2], triangles) if inside_test else None
+
+    # batches of consecutive triangles with at most max_pairs pairs (or a single big triangle)
+    visible = np.flatnonzero(num_pairs > 0)
+    cumulated = np.cumsum(num_pairs[visible])
+    start = 0
+    while start < len(visible):
+        base = cumulated[start - 1] if start > 0 else 0
+        end = max(int(np.searchsorted(cumulated, base + max_pairs, side='right')), start + 1)
+        _rasterize_batch(visible[start:end], num_pairs, box_w, umin, vmin, tri_depth, setup,
+                         depth_buffer, triangle_buffer, subset)
+        start = end
+    return depth_buffer, triangle_buffer
+
+
+def _rasterize_batch(tris, num_pairs, box_w, umin, vmin, tri_depth, setup, depth_buffer, triangle_buffer, subset):
+    counts = num_pairs[tris]
+    tri = np.repeat(tris, counts)
+    local = np.arange(len(tri)) - np.repeat(np.cumsum(counts) - counts, counts)
+    u = umin[tri] + local % box_w[tri]
+    v = vmin[tri] + local // box_w[tri]
+
+    if setup is not None:
+        bu, bv = barycentric_coordinates(setup, tri, u, v)
+        inside = (bu >= 0) & (bv >= 0) & (bu + bv < 1)
+        tri, u, v = tri[inside], u[inside], v[inside]
+
+    # nearest triangle of each pixel, the first one on equal depths
+    pixel = v * depth_buffer.shape[1] + u
+    depth = tri_depth[tri]
+    order = np.lexsort((tri, -depth, pixel))
+    pixel, depth, tri = pixel[order], depth[order], tri[order]
+    first = np.ones(len(pixel), dtype=bool)
+    first[1:] = pixel[1:] != pixel[:-1]
+    pixel, depth, tri = pixel[first], depth[first], tri[first]
+
+    # earlier batches hold smaller triangle indices: they win on equal depths
+    flat_depth = depth_buffer.reshape(-1)
+    closer = depth > flat_depth[pixel]
+    flat_depth[pixel[closer]] = depth[closer]
+    triangle_buffer.reshape(-1)[pixel[closer]] = tri[closer] if subset is None else subset[tri[closer]]
+
+
+def tile_triangles(box_points, triangles, h, w, tile_size=TILE_SIZE):
+    '''
+    Assign the triangles to the square tiles their bounding box overlaps.
+    Returns:
+        list of (region, triangle indices) for the non empty tiles, region is (umin, umax, vmin, vmax)
+    '''
+    umin, umax, vmin, vmax = bounding_boxes(box_points, triangles, h, w)
+    visible = np.flatnonzero((umax >= umin) & (vmax >= vmin))
+    tx0, tx1 = umin[visible] // tile_size, umax[visible] // tile_size
+    ty0, ty1 = vmin[visible] // tile_size, vmax[visible] // tile_size
+    tiles_w = tx1 - tx0 + 1
+    counts = tiles_w * (ty1 - ty0 + 1)
+    pair = np.repeat(np.arange(len(visible)), counts)
+    local = np.arange(len(pair)) - np.repeat(np.cumsum(counts) - counts, counts)
+    num_tiles_x = (w + tile_size - 1) // tile_size
+    tile = (ty0[pair] + local // tiles_w[pair]) * num_tiles_x + tx0[pair] + local % tiles_w[pair]
+    # a stable sort keeps the triangles of each tile in increasing order
+    order = np.argsort(tile, kind='stable')
+    tile, tris = tile[order], visible[pair[order]]
+    starts = np.concatenate([[0], np.flatnonzero(np.diff(tile)) + 1])
+    ends = np.append(starts[1:], len(tile))
+    tasks = []
+    for start, end in zip(starts, ends):
+        ty, tx = divmod(int(tile[start]), num_tiles_x)
+        region = (tx * tile_size, min((tx + 1) * tile_size, w) - 1,
+                  ty * tile_size, min((ty + 1) * tile_size, h) - 1)
+        tasks.append((region, tris[start:end]))
+    return tasks
+
+
+def rasterize_tiled(vertices, triangles, h, w, box_points=None, inside_test=True, workers=None,
+                    tile_size=TILE_SIZE):
+    '''
+    Z-buffer of a mesh computed by tiles in a pool of processes.
+    The processes write their tiles directly in depth and triangle buffers held in shared memory.
+    Args:
+        see rasterize
+        workers: number of processes, the number of cpus by default
+        tile_size: size of the square tiles in pixels
+    Returns:
+        depth_buffer, triangle_buffer: same as rasterize
+    '''
+    # the process pool is only imported when used, it slows down the import of the package
+    from concurrent.futures import ProcessPoolExecutor
+    from multiprocessing import shared_memory
+
+    vertices = np.asarray(vertices, dtype=np.float64)
+    triangles = np.asarray(triangles, dtype=np.int64)
+    box_points = vertices[:2] if box_points is None else np.asarray(box_points, dtype=np.float64)
+    workers = workers or os.cpu_count()
+    tasks = tile_triangles(box_points, triangles, h, w, tile_size)
+
+    shared_depth = shared_memory.SharedMemory(create=True, size=max(h * w * 8, 1))
+    shared_triangles = shared_memory.SharedMemory(create=True, size=max(h * w * 4, 1))
+    try:
+        depth_buffer = np.ndarray((h, w), dtype=np.float64, buffer=shared_depth.buf)
+        triangle_buffer = np.ndarray((h, w), dtype=np.int32, buffer=shared_triangles.buf)
+        depth_buffer[:] = EMPTY_DEPTH
+        triangle_buffer[:] = -1
+        initargs = (vertices, triangles, box_points, inside_test, h, w, shared_depth.name, shared_triangles.name)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_tile_worker, initargs=initargs) as pool:
+            # largest tiles first for a better load balance
+            tasks.sort(key=lambda task: -len(task[1]))
+            for _ in pool.map(_rasterize_tile, tasks):
+                pass
+        result = depth_buffer.copy(), triangle_buffer.copy()
+        del depth_buffer, triangle_buffer
+    finally:
+        shared_depth.close()
+        shared_depth.unlink()
+        shared_triangles.close()
+        shared_triangles.unlink()
+    return result
+
+
+# state of the processes of rasterize_tiled
+_tile_worker = {}
+
+
+def _init_tile_worker(vertices, triangles, box_points, inside_test, h, w, depth_name, triangles_name):
+    from multiprocessing import shared_memory
+    shared_depth = shared_memory.SharedMemory(name=depth_name)
+    shared_triangles = shared_memory.SharedMemory(name=triangles_name)
+    _tile_worker.update(vertices=vertices, triangles=triangles, box_points=box_points, inside_test=inside_test,
+                        h=h, w=w, shared=(shared_depth, shared_triangles),
+                        depth_buffer=np.ndarray((h, w), dtype=np.float64, buffer=shared_depth.buf),
+                        triangle_buffer=np.ndarray((h, w), dtype=np.int32, buffer=shared_triangles.buf))
+
+
+def _rasterize_tile(task):
+    region, subset = task
+    state = _tile_worker
+    rasterize(state['vertices'], state['triangles'], state['h'], state['w'], box_points=state['box_points'],
+              inside_test=state['inside_test'], depth_buffer=state['depth_buffer'],
+              triangle_buffer=state['triangle_buffer'], subset=subset, region=region)
@@ -4,6 +4,9 @@ Mail: fengyao@sjtu.edu.cn
 '''
 import numpy as np
 
+from .profiling import NULL_PROFILE, new_profile
+from .rasterizer import TILE_SIZE, barycentric_coordinates, barycentric_setup, rasterize, rasterize_tiled
+
 def isPointInTri(point, tri_points):
     ''' Judge whether the point is in the triangle
     Method:
@@ -80,46 +83,43 @@ def get_point_weight(point, tri_points):
     w2 = u
 
     return w0, w1, w2
-def render_texture(vertices, uvs, triangles, texture, h, w, c = 3):
+def _rasterize(vertices, triangles, h, w, workers, tile_size, profile=NULL_PROFILE, **options):
+    # tiles in a process pool or a single process
+    start = profile.clock()
+    if workers == 1:
+        buffers = rasterize(vertices, triangles, h, w, **options)
+    else:
+        buffers = rasterize_tiled(vertices, triangles, h, w, workers=workers, tile_size=tile_size, **options)
+    profile.stop('rasterize', start, np.shape(triangles)[1])
+    return buffers
+
+def render_texture(vertices, uvs, triangles, texture, h, w, c = 3, workers = 1, tile_size = TILE_SIZE):
     ''' render mesh by z buffer
     Args:
         vertices: 3 x nver
-        uvs: 3 x nver
+        uvs: 2 (or 3) x nver. positions of the bounding boxes of the triangles
         triangles: 3 x ntri
+        texture: c x ntri. color of each triangle
         h: height
         w: width
+        workers: number of processes rendering tiles of the image
+        tile_size: size of the tiles in pixels
     '''
+    profile = new_profile('render_texture')
     # initial
     image = np.zeros((h, w, c))
 
-    depth_buffer = np.zeros([h, w]) - 999999.
-
-    # triangle depth: approximate the depth to the average value of z in each vertex(v0, v1, v2),
-    # since the vertices are closed to each other
-    tri_depth = (vertices[2, triangles[0, :]] + vertices[2, triangles[1, :]] + vertices[2, triangles[2, :]])/3.
-    #tri_tex = (colors[:, triangles[0, :]] + colors[:, triangles[1, :]] + colors[:, triangles[2, :]])/3.
-
-    for i in range(triangles.shape[1]):
-        tri = triangles[:, i] # 3 vertex indices
-
-        # the inner bounding box
-        umin = max(int(np.ceil(np.min(uvs[0,tri]))), 0)
-        umax = min(int(np.floor(np.max(uvs[0,tri]))), w-1)
-
-        vmin = max(int(np.ceil(np.min(uvs[1,tri]))), 0)
-        vmax = min(int(np.floor(np.max(uvs[1,tri]))), h-1)
-
-        if umax < umin or vmax < vmin:
-            continue
-
-        for u in range(umin, umax+1):
-            for v in range(vmin, vmax+1):
-                if tri_depth[i] > depth_buffer[v, u] and isPointInTri([u, v], vertices[:2, tri]):
-                    depth_buffer[v, u] = tri_depth[i]
-                    image[v, u, :] = texture[:, i]
+    # the bounding boxes come from the uvs, the coverage from the vertices
+    uvs = np.asarray(uvs)
+    _, triangle_buffer = _rasterize(vertices, triangles, h, w, workers, tile_size, profile, box_points=uvs[:2])
+    start = profile.clock()
+    covered = triangle_buffer >= 0
+    image[covered] = np.asarray(texture)[:, triangle_buffer[covered]].T
+    profile.stop('shade', start, np.count_nonzero(covered) if profile else 0, image.nbytes)
+    profile.finish()
     return image
 
-def render_texture_colors(vertices, colors, triangles, h, w, c = 3):
+def render_texture_colors(vertices, colors, triangles, h, w, c = 3, workers = 1, tile_size = TILE_SIZE):
     ''' render mesh by z buffer
     Args:
         vertices: 3 x nver
@@ -127,35 +127,22 @@ def render_texture_colors(vertices, colors, triangles, h, w, c = 3):
         triangles: 3 x ntri
         h: height
         w: width    
+        workers: number of processes rendering tiles of the image
+        tile_size: size of the tiles in pixels
     '''
+    profile = new_profile('render_texture_colors')
     # initial 
     image = np.zeros((h, w, c))
 
-    depth_buffer = np.zeros([h, w]) - 999999.
-
-    # triangle depth: approximate the depth to the average value of z in each vertex(v0, v1, v2),
-    # since the vertices are closed to each other
-    tri_depth = (vertices[2, triangles[0, :]] + vertices[2, triangles[1, :]] + vertices[2, triangles[2, :]])/3.
+    # triangle color: average of the colors of its vertices
     tri_tex = (colors[:, triangles[0, :]] + colors[:, triangles[1, :]] + colors[:, triangles[2, :]])/3.
 
-    for i in range(triangles.shape[1]):
-        tri = triangles[:, i] # 3 vertex indices
-
-        # the inner bounding box
-        umin = max(int(np.ceil(np.min(vertices[0,tri]))), 0)
-        umax = min(int(np.floor(np.max(vertices[0,tri]))), w-1)
-
-        vmin = max(int(np.ceil(np.min(vertices[1,tri]))), 0)
-        vmax = min(int(np.floor(np.max(vertices[1,tri]))), h-1)
-
-        if umax < umin or vmax < vmin:
-            continue
-
-        for u in range(umin, umax+1):
-            for v in range(vmin, vmax+1):
-                if tri_depth[i] > depth_buffer[v, u] and isPointInTri([u, v], vertices[:2, tri]):
-                    depth_buffer[v, u] = tri_depth[i]
-                    image[v, u, :] = tri_tex[:, i]
+    _, triangle_buffer = _rasterize(vertices, triangles, h, w, workers, tile_size, profile)
+    start = profile.clock()
+    covered = triangle_buffer >= 0
+    image[covered] = tri_tex[:, triangle_buffer[covered]].T
+    profile.stop('shade', start, np.count_nonzero(covered) if profile else 0, image.nbytes)
+    profile.finish()
     return image
 
 
@@ -172,67 +159,95 @@ def map_texture(src_image, src_vertices, dst_vertices, dst_triangle_buffer, tria
         dst_vertices: 3 x nver
         dst_triangle_buffer: height x width. the triangle index of each pixel in dst image
 
+        mapping_type: 'nearest', 'bilinear' or 'area' (mean of the src pixels covered by the dst pixel)
+
     Returns:
         dst_image: height x width x nchannels
 
     '''
+    profile = new_profile('map_texture')
+    start = profile.clock()
     [sh, sw, sc] = src_image.shape
     dst_image = np.zeros((h, w, c))
-    for y in range(h):
-        for x in range(w):
-            tri_ind = dst_triangle_buffer[y,x]
-            if tri_ind < 0: # no tri in dst image
-                continue 
-            #if src_triangles_vis[tri_ind]: # the corresponding triangle in src image is invisible
-            #   continue
-            
-            # then. For this triangle index, map corresponding pixels(in triangles) in src image to dst image
-            # Two Methods:
-            # M1. Calculate the corresponding affine matrix from src triangle to dst triangle. Then find the corresponding src position of this dst pixel.
-            # -- ToDo
-            # M2. Calculate the relative position of three vertices in dst triangle, then find the corresponding src position relative to three src vertices.
-            tri = triangles[:, tri_ind]
-            # dst weight, here directly use the center to approximate because the tri is small
-            # if tri_ind < 366:
-                # print tri_ind
-            w0, w1, w2 = get_point_weight([x, y], dst_vertices[:2, tri])
-            # else:
-            #     w0 = w1 = w2 = 1./3
-            # src
-            src_texel = w0*src_vertices[:2, tri[0]] + w1*src_vertices[:2, tri[1]] + w2*src_vertices[:2, tri[2]] #
-# 
-            if src_texel[0] < 0 or src_texel[0]> sw-1 or src_texel[1]<0 or src_texel[1] > sh-1:
-                dst_image[y, x, :] = 0
-                continue
-            # As the coordinates of the transformed pixel in the image will most likely not lie on a texel, we have to choose how to
-            # calculate the pixel colors depending on the next texels
-            # there are three different texture interpolation methods: area, bilinear and nearest neighbour
-            # print y, x, src_texel
-            # nearest neighbour 
-            if mapping_type == 'nearest':
-                dst_image[y, x, :] = src_image[int(round(src_texel[1])), int(round(src_texel[0])), :]
-            # bilinear
-            elif mapping_type == 'bilinear':
-                # next 4 pixels
-                ul = src_image[int(np.floor(src_texel[1])), int(np.floor(src_texel[0])), :]
-                ur = src_image[int(np.floor(src_texel[1])), int(np.ceil(src_texel[0])), :]
-                dl = src_image[int(np.ceil(src_texel[1])), int(np.floor(src_texel[0])), :]
-                dr = src_image[int(np.ceil(src_texel[1])), int(np.ceil(src_texel[0])), :]
-
-                yd = src_texel[1] - np.floor(src_texel[1])
-                xd = src_texel[0] - np.floor(src_texel[0])
-                dst_image[y, x, :] = ul*(1-xd)*(1-yd) + ur*xd*(1-yd) + dl*(1-xd)*yd + dr*xd*yd
-                
+
+    # all the dst pixels covered by a triangle
+    ys, xs = np.nonzero(dst_triangle_buffer[:h, :w] >= 0)
+    tri_ind = dst_triangle_buffer[ys, xs]
+
+    # Calculate the relative position of the pixels in their dst triangle, then find the corresponding src
+    # position relative to the three src vertices.
+    setup = barycentric_setup(np.asarray(dst_vertices[:2], dtype=np.float64), triangles)
+    u, v = barycentric_coordinates(setup, tri_ind, xs, ys)
+    w0, w1, w2 = 1 - u - v, v, u
+    tri = triangles[:, tri_ind]
+    src_texel = w0*src_vertices[:2, tri[0]] + w1*src_vertices[:2, tri[1]] + w2*src_vertices[:2, tri[2]]
+
+    # src positions out of the image stay black
+    inside = (src_texel[0] >= 0) & (src_texel[0] <= sw-1) & (src_texel[1] >= 0) & (src_texel[1] <= sh-1)
+    ys, xs, tri_ind, tx, ty = ys[inside], xs[inside], tri_ind[inside], src_texel[0][inside], src_texel[1][inside]
+    profile.stop('barycentric', start, len(inside))
+    start = profile.clock()
+
+    # As the coordinates of the transformed pixel in the image will most likely not lie on a texel, we have to choose how to
+    # calculate the pixel colors depending on the next texels
+    # there are three different texture interpolation methods: area, bilinear and nearest neighbour
+    if mapping_type == 'nearest':
+        dst_image[ys, xs, :] = src_image[np.round(ty).astype(int), np.round(tx).astype(int), :]
+    elif mapping_type == 'bilinear':
+        # next 4 pixels
+        x0, x1 = np.floor(tx).astype(int), np.ceil(tx).astype(int)
+        y0, y1 = np.floor(ty).astype(int), np.ceil(ty).astype(int)
+        ul = src_image[y0, x0, :]
+        ur = src_image[y0, x1, :]
+        dl = src_image[y1, x0, :]
+        dr = src_image[y1, x1, :]
+
+        yd = (ty - np.floor(ty))[:, None]
+        xd = (tx - np.floor(tx))[:, None]
+        dst_image[ys, xs, :] = ul*(1-xd)*(1-yd) + ur*xd*(1-yd) + dl*(1-xd)*yd + dr*xd*yd
+    elif mapping_type == 'area':
+        # footprint of a dst pixel in the src image, from the affine map of its triangle
+        dst = np.asarray(dst_vertices[:2], dtype=np.float64)
+        src = np.asarray(src_vertices[:2], dtype=np.float64)
+        dst_edges = np.stack([dst[:, triangles[1]] - dst[:, triangles[0]], dst[:, triangles[2]] - dst[:, triangles[0]]], axis=2)
+        src_edges = np.stack([src[:, triangles[1]] - src[:, triangles[0]], src[:, triangles[2]] - src[:, triangles[0]]], axis=2)
+        # jacobian = src_edges . dst_edges^-1, per triangle
+        det = dst_edges[0, :, 0]*dst_edges[1, :, 1] - dst_edges[0, :, 1]*dst_edges[1, :, 0]
+        det[det == 0] = np.inf
+        inv = np.stack([np.stack([dst_edges[1, :, 1], -dst_edges[0, :, 1]]),
+                        np.stack([-dst_edges[1, :, 0], dst_edges[0, :, 0]])]) / det
+        jac = np.einsum('ktj,jlt->klt', src_edges, inv)
+        half_x = (np.abs(jac[0, 0]) + np.abs(jac[0, 1]))[tri_ind] / 2
+        half_y = (np.abs(jac[1, 0]) + np.abs(jac[1, 1]))[tri_ind] / 2
+        # src pixels whose center is in the footprint, at least the nearest one
+        x0, x1 = np.ceil(tx - half_x), np.floor(tx + half_x)
+        y0, y1 = np.ceil(ty - half_y), np.floor(ty + half_y)
+        small = x1 < x0
+        x0[small] = x1[small] = np.round(tx[small])
+        small = y1 < y0
+        y0[small] = y1[small] = np.round(ty[small])
+        x0, x1 = np.clip(x0, 0, sw-1).astype(int), np.clip(x1, 0, sw-1).astype(int)
+        y0, y1 = np.clip(y0, 0, sh-1).astype(int), np.clip(y1, 0, sh-1).astype(int)
+        # box means with a summed area table
+        table = np.zeros((sh+1, sw+1, sc))
+        table[1:, 1:] = np.cumsum(np.cumsum(src_image, axis=0), axis=1)
+        total = table[y1+1, x1+1] - table[y0, x1+1] - table[y1+1, x0] + table[y0, x0]
+        dst_image[ys, xs, :] = total / ((x1-x0+1)*(y1-y0+1))[:, None]
+    profile.stop(mapping_type, start, len(ys), dst_image.nbytes)
+    profile.finish()
+
     return dst_image
 
 
-def get_depth_buffer(vertices, triangles, h, w):
+def get_depth_buffer(vertices, triangles, h, w, workers = 1, tile_size = TILE_SIZE):
     '''
     Args:
         vertices: 3 x nver
         triangles: 3 x ntri
         h: height
         w: width
+        workers: number of processes rendering tiles of the image
+        tile_size: size of the tiles in pixels
     Returns:
         depth_buffer: height x width
     ToDo:
@@ -241,141 +256,85 @@ def get_depth_buffer(vertices, triangles, h, w):
     # Each triangle has 3 vertices & Each vertex has 3 coordinates x, y, z.
     # Here, the bigger the z, the fronter the point.
     '''
-    # initial 
-    depth_buffer = np.zeros([h, w]) - 999999. #+ np.min(vertices[2,:]) - 999999. # set the initial z to the farest position
-
     ## calculate the depth(z) of each triangle
     #-m1. z = the center of shpere(through 3 vertices)
-    #center3d = (vertices[:, triangles[0,:]] + vertices[:,triangles[1,:]] + vertices[:, triangles[2,:]])/3.
-    #tri_depth = np.sum(center3d**2, axis = 0)
     #-m2. z = the center of z(v0, v1, v2)
-    tri_depth = (vertices[2, triangles[0,:]] + vertices[2,triangles[1,:]] + vertices[2, triangles[2,:]])/3.
-    
-    for i in range(triangles.shape[1]):
-        tri = triangles[:, i] # 3 vertex indices
-
-        # the inner bounding box
-        umin = max(int(np.ceil(np.min(vertices[0,tri]))), 0)
-        umax = min(int(np.floor(np.max(vertices[0,tri]))), w-1)
-
-        vmin = max(int(np.ceil(np.min(vertices[1,tri]))), 0)
-        vmax = min(int(np.floor(np.max(vertices[1,tri]))), h-1)
-
-        if umax<umin or vmax<vmin:
-            continue
-
-        for u in range(umin, umax+1):
-            for v in range(vmin, vmax+1):
-                #-m3. calculate the accurate depth(z) of each pixel by barycentric weights
-                #w0, w1, w2 = weightsOfpoint([u,v], vertices[:2, tri])
-                #tri_depth = w0*vertices[2,tri[0]] + w1*vertices[2,tri[1]] + w2*vertices[2,tri[2]]
-                if tri_depth[i] > depth_buffer[v, u]: # and is_pointIntri([u,v], vertices[:2, tri]): 
-                    depth_buffer[v, u] = tri_depth[i]
-
+    # the depth of a triangle fills its whole bounding box (no inside test)
+    profile = new_profile('get_depth_buffer')
+    depth_buffer, _ = _rasterize(vertices, triangles, h, w, workers, tile_size, profile, inside_test=False)
+    profile.finish()
     return depth_buffer
 
 
-def get_triangle_buffer(vertices, triangles, h, w):
+def get_triangle_buffer(vertices, triangles, h, w, workers = 1, tile_size = TILE_SIZE):
     '''
     Args:
         vertices: 3 x nver
         triangles: 3 x ntri
         h: height
         w: width
+        workers: number of processes rendering tiles of the image
+        tile_size: size of the tiles in pixels
     Returns:
-        depth_buffer: height x width
+        triangle_buffer: height x width, index of the visible triangle, -1 if the pixel has no triangle
     ToDo:
         whether to add x, y by 0.5? the center of the pixel?
         m3. like somewhere is wrong
     # Each triangle has 3 vertices & Each vertex has 3 coordinates x, y, z.
     # Here, the bigger the z, the fronter the point.
     '''
-    # initial 
-    depth_buffer = np.zeros([h, w]) - 999999. #+ np.min(vertices[2,:]) - 999999. # set the initial z to the farest position
-    triangle_buffer = np.zeros_like(depth_buffer, dtype = np.int32) - 1 # if -1, the pixel has no triangle correspondance
-
-    ## calculate the depth(z) of each triangle
-    #-m1. z = the center of shpere(through 3 vertices)
-    #center3d = (vertices[:, triangles[0,:]] + vertices[:,triangles[1,:]] + vertices[:, triangles[2,:]])/3.
-    #tri_depth = np.sum(center3d**2, axis = 0)
-    #-m2. z = the center of z(v0, v1, v2)
-    tri_depth = (vertices[2, triangles[0,:]] + vertices[2,triangles[1,:]] + vertices[2, triangles[2,:]])/3.
-    
-    for i in range(triangles.shape[1]):
-        tri = triangles[:, i] # 3 vertex indices
-
-        # the inner bounding box
-        umin = max(int(np.ceil(np.min(vertices[0,tri]))), 0)
-        umax = min(int(np.floor(np.max(vertices[0,tri]))), w-1)
-
-        vmin = max(int(np.ceil(np.min(vertices[1,tri]))), 0)
-        vmax = min(int(np.floor(np.max(vertices[1,tri]))), h-1)
-
-        if umax<umin or vmax<vmin:
-            continue
-
-        for u in range(umin, umax+1):
-            for v in range(vmin, vmax+1):
-                #-m3. calculate the accurate depth(z) of each pixel by barycentric weights
-                #w0, w1, w2 = weightsOfpoint([u,v], vertices[:2, tri])
-                #tri_depth = w0*vertices[2,tri[0]] + w1*vertices[2,tri[1]] + w2*vertices[2,tri[2]]
-                if tri_depth[i] > depth_buffer[v, u] and isPointInTri([u,v], vertices[:2, tri]): 
-                    depth_buffer[v, u] = tri_depth[i]
-                    triangle_buffer[v, u] = i
-
+    profile = new_profile('get_triangle_buffer')
+    _, triangle_buffer = _rasterize(vertices, triangles, h, w, workers, tile_size, profile)
+    profile.finish()
     return triangle_buffer
 
 
-def vis_of_vertices(vertices, triangles, h, w, depth_buffer = None):
+def vis_of_vertices(vertices, triangles, h, w, depth_buffer = None, threshold = 2, workers = 1):
     '''
     Args:
-        vertices: 3 x nver
+        vertices: 3 x nver, or ncam x 3 x nver for several cameras
         triangles: 3 x ntri
-        depth_buffer: height x width
+        depth_buffer: height x width, or ncam x height x width. computed with get_depth_buffer if None
+        threshold: maximum depth difference between a visible vertex and the depth buffer
+        workers: number of processes used to compute missing depth buffers
     Returns:
-        vertices_vis: nver. the visibility of each vertex
+        vertices_vis: nver (or ncam x nver). the visibility of each vertex
     '''
-    if depth_buffer == None:
-        depth_buffer = get_depth_buffer(vertices, triangles, h, w)
-
-    vertices_vis = np.zeros(vertices.shape[1], dtype = bool)
-    
-    depth_tmp = np.zeros_like(depth_buffer) - 99999
-    for i in range(vertices.shape[1]):
-        vertex = vertices[:, i]
-
-        if np.floor(vertex[0]) < 0 or np.ceil(vertex[0]) > w-1 or np.floor(vertex[1]) < 0 or np.ceil(vertex[1]) > h-1:
-            continue        
-        
-        # bilinear interp 
-        # ul = depth_buffer[int(np.floor(vertex[1])), int(np.floor(vertex[0]))]
-        # ur = depth_buffer[int(np.floor(vertex[1])), int(np.ceil(vertex[0]))]
-        # dl = depth_buffer[int(np.ceil(vertex[1])), int(np.floor(vertex[0]))]
-        # dr = depth_buffer[int(np.ceil(vertex[1])), int(np.ceil(vertex[0]))]
-        
-        # yd = vertex[1] - np.floor(vertex[1])
-        # xd = vertex[0] - np.floor(vertex[0])
-
-        # vertex_depth = ul*(1-xd)*(1-yd) + ur*xd*(1-yd) + dl*(1-xd)*yd + dr*xd*yd
-        
-        # nearest
-        px = int(np.round(vertex[0]))
-        py = int(np.round(vertex[1]))
-
-        # if (vertex[2] > depth_buffer[ul[0], ul[1]]) & (vertex[2] > depth_buffer[ur[0], ur[1]]) & (vertex[2] > depth_buffer[dl[0], dl[1]]) & (vertex[2] > depth_buffer[dr[0], dr[1]]):
-        if vertex[2] < depth_tmp[py, px]:
-            continue
-        
-        # if vertex[2] > depth_buffer[py, px]:
-        #     vertices_vis[i] = True
-        #     depth_tmp[py, px] = vertex[2]
-        # elif np.abs(vertex[2] - depth_buffer[py, px]) < 1:
-        #     vertices_vis[i] = True
-
-        threshold = 2 # need to be optimized.
-        if np.abs(vertex[2] - depth_buffer[py, px]) < threshold:
-        # if np.abs(vertex[2] - vertex_depth) < threshold:
-            vertices_vis[i] = True
-            depth_tmp[py, px] = vertex[2]
-
-    return vertices_vis
+    vertices = np.asarray(vertices)
+    single = vertices.ndim == 2
+    vertices = vertices[None] if single else vertices
+    if depth_buffer is None:
+        depth_buffer = np.stack([get_depth_buffer(cam_vertices, triangles, h, w, workers=workers)
+                                 for cam_vertices in vertices])
+    depth_buffer = np.asarray(depth_buffer)
+    depth_buffer = np.broadcast_to(depth_buffer, (len(vertices), h, w))
+    ncam, _, nver = vertices.shape
+    vertices_vis = np.zeros((ncam, nver), dtype = bool)
+
+    x, y, z = vertices[:, 0].ravel(), vertices[:, 1].ravel(), vertices[:, 2].ravel()
+    in_image = (np.floor(x) >= 0) & (np.ceil(x) <= w-1) & (np.floor(y) >= 0) & (np.ceil(y) <= h-1)
+
+    # nearest pixel, one depth buffer after the other
+    candidates = np.flatnonzero(in_image)
+    cam = candidates // nver
+    px = np.round(x[candidates]).astype(np.int64)
+    py = np.round(y[candidates]).astype(np.int64)
+    pixel = (cam * h + py) * w + px
+    z = z[candidates]
+
+    # a vertex close to the depth buffer is visible unless a previous visible vertex of the same pixel is
+    # in front of it (the depth_tmp buffer of the sequential version)
+    close = np.abs(z - depth_buffer.reshape(-1)[pixel]) < threshold
+    candidates, pixel, z = candidates[close], pixel[close], z[close]
+    order = np.lexsort((candidates, pixel))
+    candidates, pixel, z = candidates[order], pixel[order], z[order]
+    # running maximum of z by pixel: ranks of z shifted by the pixel group, so that maxima do not leak between groups
+    _, z_rank = np.unique(z, return_inverse=True)
+    group = np.cumsum(np.concatenate([[0], pixel[1:] != pixel[:-1]]))
+    key = group * (len(z) + 1) + z_rank.reshape(-1)
+    running = np.maximum.accumulate(key)
+    previous = np.concatenate([[-1], running[:-1]])
+    visible = key >= previous
+    vertices_vis.reshape(-1)[candidates[visible]] = True
+
+    return vertices_vis[0] if single else vertices_vis
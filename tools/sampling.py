@@ -0,0 +1,59 @@
+'''
+Sampling of texture images at texture coordinates.
+
+All the texture coordinates are converted to pixel positions at once, (0, 0)
+being the bottom left corner of the image as in utils.conv_np_cv2, and the
+texels are gathered with one fancy indexing per neighbour.
+'''
+import numpy as np
+
+SAMPLING_MODES = ('nearest', 'bilinear')
+
+
+def uv_to_pixels(uvs, h, w):
+    '''
+    Args:
+        uvs: ... x 2 texture coordinates
+        h: image height
+        w: image width
+    Returns:
+        x, y: ... pixel positions (column, row), not rounded
+    '''
+    uvs = np.asarray(uvs, dtype=np.float64)
+    return uvs[..., 0] * w, h - uvs[..., 1] * h
+
+
+def sample_texture(image, uvs, mode='nearest'):
+    '''
+    Colors of an image at texture coordinates.
+    Args:
+        image: height x width x nchannels (or height x width)
+        uvs: ... x 2 texture coordinates, positions outside of the image are clamped to its border
+        mode: 'nearest' or 'bilinear'
+    Returns:
+        colors: ... x nchannels
+    '''
+    if mode not in SAMPLING_MODES:
+        raise ValueError("Error 008: unknown sampling mode {}, use one of {}".format(mode, SAMPLING_MODES))
+    image = np.asarray(image)
+    if image.ndim == 2:
+        image = image[:, :, None]
+    h, w = image.shape[:2]
+    x, y = uv_to_pixels(uvs, h, w)
+
+    if mode == 'nearest':
+        xi = np.clip(np.round(x), 0, w - 1).astype(np.intp)
+        yi = np.clip(np.round(y), 0, h - 1).astype(np.intp)
+        return image[yi, xi]
+
+    # bilinear: weights of the 4 texels around each position
+    x = np.clip(x, 0, w - 1)
+    y = np.clip(y, 0, h - 1)
+    x0, y0 = np.floor(x).astype(np.intp), np.floor(y).astype(np.intp)
+    x1, y1 = np.minimum(x0 + 1, w - 1), np.minimum(y0 + 1, h - 1)
+    xd = (x - x0)[..., None]
+    yd = (y - y0)[..., None]
+    dtype = image.dtype if image.dtype.kind == 'f' else np.float32
+    top = image[y0, x0].astype(dtype) * (1 - xd) + image[y0, x1] * xd
+    bottom = image[y1, x0].astype(dtype) * (1 - xd) + image[y1, x1] * xd
+    return (top * (1 - yd) + bottom * yd).astype(dtype)
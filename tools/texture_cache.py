@@ -0,0 +1,127 @@
+'''
+Process-wide cache of decoded texture images.
+
+Textures are keyed by their resolved path, size and modification time, so
+meshes sharing a texture decode it once and an edited file is read again.
+Images are kept as float32 in [0, 1] (or uint8 in [0, 255] to save memory)
+and the least recently used ones are dropped when the cache exceeds its
+memory budget.
+'''
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from .backends import read_image
+
+TEXTURE_BUDGET = 1 << 30     # 1 GiB of decoded images
+
+
+class TextureCache:
+    def __init__(self, max_size=TEXTURE_BUDGET, dtype=np.float32):
+        """
+        LRU cache of texture images.
+        :param max_size: memory budget in bytes, an image bigger than the budget is returned but not kept
+        :param dtype: np.float32 to keep images in [0, 1], np.uint8 to keep the raw 8 bits values
+        """
+        self.max_size = max_size
+        self.dtype = np.dtype(dtype)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._images = OrderedDict()    # key -> image, the most recently used last
+        self._size = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(path):
+        """
+        cache key of an image file: resolved path, size and modification time.
+        """
+        path = os.path.realpath(path)
+        stat = os.stat(path)
+        return path, stat.st_size, stat.st_mtime_ns
+
+    def get(self, path):
+        """
+        decoded image of a file, read-only.
+        :return: height x width x nchannels array, float32 in [0, 1] or uint8 depending on the cache dtype
+        """
+        key = self.key(path)
+        with self._lock:
+            image = self._images.get(key)
+            if image is not None:
+                self._images.move_to_end(key)
+                self.hits += 1
+                return image
+            self.misses += 1
+
+        # decoding is done outside the lock, two threads may decode the same image once
+        image = self._convert(read_image(key[0]))
+        image.flags.writeable = False
+        with self._lock:
+            if key not in self._images and image.nbytes <= self.max_size:
+                # older versions of the same file are useless
+                for old_key in [old_key for old_key in self._images if old_key[0] == key[0]]:
+                    self._remove(old_key)
+                self._images[key] = image
+                self._size += image.nbytes
+                self._evict(self.max_size)
+        return image
+
+    def _convert(self, image):
+        if self.dtype == np.uint8:
+            return image if image.dtype == np.uint8 else np.clip(image, 0, 255).astype(np.uint8)
+        # same scale as the historical imread(path) / 255
+        image = image.astype(self.dtype)
+        image /= 255
+        return image
+
+    def _remove(self, key):
+        self._size -= self._images.pop(key).nbytes
+
+    def _evict(self, max_size):
+        while self._size > max_size and self._images:
+            self._remove(next(iter(self._images)))
+            self.evictions += 1
+
+    def evict(self, max_size=None):
+        """
+        drop the least recently used images until the cache fits in max_size bytes.
+        """
+        with self._lock:
+            self._evict(self.max_size if max_size is None else max_size)
+
+    def clear(self):
+        with self._lock:
+            self._images.clear()
+            self._size = 0
+
+    def size(self):
+        """
+        memory used by the cached images in bytes.
+        """
+        return self._size
+
+    def __len__(self):
+        return len(self._images)
+
+    def stats(self):
+        """
+        hits, misses, evictions, number of images and memory used.
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "images": len(self._images), "size": self._size, "max_size": self.max_size}
+
+
+# cache shared by all the meshes of the process
+TEXTURE_CACHE = TextureCache()
+
+
+def as_float(image):
+    '''
+    Texture values in [0, 1], cached float images are returned as is.
+    '''
+    return image if image.dtype.kind == 'f' else image / np.float32(255)
@@ -0,0 +1,125 @@
+'''
+Vertex welding and index compaction.
+
+Points are welded by sorting a key per point: the bits of its coordinates
+for exact duplicates, or its coordinates rounded to the nearest multiple of
+the tolerance. The keys of the coordinates are packed in one int64 when
+their ranges allow it, hashed otherwise, so a 10M points array is welded
+with one 1D sort.
+'''
+import numpy as np
+
+from .polygons import PolygonArray
+
+
+def weld_points(points, tolerance=0.):
+    '''
+    Group equal points, or points rounding to the same multiple of tolerance.
+    Args:
+        points: N x D array
+        tolerance: grid step, 0 to only merge identical points
+    Returns:
+        keep: index of the first point of each group, in order of first occurrence
+        inverse: N group index of each point
+    '''
+    points = np.asarray(points)
+    if len(points) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    points = points.reshape(len(points), -1)
+    if tolerance > 0:
+        keys = np.floor(points / tolerance + 0.5).astype(np.int64)
+    else:
+        # the bits of the coordinates, + 0. turns -0. into 0.
+        keys = np.ascontiguousarray(points + 0., dtype=np.float64).view(np.int64)
+    return unique_rows(keys)
+
+
+def unique_rows(keys):
+    '''
+    Group equal rows of an integer array.
+    Args:
+        keys: N x D int64 array
+    Returns:
+        keep: index of the first row of each group, in order of first occurrence
+        inverse: N group index of each row
+    '''
+    if len(keys) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    order, starts = _sorted_groups(keys)
+
+    # first row of each group and group of each row in sorted order
+    first = np.minimum.reduceat(order, starts)
+    group = np.zeros(len(order), dtype=np.int64)
+    group[starts[1:]] = 1
+    np.cumsum(group, out=group)
+    # number the groups in order of first occurrence, so the groups keep the order of the rows
+    is_first = np.zeros(len(order), dtype=bool)
+    is_first[first] = True
+    rank = np.cumsum(is_first) - 1
+    inverse = np.empty(len(order), dtype=np.int64)
+    inverse[order] = rank[first][group]
+    return np.flatnonzero(is_first), inverse
+
+
+def _sorted_groups(keys):
+    '''
+    sort rows of int64 keys so equal rows are consecutive.
+    Returns:
+        order: sorting permutation of the rows
+        starts: positions in order where a new row value starts
+    '''
+    low = keys.min(axis=0)
+    ranges = [int(high) - int(lo) + 1 for lo, high in zip(low, keys.max(axis=0))]
+    if np.prod([float(value) for value in ranges]) < 2 ** 62:
+        # the columns are packed in one exact int64 key
+        packed = np.ravel_multi_index(tuple((keys - low).T), ranges)
+        order = np.argsort(packed)
+        packed = packed[order]
+        return order, np.flatnonzero(np.concatenate([[True], packed[1:] != packed[:-1]]))
+    # a hash of the row, rows are compared to detect the (rare) collisions
+    hashed = np.zeros(len(keys), dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        for column in keys.T:
+            hashed = (hashed ^ column.view(np.uint64)) * np.uint64(0x100000001b3)
+    order = np.argsort(hashed)
+    rows = keys[order]
+    new_row = np.concatenate([[True], np.any(rows[1:] != rows[:-1], axis=1)])
+    hashed = hashed[order]
+    if np.any(new_row[1:] & (hashed[1:] == hashed[:-1])):
+        order = np.lexsort(keys.T[::-1])
+        rows = keys[order]
+        new_row = np.concatenate([[True], np.any(rows[1:] != rows[:-1], axis=1)])
+    return order, np.flatnonzero(new_row)
+
+
+def used_mapping(count, *indices):
+    '''
+    New indices after removing the entries that no index refers to.
+    Args:
+        count: number of entries
+        indices: index arrays (dense, PolygonArray or empty), -1 for none
+    Returns:
+        keep: indices of the entries still referred to
+        mapping: count new index of each entry, -1 for removed ones
+    '''
+    used = np.zeros(count, dtype=bool)
+    for index in indices:
+        if len(index) > 0:
+            flat = index.values if isinstance(index, PolygonArray) else np.asarray(index).reshape(-1)
+            used[flat[flat >= 0]] = True
+    mapping = np.full(count, -1, dtype=np.int64)
+    keep = np.flatnonzero(used)
+    mapping[keep] = np.arange(len(keep))
+    return keep, mapping
+
+
+def remap_indices(indices, mapping):
+    '''
+    Replace the indices (dense, PolygonArray or empty) by mapping[indices], -1 stays -1.
+    '''
+    if len(indices) == 0 or len(mapping) == 0:
+        return indices
+    if isinstance(indices, PolygonArray):
+        return PolygonArray(remap_indices(indices.values, mapping), indices.offsets)
+    indices = np.asarray(indices)
+    return np.where(indices >= 0, mapping[np.maximum(indices, 0)], -1)